@@ -2,6 +2,8 @@
 import eventlet
 eventlet.monkey_patch()
 
+import os
+
 from website import create_app, Config, socketio
 from flask_socketio import SocketIO
 
@@ -11,4 +13,8 @@ app.config.from_object(Config)
 
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True)
+    # Each worker listens on its own port; see "Running Multiple Workers"
+    socketio.run(app,
+                 host=os.getenv('HOST', '127.0.0.1'),
+                 port=int(os.getenv('PORT', 5000)),
+                 debug=os.getenv('FLASK_DEBUG', '1') == '1')
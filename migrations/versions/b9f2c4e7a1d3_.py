@@ -0,0 +1,45 @@
+"""store message and read watermark timestamps with microseconds
+
+Revision ID: b9f2c4e7a1d3
+Revises: a7d3f0b2c815
+Create Date: 2026-10-18 21:04:12.371904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9f2c4e7a1d3'
+down_revision = 'a7d3f0b2c815'
+branch_labels = None
+depends_on = None
+
+# MySQL rounds DATETIME columns to seconds unless a fractional second
+# precision is given; other databases already keep microseconds
+COLUMNS = [
+    ('messages', 'timestamp', True),
+    ('group_memberships', 'joined_at', True),
+    ('group_memberships', 'last_read_at', True),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name not in ('mysql', 'mariadb'):
+        return
+    for table, column, nullable in COLUMNS:
+        op.alter_column(table, column,
+                        existing_type=mysql.DATETIME(),
+                        type_=mysql.DATETIME(fsp=6),
+                        existing_nullable=nullable)
+
+
+def downgrade():
+    if op.get_bind().dialect.name not in ('mysql', 'mariadb'):
+        return
+    for table, column, nullable in COLUMNS:
+        op.alter_column(table, column,
+                        existing_type=mysql.DATETIME(fsp=6),
+                        type_=mysql.DATETIME(),
+                        existing_nullable=nullable)
@@ -0,0 +1,295 @@
+"""
+Checks that the hot routes of ChatFlow are served through indexes.
+
+The script seeds a scratch database with a large dataset, drives the
+dashboard, chat history, notification, friend and socket routes as one
+of the busiest users, records every SQL statement they run and asks the
+database for the plan of each one. It fails when a plan reads a whole
+table instead of searching an index.
+
+Usage:
+    python scripts/check_query_plans.py [--users N] [--database-uri URI]
+
+Without --database-uri a temporary SQLite database is used. Never point
+it at a database holding real data, since its tables are dropped.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tables that grow with usage; reading any of them whole is a failure
+LARGE_TABLES = {'users', 'conversations', 'messages', 'unread_counters',
+                'groups', 'group_memberships', 'friendships',
+                'notifications'}
+
+
+def seed(db, users=2000, chats_per_user=5, messages_per_chat=20,
+         group_size=20, group_stride=4, notifications_per_user=20):
+    """
+    Fill the database with a large, evenly connected dataset.
+
+    Every user has private chats and accepted friendships with the next
+    `chats_per_user` users and a pending friend request from the user after
+    those. A group of `group_size` consecutive users starts at every
+    `group_stride`-th user, so groups overlap. Every user has
+    `notifications_per_user` notifications, half of them unread.
+
+    Args:
+        db (SQLAlchemy): The database of the application.
+        users (int): The number of users.
+        chats_per_user (int): The number of private chats started per user.
+        messages_per_chat (int): The number of messages per conversation.
+        group_size (int): The number of members per group.
+        group_stride (int): The number of users between group starts.
+        notifications_per_user (int): The number of notifications per user.
+
+    Returns:
+        str: The ID of the user the routes are checked as.
+    """
+    from sqlalchemy import insert
+
+    from website.models.conversation import Conversation
+    from website.models.friendship import Friendship
+    from website.models.group import Group, GroupMembership
+    from website.models.message import Message
+    from website.models.notification import Notification
+    from website.models.unread_counter import UnreadCounter
+    from website.models.user import User
+
+    start = datetime.utcnow() - timedelta(days=30)
+    user_ids = [f'user-{i:07d}' for i in range(users)]
+
+    def at(seconds):
+        return start + timedelta(seconds=seconds)
+
+    db.session.execute(insert(User), [{
+        'id': user_id, 'name': user_id, 'phone_number': f'+1{i:010d}',
+        'password': 'x', 'friend_id': f'{i:08d}', 'unread_notifications': 0,
+    } for i, user_id in enumerate(user_ids)])
+
+    conversations, messages, friendships = [], [], []
+    for i, user_id in enumerate(user_ids):
+        for offset in range(1, chats_per_user + 1):
+            other_id = user_ids[(i + offset) % users]
+            chat_id = f'chat-{i:07d}-{offset}'
+            conversations.append({
+                'id': chat_id, 'type': 'private_chat', 'user1_id': user_id,
+                'user2_id': other_id, 'last_message': 'hello',
+                'last_message_date': at(messages_per_chat),
+            })
+            for n in range(messages_per_chat):
+                sender_id, receiver_id = ((user_id, other_id) if n % 2
+                                          else (other_id, user_id))
+                messages.append({
+                    'id': f'{chat_id}-{n:05d}', 'conversation_id': chat_id,
+                    'sender_id': sender_id, 'receiver_id': receiver_id,
+                    'content': 'hello', 'timestamp': at(n),
+                    'is_read': n < messages_per_chat // 2,
+                })
+            friendships.append({
+                'id': f'friendship-{i:07d}-{offset}', 'user_id_1': user_id,
+                'user_id_2': other_id, 'status': 'accepted',
+            })
+        friendships.append({
+            'id': f'friendship-{i:07d}-pending', 'user_id_1': user_id,
+            'user_id_2': user_ids[(i + chats_per_user + 1) % users],
+            'status': 'pending',
+        })
+
+    groups, memberships = [], []
+    for g, first in enumerate(range(0, users, group_stride)):
+        group_id = f'group-{g:06d}'
+        members = [user_ids[(first + n) % users] for n in range(group_size)]
+        groups.append({'id': group_id, 'group_name': group_id,
+                       'owner_id': members[0]})
+        conversations.append({
+            'id': group_id, 'type': 'group', 'group_id': group_id,
+            'user1_id': members[0], 'last_message': 'hello',
+            'last_message_date': at(messages_per_chat),
+        })
+        memberships.extend({'id': group_id, 'user_id': member_id,
+                            'joined_at': start, 'role': 'member'}
+                           for member_id in members)
+        messages.extend({
+            'id': f'{group_id}-{n:05d}', 'conversation_id': group_id,
+            'group_id': group_id, 'sender_id': members[n % len(members)],
+            'content': 'hello', 'timestamp': at(n), 'is_read': False,
+        } for n in range(messages_per_chat))
+
+    notifications = [{
+        'id': f'notification-{i:07d}-{n:04d}', 'user_id': user_id,
+        'type': 'friend_request', 'message': 'hello', 'timestamp': at(n),
+        'is_read': n % 2 == 0,
+    } for i, user_id in enumerate(user_ids)
+        for n in range(notifications_per_user)]
+
+    for model, rows in ((Group, groups), (Conversation, conversations),
+                        (GroupMembership, memberships), (Message, messages),
+                        (Friendship, friendships),
+                        (Notification, notifications)):
+        db.session.execute(insert(model), rows)
+    db.session.commit()
+
+    UnreadCounter.reconcile()
+    Notification.reconcile_unread_counts()
+    return user_ids[0]
+
+
+def record_statements(app, user_id):
+    """
+    Drive the hot routes as a user and record the statements they run.
+
+    Args:
+        app (Flask): The application.
+        user_id (str): The ID of the user the routes are driven as.
+
+    Returns:
+        list: The distinct (statement, parameters) pairs that were run.
+    """
+    from sqlalchemy import event
+
+    from website import db, socketio
+    from website.models.conversation import Conversation
+    from website.models.group import GroupMembership
+
+    with app.app_context():
+        engine = db.engine
+        chat_id = Conversation.query.filter_by(
+            user1_id=user_id, type='private_chat').first().id
+        group_id = GroupMembership.query.filter_by(
+            user_id=user_id).first().id
+
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.setdefault(statement, parameters)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user_id
+        session['_fresh'] = True
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client.get('/dashboard')
+        page = client.get(f'/chats/{chat_id}/history?limit=5').get_json()
+        client.get(f'/chats/{chat_id}/history?limit=5'
+                   f'&before={page["before_cursor"]}')
+        client.get(f'/groups/{group_id}/history')
+        client.get('/notifications')
+        client.get('/api/notifications?unread=true')
+        client.get('/friends')
+        client.get('/api/friends')
+        client.post('/notifications/read', json={'all': True})
+
+        socket = socketio.test_client(app, flask_test_client=client)
+        socket.emit('mark_messages_read', {'conversation_id': chat_id})
+        socket.emit('mark_group_read', {'group_id': group_id})
+        socket.disconnect()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    return [(statement, parameters)
+            for statement, parameters in statements.items()
+            if not statement.lstrip().upper().startswith(('INSERT', 'EXPLAIN',
+                                                          'PRAGMA'))]
+
+
+def full_scans(connection, statement, parameters):
+    """
+    Return the large tables a statement reads whole.
+
+    Args:
+        connection (Connection): A connection to the database.
+        statement (str): The SQL statement.
+        parameters: The parameters the statement was run with.
+
+    Returns:
+        list: The names of the tables that are scanned in full.
+    """
+    if connection.dialect.name == 'sqlite':
+        plan = connection.exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        # "SCAN t" reads the table; "SCAN t USING INDEX i" walks an index
+        return [match.group(1) for *_, detail in plan
+                for match in [re.match(r'SCAN (\w+)(?: AS \w+)?$', detail)]
+                if match and match.group(1) in LARGE_TABLES]
+
+    plan = connection.exec_driver_sql(
+        f'EXPLAIN {statement}', parameters).mappings().all()
+    return [row['table'] for row in plan
+            if row['type'] == 'ALL' and row['table'] in LARGE_TABLES]
+
+
+def check(app, **sizes):
+    """
+    Seed the database of an application and check the plans of its routes.
+
+    Args:
+        app (Flask): The application; its database tables are recreated.
+        **sizes: Dataset sizes passed on to `seed`.
+
+    Returns:
+        list: A (statement, tables) pair for every statement that reads
+            a large table whole; empty when every route uses indexes.
+    """
+    from website import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user_id = seed(db, **sizes)
+
+        # Give the query planner statistics about the seeded data
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'sqlite':
+                connection.exec_driver_sql('ANALYZE')
+            else:
+                connection.exec_driver_sql(
+                    f'ANALYZE TABLE {", ".join(sorted(LARGE_TABLES))}')
+
+    statements = record_statements(app, user_id)
+
+    failures = []
+    with app.app_context(), db.engine.connect() as connection:
+        for statement, parameters in statements:
+            tables = full_scans(connection, statement, parameters)
+            if tables:
+                failures.append((statement, tables))
+    return failures
+
+
+def main(argv=None):
+    """ Run the check from the command line. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=2000,
+                        help='number of users to seed (default: 2000)')
+    parser.add_argument('--database-uri',
+                        help='scratch database to use instead of a '
+                             'temporary SQLite file')
+    args = parser.parse_args(argv)
+
+    os.environ['DATABASE_URI'] = args.database_uri or (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}")
+    os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+
+    from website import create_app
+    app = create_app()
+    app.config.update(TESTING=True, RATE_LIMIT_ENABLED=False)
+
+    failures = check(app, users=args.users)
+    for statement, tables in failures:
+        print(f"Full scan of {', '.join(tables)}:\n{statement}\n")
+    print(f"{len(failures)} statement(s) read a whole table."
+          if failures else "Every statement is served through an index.")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
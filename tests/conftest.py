@@ -0,0 +1,275 @@
+"""
+Shared fixtures of the ChatFlow test suite.
+
+The tests run against a temporary SQLite database, which is created
+before the application is imported, since the configuration reads the
+database URI when it is loaded.
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+from flask.testing import FlaskClient
+from flask_socketio.test_client import SocketIOTestClient
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+_db_dir = tempfile.mkdtemp(prefix='chatflow-tests-')
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+
+from website import create_app, db as _db, socketio  # noqa: E402
+from website.models.conversation import Conversation  # noqa: E402
+from website.models.group import Group  # noqa: E402
+from website.models.user import User  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RequestScopedClient(FlaskClient):
+    """
+    Test client that serves every request in its own application context.
+
+    Flask reuses an application context that is already pushed, which
+    would make requests share the session of the test. A fresh context
+    gives every request its own session, as in production, and the
+    objects of the test are expired afterwards to see its changes.
+    """
+
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            response = super().open(*args, **kwargs)
+        _db.session.expire_all()
+        return response
+
+
+class RequestScopedSocketClient(SocketIOTestClient):
+    """ Socket.IO test client that handles every event in its own context. """
+
+    def connect(self, *args, **kwargs):
+        with self.app.app_context():
+            return super().connect(*args, **kwargs)
+
+    def disconnect(self, *args, **kwargs):
+        with self.app.app_context():
+            return super().disconnect(*args, **kwargs)
+
+    def emit(self, *args, **kwargs):
+        with self.app.app_context():
+            result = super().emit(*args, **kwargs)
+        _db.session.expire_all()
+        return result
+
+
+# Runs with tens of thousands of sockets are opt-in, since they are slow
+load_test = pytest.mark.skipif(not os.getenv('CHATFLOW_LOAD_TESTS'),
+                               reason='set CHATFLOW_LOAD_TESTS=1 to run')
+
+
+@pytest.fixture(scope='session')
+def app():
+    """ The application, configured for testing. """
+    app = create_app()
+    app.config.update(TESTING=True, RATE_LIMIT_ENABLED=False)
+    app.test_client_class = RequestScopedClient
+    return app
+
+
+@pytest.fixture(autouse=True)
+def db(app):
+    """ A fresh database and empty process-local state for every test. """
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        reset_process_state()
+        yield _db
+        _db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    """ A test client of the application. """
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """ The SQL statements executed while the test runs. """
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = _db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def make_user(name, phone_number, password='password'):
+    """ Create and return a user. """
+    user = User(name=name, phone_number=phone_number, password=password)
+    _db.session.add(user)
+    _db.session.commit()
+    return user
+
+
+def make_member(name, phone_number):
+    """ Create a user who can log in with the password 'password'. """
+    return make_user(name, phone_number,
+                     password=generate_password_hash('password'))
+
+
+def make_chat(user1, user2):
+    """ Create and return a private chat between two users. """
+    conversation = Conversation(user1_id=user1.id, user2_id=user2.id,
+                                type='private_chat')
+    _db.session.add(conversation)
+    _db.session.commit()
+    return conversation
+
+
+def make_group(owner, *members):
+    """ Create and return a group with its conversation and members. """
+    group = Group(group_name='group', owner_id=owner.id)
+    _db.session.add(group)
+    _db.session.commit()
+    group.create_group_conversation()
+    for user in (owner, *members):
+        group.add_member(user.id)
+    return group
+
+
+def login(client, user):
+    """ Log a user in on a test client. """
+    with client.session_transaction() as session:
+        session['_user_id'] = user.id
+        session['_fresh'] = True
+
+
+def socket_client(app, client):
+    """ Open a Socket.IO test client sharing the session of a test client. """
+    return RequestScopedSocketClient(app, socketio, flask_test_client=client)
+
+
+def connect_as(app, user_id):
+    """ Open a Socket.IO test client logged in as a user, by ID. """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user_id
+        session['_fresh'] = True
+    return socket_client(app, client)
+
+
+def reset_process_state():
+    """ Empty the process-local caches and registries between tests. """
+    from website.utils.friend_graph import friend_graph
+    from website.utils.group_cache import group_cache
+    from website.utils.message_writer import message_writer
+    from website.utils.notifier import notifications
+    from website.utils.presence import presence
+    from website.utils.presence_audience import presence_audience
+    from website.utils.rate_limit import rate_limiter
+    from website.utils.room_cache import user_rooms
+    from website.utils.send_dedup import send_dedup
+    from website.utils.user_cache import user_display_cache
+
+    for cache in (friend_graph, group_cache, presence_audience, user_rooms,
+                  send_dedup, user_display_cache):
+        cache.clear()
+    presence.__init__()
+    rate_limiter.__init__()
+    notifications._pending.clear()
+    message_writer._queue.clear()
+    message_writer._sends.clear()
+    message_writer._journal_buffer.clear()
+
+
+def free_port():
+    """ Return a TCP port nobody listens on. """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_worker(app, **env):
+    """
+    Start `app.py` in a process using the test database.
+
+    Args:
+        app (Flask): The application of the tests.
+        **env (str): Environment variables of the worker.
+
+    Returns:
+        tuple: The process of the worker and its URL.
+    """
+    import requests
+
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URI=app.config['SQLALCHEMY_DATABASE_URI'],
+               HOST='127.0.0.1', PORT=str(port), FLASK_DEBUG='0',
+               RATE_LIMIT_ENABLED='false',
+               NOTIFICATION_RETENTION_INTERVAL='0', **env)
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{url}/authentication', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    pytest.fail('The worker did not start.')
+
+
+def stop_worker(process):
+    """ Stop a worker started by `start_worker`. """
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class Tab:
+    """ A browser tab: a logged in session with a socket on a worker. """
+
+    def __init__(self, url, user):
+        import requests
+        import socketio
+
+        self.http = requests.Session()
+        self.http.post(f'{url}/authentication', data={
+            'phone_number': user.phone_number, 'password': 'password'})
+        self.events = []
+        self.socket = socketio.Client(reconnection=False)
+        self.socket.on('*', lambda name, *args: self.events.append(
+            (name, args[0] if args else None)))
+        cookies = '; '.join(f'{name}={value}' for name, value
+                            in self.http.cookies.items())
+        self.socket.connect(url, headers={'Cookie': cookies},
+                            transports=['websocket'], wait_timeout=10)
+
+    def wait_for(self, predicate, timeout=15):
+        """ Wait for a received event matching a predicate. """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for name, data in self.events:
+                if predicate(name, data):
+                    return data
+            time.sleep(0.05)
+        return None
+
+    def close(self):
+        """ Close the socket of the tab. """
+        self.socket.disconnect()
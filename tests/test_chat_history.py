@@ -0,0 +1,84 @@
+""" Tests of the paginated private chat history. """
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from website import db
+from website.models.message import Message
+
+from conftest import login, make_chat, make_user
+
+
+def add_messages(conversation, sender, receiver, count):
+    """ Add `count` messages, one second apart, to a conversation. """
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(Message), [{
+        'id': f'{conversation.id}-{i:06d}',
+        'conversation_id': conversation.id,
+        'sender_id': sender.id,
+        'receiver_id': receiver.id,
+        'content': f'message {i}',
+        'timestamp': start + timedelta(seconds=i // 2),
+        'is_read': False,
+    } for i in range(count)])
+    db.session.commit()
+
+
+def test_history_pages_cover_the_conversation_once(client):
+    """ Walking back through the pages returns every message once. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    add_messages(chat, alice, bob, 250)
+    login(client, bob)
+
+    seen = []
+    url = f'/chats/{chat.id}/history?limit=40'
+    while True:
+        page = client.get(url).get_json()
+        assert len(page['messages']) <= 40
+        seen = [m['content'] for m in page['messages']] + seen
+        if not page['has_more']:
+            break
+        url = (f'/chats/{chat.id}/history?limit=40'
+               f'&before={page["before_cursor"]}')
+
+    assert seen == [f'message {i}' for i in range(250)]
+
+
+def test_history_page_cost_does_not_grow_with_the_conversation(
+        client, queries):
+    """ A page of a long chat fetches as many rows as one of a short chat. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    carol = make_user('carol', '+15550000003')
+    short_chat = make_chat(alice, bob)
+    long_chat = make_chat(alice, carol)
+    add_messages(short_chat, bob, alice, 60)
+    add_messages(long_chat, carol, alice, 3000)
+    login(client, alice)
+
+    counts = []
+    for chat in (short_chat, long_chat):
+        queries.clear()
+        page = client.get(f'/chats/{chat.id}/history?limit=50').get_json()
+        assert len(page['messages']) == 50
+        assert page['has_more']
+        counts.append(len(queries))
+    assert counts[0] == counts[1]
+
+    # The second page also starts from the cursor, not from the oldest row
+    page = client.get(f'/chats/{long_chat.id}/history?limit=50'
+                      f'&before={page["before_cursor"]}').get_json()
+    assert page['messages'][-1]['content'] == 'message 2949'
+
+
+def test_history_rejects_a_malformed_cursor(client):
+    """ A malformed cursor is a client error. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    login(client, alice)
+
+    response = client.get(f'/chats/{chat.id}/history?before=not-a-cursor')
+    assert response.status_code == 400
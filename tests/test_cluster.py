@@ -0,0 +1,242 @@
+""" Tests of several workers sharing a Redis server. """
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from website import db
+from website.models.friendship import Friendship
+from website.models.user import User
+
+from conftest import (Tab, make_chat, make_group, make_member, start_worker,
+                      stop_worker)
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('requests')
+pytest.importorskip('websocket')
+
+
+@pytest.fixture(scope='module')
+def redis_url():
+    """ The URL of a Redis stand-in shared by the workers. """
+    server = fakeredis.TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'redis://127.0.0.1:{server.server_address[1]}/0'
+    server.shutdown()
+    server.server_close()
+
+
+def start_cluster_worker(app, redis_url):
+    """ Start a worker sharing the database and Redis server. """
+    return start_worker(app, SOCKETIO_MESSAGE_QUEUE=redis_url,
+                        PRESENCE_FLUSH_INTERVAL='1',
+                        PRESENCE_SWEEP_INTERVAL='2')
+
+
+@pytest.fixture(scope='module')
+def workers(app, redis_url):
+    """ The URLs of two workers sharing the database and Redis. """
+    started = [start_cluster_worker(app, redis_url) for _ in range(2)]
+    yield [url for _, url in started]
+    for process, _ in started:
+        stop_worker(process)
+
+
+def befriend(user1, user2):
+    """ Make two users friends. """
+    db.session.add(Friendship(user_id_1=user1.id, user_id_2=user2.id,
+                              status='accepted'))
+    db.session.commit()
+
+
+def status_of(user_id):
+    """ Return the status of a user stored in the database. """
+    db.session.expire_all()
+    return db.session.get(User, user_id).status
+
+
+def wait_until(condition, timeout=15):
+    """ Wait for a condition to hold and return whether it did. """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def is_status(user_id, status):
+    """ Return a predicate matching a presence change of a user. """
+    return lambda event, data: (event == 'status_update' and
+                                data == {'user_id': user_id,
+                                         'status': status})
+
+
+def test_message_reaches_a_socket_on_another_worker(workers):
+    """ A message sent on one worker is delivered on the other. """
+    alice = make_member('alice', '+15550000001')
+    bob = make_member('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    sender, receiver = Tab(workers[0], alice), Tab(workers[1], bob)
+    try:
+        ack = sender.socket.call('send_message', {
+            'conversation_id': chat.id, 'message': 'hello'}, timeout=10)
+
+        created = receiver.wait_for(
+            lambda event, data: event == 'message_created')
+        assert created['message']['id'] == ack['message_id']
+        assert created['message']['content'] == 'hello'
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_user_stays_online_while_a_tab_is_open_on_any_worker(workers):
+    """ Closing one of two tabs, on different workers, keeps a user online. """
+    alice = make_member('alice', '+15550000003')
+    bob = make_member('bob', '+15550000004')
+    befriend(alice, bob)
+    watcher = Tab(workers[1], bob)
+    first, second = Tab(workers[0], alice), Tab(workers[1], alice)
+    try:
+        assert watcher.wait_for(is_status(alice.id, 'online'))
+
+        first.close()
+        time.sleep(2)
+        assert not watcher.wait_for(is_status(alice.id, 'offline'),
+                                    timeout=0)
+        assert status_of(alice.id) == 'online'
+
+        second.close()
+        assert watcher.wait_for(is_status(alice.id, 'offline'))
+        assert wait_until(lambda: status_of(alice.id) == 'offline')
+    finally:
+        watcher.close()
+
+
+def test_users_of_a_crashed_worker_are_marked_offline(app, redis_url,
+                                                      workers):
+    """ Another worker sweeps the users of a killed worker offline. """
+    alice = make_member('alice', '+15550000005')
+    bob = make_member('bob', '+15550000006')
+    befriend(alice, bob)
+    process, url = start_cluster_worker(app, redis_url)
+    try:
+        watcher = Tab(workers[0], bob)
+        Tab(url, alice)
+        assert watcher.wait_for(is_status(alice.id, 'online'))
+        assert wait_until(lambda: status_of(alice.id) == 'online')
+
+        os.kill(process.pid, signal.SIGKILL)
+
+        assert watcher.wait_for(is_status(alice.id, 'offline'), timeout=20)
+        assert wait_until(lambda: status_of(alice.id) == 'offline')
+        watcher.close()
+    finally:
+        stop_worker(process)
+
+
+def test_kicked_member_cannot_send_through_another_worker(workers):
+    """ A member kicked on one worker is refused by the other at once. """
+    owner = make_member('owner', '+15550000007')
+    bob = make_member('bob', '+15550000008')
+    group = make_group(owner, bob)
+    admin, member = Tab(workers[0], owner), Tab(workers[1], bob)
+    try:
+        message = {'group_id': group.id, 'content': 'hello'}
+        assert 'message_id' in member.socket.call(
+            'send_group_message', message, timeout=10)
+
+        response = admin.http.post(
+            f'{workers[0]}/group/{group.id}/kick_member',
+            json={'member_id': bob.id})
+        assert response.status_code == 200
+
+        assert member.socket.call('send_group_message', message,
+                                  timeout=10) == {
+            'error': 'You are not a member of this group'}
+    finally:
+        admin.close()
+        member.close()
+
+
+def test_added_member_joins_the_group_room_on_every_worker(workers):
+    """ Sockets of a new member, on any worker, get the group's messages. """
+    owner = make_member('owner', '+15550000009')
+    bob = make_member('bob', '+15550000010')
+    group = make_group(owner)
+    admin, member = Tab(workers[0], owner), Tab(workers[1], bob)
+    try:
+        response = admin.http.post(
+            f'{workers[0]}/group/{group.id}/add_member',
+            json={'members': [bob.id]})
+        assert response.status_code == 200
+        # Let the other worker receive the cache invalidation
+        time.sleep(0.5)
+        new_tab = Tab(workers[1], bob)
+
+        admin.socket.call('send_group_message', {
+            'group_id': group.id, 'content': 'welcome'}, timeout=10)
+
+        def is_welcome(event, data):
+            return (event == 'new_group_message' and
+                    data['content'] == 'welcome')
+        assert member.wait_for(is_welcome)
+        assert new_tab.wait_for(is_welcome)
+        new_tab.close()
+    finally:
+        admin.close()
+        member.close()
+
+
+def test_removed_friend_disappears_on_every_worker(workers):
+    """ A friendship removed on one worker is dropped by the other. """
+    alice = make_member('alice', '+15550000011')
+    bob = make_member('bob', '+15550000012')
+    befriend(alice, bob)
+    friendship_id = Friendship.query.filter_by(user_id_1=alice.id).one().id
+    remover, other = Tab(workers[0], alice), Tab(workers[1], bob)
+    try:
+        friends = other.http.get(f'{workers[1]}/api/friends').json()
+        assert [friend['id'] for friend in friends['friends']] == [alice.id]
+
+        remover.http.post(f'{workers[0]}/remove_friend/{friendship_id}')
+        # Let the other worker receive the cache invalidation
+        time.sleep(0.5)
+
+        assert other.http.get(
+            f'{workers[1]}/api/friends').status_code == 404
+    finally:
+        remover.close()
+        other.close()
+
+
+def test_rename_reaches_the_display_cache_of_every_worker(workers):
+    """ A name changed on one worker is used by the other's next send. """
+    alice = make_member('alice', '+15550000013')
+    group = make_group(alice)
+    editor, sender = Tab(workers[0], alice), Tab(workers[1], alice)
+    try:
+        def sent_name(content):
+            sender.socket.call('send_group_message', {
+                'group_id': group.id, 'content': content}, timeout=10)
+            return sender.wait_for(
+                lambda event, data: event == 'new_group_message' and
+                data['content'] == content)['sender_name']
+
+        # Cache the name on the sending worker
+        assert sent_name('before') == 'alice'
+
+        response = editor.http.post(
+            f'{workers[0]}/update_profile',
+            json={'field': 'name', 'value': 'Alice Smith'})
+        assert response.json() == {'success': True}
+        # Let the other worker receive the cache invalidation
+        time.sleep(0.5)
+
+        assert sent_name('after') == 'Alice Smith'
+    finally:
+        editor.close()
+        sender.close()
@@ -0,0 +1,87 @@
+""" Tests of the in-memory friend graph. """
+import time
+
+from sqlalchemy import insert
+
+from website import db
+from website.models.friendship import Friendship
+from website.models.user import User
+from website.utils.friend_graph import FriendGraph, friend_graph
+
+from conftest import make_user
+
+USERS = 20000
+FRIENDS_PER_USER = 5
+
+
+def seed_graph():
+    """ Create 100k accepted friendships between 20k users. """
+    user_ids = [f'user-{i:06d}' for i in range(USERS)]
+    db.session.execute(insert(User), [{
+        'id': user_id, 'name': user_id, 'phone_number': f'+1{i:010d}',
+        'password': 'x', 'friend_id': f'{i:08d}',
+    } for i, user_id in enumerate(user_ids)])
+    db.session.execute(insert(Friendship), [{
+        'id': f'friendship-{i:06d}-{offset}', 'user_id_1': user_id,
+        'user_id_2': user_ids[(i + offset) % USERS], 'status': 'accepted',
+    } for i, user_id in enumerate(user_ids)
+        for offset in range(1, FRIENDS_PER_USER + 1)])
+    db.session.commit()
+    return user_ids
+
+
+def test_lookups_at_100k_edges():
+    """ Friend lists and pair lookups are served from memory. """
+    user_ids = seed_graph()[:2000]
+    pairs = [(user_id, user_ids[(i + 3) % len(user_ids)])
+             for i, user_id in enumerate(user_ids)]
+
+    # The OR queries over friendships run before the graph
+    start = time.perf_counter()
+    expected = {user_id: FriendGraph._load(user_id) for user_id in user_ids}
+    from_database = time.perf_counter() - start
+
+    for user_id in user_ids:
+        friend_graph.get(user_id)
+
+    start = time.perf_counter()
+    friends = {user_id: friend_graph.friends(user_id)
+               for user_id in user_ids}
+    statuses = [friend_graph.status(*pair) for pair in pairs]
+    in_memory = time.perf_counter() - start
+
+    print(f"{len(user_ids)} friend lists at "
+          f"{USERS * FRIENDS_PER_USER} edges: "
+          f"{from_database * 1000:.0f} ms from the database, "
+          f"{in_memory * 1000:.1f} ms with {len(pairs)} pair lookups "
+          f"from the graph")
+    assert all(sorted(friends[user_id]) == sorted(expected[user_id])
+               for user_id in user_ids)
+    assert all(len(friends[user_id]) == 2 * FRIENDS_PER_USER
+               for user_id in user_ids)
+    assert statuses == [expected[a].get(b) for a, b in pairs]
+    assert in_memory < from_database / 10
+
+
+def test_changes_update_the_loaded_graph():
+    """ Accepting, blocking and removing update both users' friendships. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    friendship = Friendship(user_id_1=alice.id, user_id_2=bob.id)
+    db.session.add(friendship)
+    db.session.commit()
+    assert friend_graph.status(bob.id, alice.id) == 'pending'
+
+    friendship.accept_request()
+    assert Friendship.get_friends(alice.id) == [bob.id]
+    assert bob.check_friendship_status(alice.id) == 'accepted'
+
+    friendship.block_user()
+    assert Friendship.get_friends(bob.id) == []
+    assert alice.check_friendship_status(bob.id) == 'blocked'
+
+    friendship.unblock_user()
+    friendship.accept_request()
+    friendship.remove_friendship()
+    assert alice.check_friendship_status(bob.id) is None
+    assert Friendship.get_friends(bob.id) == []
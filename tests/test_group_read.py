@@ -0,0 +1,85 @@
+""" Tests of the group read watermarks. """
+from datetime import datetime
+
+from website import db
+from website.models.group import Group, GroupMembership
+from website.models.message import Message
+
+from conftest import connect_as, make_group, make_user
+
+
+def add_group_message(group, sender, message_id, timestamp):
+    """ Add a message with a given ID and timestamp to a group. """
+    db.session.add(Message(id=message_id, conversation_id=group.id,
+                           group_id=group.id, sender_id=sender.id,
+                           content=message_id, timestamp=timestamp))
+    db.session.commit()
+
+
+def test_messages_sharing_the_watermark_timestamp_are_counted():
+    """ Messages with the timestamp of the watermark are ordered by ID. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    group = make_group(alice, bob)
+    GroupMembership.query.update({GroupMembership.joined_at:
+                                  datetime(2024, 1, 1)})
+    db.session.commit()
+
+    same_time = datetime(2024, 1, 2, 12, 0, 0)
+    add_group_message(group, alice, 'a', same_time)
+    assert Group.get_unread_counts(bob.id) == {group.id: 1}
+
+    assert GroupMembership.mark_read(group.id, bob.id).id == 'a'
+    db.session.commit()
+    assert Group.get_unread_counts(bob.id) == {}
+
+    # A later message stored with the same timestamp is still unread
+    add_group_message(group, alice, 'b', same_time)
+    assert Group.get_unread_counts(bob.id) == {group.id: 1}
+
+    # and reading it moves the watermark forward within the same timestamp
+    assert GroupMembership.mark_read(group.id, bob.id).id == 'b'
+    db.session.commit()
+    assert Group.get_unread_counts(bob.id) == {}
+
+
+def test_watermark_keeps_microseconds():
+    """ Messages a fraction of a second apart are told apart. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    group = make_group(alice, bob)
+
+    add_group_message(group, alice, 'z', datetime(2030, 1, 1, 0, 0, 0, 100))
+    GroupMembership.mark_read(group.id, bob.id)
+    db.session.commit()
+    add_group_message(group, alice, 'y', datetime(2030, 1, 1, 0, 0, 0, 200))
+
+    membership = GroupMembership.query.filter_by(id=group.id,
+                                                 user_id=bob.id).one()
+    assert membership.last_read_at.microsecond == 100
+    assert Group.get_unread_counts(bob.id) == {group.id: 1}
+
+
+def test_outsiders_cannot_mark_a_group_read(app):
+    """ A non-member is refused, and nothing is emitted or moved. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    mallory = make_user('mallory', '+15550000003')
+    group = make_group(alice, bob)
+    add_group_message(group, alice, 'a', datetime(2030, 1, 1))
+
+    member = connect_as(app, bob.id)
+    outsider = connect_as(app, mallory.id)
+    member.get_received()
+
+    ack = outsider.emit('mark_group_read', {'group_id': group.id},
+                        callback=True)
+    assert ack == {'error': 'You are not a member of this group'}
+    assert 'last_read_message_id' not in ack
+    assert not any(event['name'] == 'group_read'
+                   for event in member.get_received())
+    assert Group.get_unread_counts(bob.id) == {group.id: 1}
+
+    ack = member.emit('mark_group_read', {'group_id': group.id},
+                      callback=True)
+    assert ack == {'last_read_message_id': 'a'}
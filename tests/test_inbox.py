@@ -0,0 +1,40 @@
+""" Tests of the dashboard inbox read path. """
+from website import db
+from website.models.conversation import Conversation
+from website.models.message import Message
+from website.models.unread_counter import UnreadCounter
+
+from conftest import login, make_user
+
+
+def add_chats(user, count, start=0):
+    """ Give a user `count` private chats with three unread messages. """
+    for i in range(start, start + count):
+        friend = make_user(f'friend{i}', f'+1666{i:07d}')
+        conversation = Conversation(user1_id=user.id, user2_id=friend.id,
+                                    type='private_chat')
+        db.session.add(conversation)
+        db.session.flush()
+        for _ in range(3):
+            db.session.add(Message(conversation_id=conversation.id,
+                                   sender_id=friend.id, receiver_id=user.id,
+                                   content='hi'))
+        UnreadCounter.increment(user.id, conversation.id, 3)
+    db.session.commit()
+
+
+def test_dashboard_query_count_is_flat(client, queries):
+    """ The dashboard runs as many queries for 50 chats as for 5. """
+    user = make_user('me', '+15550000000')
+    login(client, user)
+
+    counts = []
+    for start, added in ((0, 5), (5, 45)):
+        add_chats(user, added, start=start)
+        queries.clear()
+        response = client.get('/dashboard')
+        assert response.status_code == 200
+        assert response.data.count(b'unread-count">3') == start + added
+        counts.append(len(queries))
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,90 @@
+""" Tests that long-lived socket workers do not accumulate memory. """
+import gc
+import os
+
+import pytest
+
+from website import db
+from website.utils.bounded_cache import BoundedCache
+
+from conftest import connect_as, login, make_chat, make_user, socket_client
+
+STATM = '/proc/self/statm'
+
+
+def resident_size():
+    """ Return the resident memory of the process in bytes. """
+    with open(STATM) as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def live_models():
+    """ Return the number of ORM instances alive in the process. """
+    gc.collect()
+    return sum(isinstance(obj, db.Model) for obj in gc.get_objects())
+
+
+@pytest.fixture
+def identity_maps(monkeypatch):
+    """ The identity map size of every session removed by a handler. """
+    sizes = []
+    remove = db.session.remove
+
+    def record_and_remove():
+        sizes.append(len(db.session.identity_map))
+        remove()
+
+    monkeypatch.setattr(db.session, 'remove', record_and_remove)
+    return sizes
+
+
+@pytest.mark.skipif(not os.path.exists(STATM), reason='needs /proc')
+def test_thousands_of_events_keep_memory_flat(app, client, identity_maps):
+    """ Identity maps, live ORM objects and RSS stay flat over events. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat_id = make_chat(alice, bob).id
+    login(client, alice)
+    socket = socket_client(app, client)
+
+    def run_events(count, offset):
+        for n in range(offset, offset + count):
+            socket.emit('send_message', {
+                'conversation_id': chat_id, 'message': f'message {n}',
+                'client_message_id': f'client-{n}'}, callback=True)
+            socket.emit('mark_messages_read', {'conversation_id': chat_id})
+            socket.emit('status_update', {'status': 'online'})
+            socket.get_received()
+
+    # Warm up the caches, the statement cache and the allocator
+    run_events(1000, 0)
+    models_before, rss_before = live_models(), resident_size()
+    identity_maps.clear()
+
+    run_events(2000, 1000)
+    models_after, rss_after = live_models(), resident_size()
+    socket.disconnect()
+
+    print(f"6000 events: largest identity map {max(identity_maps)}, "
+          f"{models_before} -> {models_after} live ORM objects, RSS "
+          f"{rss_before / 2**20:.1f} -> {rss_after / 2**20:.1f} MiB")
+    assert max(identity_maps) <= 5
+    assert models_after <= models_before
+    assert rss_after - rss_before < 8 * 2**20
+
+
+def test_caches_are_bounded(app, monkeypatch):
+    """ Connecting many users never grows a cache past its bound. """
+    for cache in BoundedCache.instances:
+        monkeypatch.setattr(cache, 'max_entries', 50)
+
+    users = [make_user(f'user{i}', f'+1666{i:07d}') for i in range(200)]
+    for user, other in zip(users, users[1:]):
+        make_chat(user, other)
+    for user in users:
+        socket = connect_as(app, user.id)
+        socket.emit('status_update', {'status': 'online'})
+        socket.disconnect()
+
+    assert all(len(cache) <= 50 for cache in BoundedCache.instances)
+    assert any(len(cache) == 50 for cache in BoundedCache.instances)
@@ -0,0 +1,63 @@
+""" Tests of the events emitted for a new message. """
+from datetime import datetime, timedelta
+
+from website import db
+from website.models.message import Message
+
+from conftest import connect_as, make_chat, make_group, make_user
+
+MESSAGES = 10
+
+
+def test_one_event_per_message_and_no_history_refetch(app, client):
+    """
+    Each message reaches both clients as one self-contained event.
+
+    The former chat_history_update event made every open chat download
+    its whole history again, one HTTP request per client per message.
+    """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    sockets = [connect_as(app, alice.id), connect_as(app, bob.id)]
+    for socket in sockets:
+        socket.get_received()
+
+    for i in range(MESSAGES):
+        sockets[0].emit('send_message', {
+            'conversation_id': chat.id, 'message': f'message {i}',
+            'client_message_id': f'message-{i}'}, callback=True)
+
+    for socket in sockets:
+        # No chat_history_update, so no history request per message
+        events = socket.get_received()
+        assert [event['name'] for event in events] == (
+            ['message_created'] * MESSAGES)
+
+        # The event updates the open chat and the inbox on its own
+        payload = events[-1]['args'][0]
+        assert payload['version'] == 1
+        assert payload['message']['content'] == f'message {MESSAGES - 1}'
+        assert payload['message']['sender_id'] == alice.id
+        assert payload['message']['receiver_id'] == bob.id
+        assert payload['conversation']['last_message'] == (
+            f'message {MESSAGES - 1}')
+
+
+def test_group_message_carries_the_stored_utc_timestamp(app):
+    """ The emitted timestamp is the persisted one, in UTC. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    group = make_group(alice, bob)
+    receiver = connect_as(app, bob.id)
+    receiver.get_received()
+
+    ack = connect_as(app, alice.id).emit('send_group_message', {
+        'group_id': group.id, 'content': 'hello'}, callback=True)
+
+    payload = next(event['args'][0] for event in receiver.get_received()
+                   if event['name'] == 'new_group_message')
+    timestamp = datetime.fromisoformat(payload['timestamp'])
+    stored = db.session.get(Message, ack['message_id']).timestamp
+    assert timestamp.utcoffset() == timedelta(0)
+    assert timestamp.replace(tzinfo=None) == stored
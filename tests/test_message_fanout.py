@@ -0,0 +1,50 @@
+""" Load tests of the delivery of private messages. """
+import json
+
+import pytest
+from sqlalchemy import insert
+
+from website import db
+from website.models.user import User
+
+from conftest import connect_as, load_test, make_chat, make_user
+
+
+def received(sockets):
+    """ Return the frames and bytes the sockets received since last asked. """
+    events = [event for socket in sockets for event in socket.get_received()]
+    return len(events), sum(len(json.dumps(event['args'])) for event in events)
+
+
+@pytest.mark.parametrize('users', [
+    100, 1000, pytest.param(10000, marks=load_test)])
+def test_message_reaches_only_its_participants(app, users):
+    """ A message costs the same frames and bytes however many are online. """
+    db.session.execute(insert(User), [{
+        'id': f'user-{i:06d}', 'name': f'user {i}',
+        'phone_number': f'+1{i:010d}', 'password': 'x',
+        'friend_id': f'{i:08d}',
+    } for i in range(users)])
+    db.session.commit()
+    alice = make_user('alice', '+19999999998')
+    bob = make_user('bob', '+19999999999')
+    chat = make_chat(alice, bob)
+
+    bystanders = [connect_as(app, f'user-{i:06d}') for i in range(users)]
+    sender = connect_as(app, alice.id)
+    receiver = connect_as(app, bob.id)
+    received(bystanders + [sender, receiver])
+
+    ack = sender.emit('send_message', {
+        'conversation_id': chat.id, 'sender_id': alice.id,
+        'receiver_id': bob.id, 'message': 'hello' * 20,
+        'client_message_id': 'message-1',
+    }, callback=True)
+    assert 'message_id' in ack
+
+    assert received(bystanders) == (0, 0)
+    frames, size = received([receiver])
+    assert frames == 1
+    # One message_created event, whose size does not depend on the users
+    assert size < 1000
+    assert received([sender])[0] == 1
@@ -0,0 +1,102 @@
+""" Tests of the write-behind message persistence. """
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from website import db
+from website.models.message import Message
+from website.utils.message_writer import MessageWriteBehind, message_writer
+from website.utils.send_dedup import send_dedup
+
+from conftest import login, make_chat, make_user, socket_client
+
+
+@pytest.fixture
+def chat():
+    """ A private chat between alice and bob. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    return make_chat(alice, bob)
+
+
+@pytest.fixture
+def write_behind(app):
+    """ Enable write-behind without starting its background task. """
+    app.config['MESSAGE_WRITE_BEHIND'] = True
+    message_writer._started = True
+    yield message_writer
+    app.config['MESSAGE_WRITE_BEHIND'] = False
+
+
+def message_row(chat, client_message_id=None, **values):
+    """ Build a message row of the chat sent by its first user. """
+    return {'id': str(uuid4()), 'conversation_id': chat.id,
+            'sender_id': chat.user1_id, 'receiver_id': chat.user2_id,
+            'content': 'hello', 'timestamp': datetime.utcnow(),
+            'client_message_id': client_message_id, **values}
+
+
+def test_retry_of_a_queued_send_is_not_emitted_again(
+        app, client, chat, write_behind):
+    """ A retry that left the dedup window finds its original in the queue. """
+    login(client, chat.user1)
+    sender = socket_client(app, client)
+    payload = {'conversation_id': chat.id, 'sender_id': chat.user1_id,
+               'receiver_id': chat.user2_id, 'message': 'hello',
+               'client_message_id': 'retry-me'}
+
+    first = sender.emit('send_message', payload, callback=True)
+    sender.get_received()
+    send_dedup.clear()
+    second = sender.emit('send_message', payload, callback=True)
+
+    assert second == first
+    assert not [e for e in sender.get_received()
+                if e['name'] == 'message_created']
+    assert write_behind.pending() == 1
+
+    write_behind.flush()
+    assert Message.query.count() == 1
+
+
+def test_row_by_row_retry_tells_duplicates_from_errors(chat, capsys):
+    """ Duplicates are dropped quietly, other integrity errors are errors. """
+    writer = MessageWriteBehind()
+    original = message_row(chat, 'sent-twice')
+    writer.submit(original)
+    writer.flush()
+
+    good = message_row(chat)
+    writer.submit(message_row(chat, 'sent-twice'))
+    writer.submit(message_row(chat, content=None))
+    writer.submit(good)
+    assert writer.flush() == 1
+
+    output = capsys.readouterr().out
+    assert 'Dropped duplicate message' in output
+    assert 'Error: dropped message' in output
+    assert writer.pending() == 0
+    assert db.session.get(Message, good['id'])
+    assert Message.query.count() == 2
+
+
+def test_journal_is_synced_in_batches_and_recovered(chat, tmp_path):
+    """ Queued messages reach the journal on sync and survive a crash. """
+    journal = tmp_path / 'journal'
+    writer = MessageWriteBehind()
+    writer.journal_path = str(journal)
+    rows = [message_row(chat) for _ in range(3)]
+    for row in rows:
+        writer.submit(row)
+    assert not journal.exists()
+
+    writer.sync_journal()
+    assert len(journal.read_text().splitlines()) == 3
+
+    # A new process replays the journal of the crashed one
+    recovering = MessageWriteBehind()
+    recovering.journal_path = str(journal)
+    assert recovering.recover() == 3
+    assert journal.read_text() == ''
+    assert Message.query.count() == 3
@@ -0,0 +1,268 @@
+""" Tests of the coalescing, batching and routes of notifications. """
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from website import db
+from website.models.notification import Notification
+from website.models.user import User
+from website.routes.notification_routes import MAX_BULK_IDS
+from website.utils.notifier import notifications
+
+from conftest import connect_as, load_test, login, make_user
+
+
+@pytest.fixture
+def pipeline(app):
+    """ The notification pipeline, without its background task. """
+    notifications._started = True
+    yield notifications
+    notifications._pending.clear()
+
+
+def test_burst_of_friend_requests_is_one_notification(app, pipeline,
+                                                      queries):
+    """ 50 friend requests in a window make one row and one frame. """
+    recipient = make_user('recipient', '+15550000000')
+    socket = connect_as(app, recipient.id)
+    socket.get_received()
+
+    for i in range(50):
+        sender = make_user(f'sender{i}', f'+1666{i:07d}')
+        client = app.test_client()
+        login(client, sender)
+        client.post('/add_friend', data={'friend_id': recipient.friend_id})
+
+    queries.clear()
+    assert pipeline.flush() == 1
+
+    rows = Notification.query.filter_by(user_id=recipient.id).all()
+    assert [row.message for row in rows] == [
+        'You have 50 new friend requests.']
+    assert db.session.get(User, recipient.id).unread_notifications == 1
+    assert len([s for s in queries
+                if s.startswith('INSERT INTO notifications')]) == 1
+
+    frames = [event for event in socket.get_received()
+              if event['name'] == 'new_notification']
+    assert len(frames) == 1
+    assert len(frames[0]['args'][0]['notifications']) == 1
+
+
+@pytest.fixture
+def commits(app):
+    """ The number of transactions committed while the test runs. """
+    committed = []
+
+    def record(conn):
+        committed.append(conn)
+
+    engine = db.engine
+    event.listen(engine, 'commit', record)
+    yield committed
+    event.remove(engine, 'commit', record)
+
+
+def queue_burst(pipeline, recipient_ids, senders=10):
+    """ Queue a friend request from every sender to every recipient. """
+    for n in range(senders):
+        for user_id in recipient_ids:
+            pipeline.notify(user_id, 'friend_request',
+                            f'sender{n} has sent you a friend request.',
+                            summary='You have {count} new friend requests.')
+    return senders * len(recipient_ids)
+
+
+def test_burst_is_written_in_one_batch(app, pipeline, queries, commits):
+    """ 2000 notifications cost one INSERT, one UPDATE and one commit. """
+    recipient_ids = [make_user(f'user{i}', f'+1666{i:07d}').id
+                     for i in range(200)]
+    queries.clear()
+    commits.clear()
+
+    queue_burst(pipeline, recipient_ids)
+    assert not queries
+
+    assert pipeline.flush() == len(recipient_ids)
+    assert len(queries) == 2
+    assert queries[0].startswith('INSERT INTO notifications')
+    assert queries[1].startswith('UPDATE users')
+    assert len(commits) == 1
+    assert {user.unread_notifications for user in User.query} == {1}
+
+
+@load_test
+def test_burst_throughput(app, pipeline):
+    """ Batching a burst beats writing every notification on its own. """
+    recipient_ids = [make_user(f'user{i}', f'+1666{i:07d}').id
+                     for i in range(200)]
+
+    start = time.perf_counter()
+    count = queue_burst(pipeline, recipient_ids)
+    written = pipeline.flush()
+    batched = time.perf_counter() - start
+
+    # One row and one commit per event, as before the pipeline
+    start = time.perf_counter()
+    for n in range(10):
+        for user_id in recipient_ids:
+            db.session.add(Notification(
+                user_id=user_id, type='friend_request',
+                message=f'sender{n} has sent you a friend request.'))
+            db.session.commit()
+    one_by_one = time.perf_counter() - start
+
+    print(f"{count} notifications: {count / batched:.0f}/s "
+          f"batched into {written} rows, {count / one_by_one:.0f}/s "
+          f"one by one")
+    assert written == len(recipient_ids)
+    assert batched < one_by_one
+
+
+def test_api_pages_through_notifications(client):
+    """ The JSON API walks every notification once, newest first. """
+    user = make_user('alice', '+15550000001')
+    for n in range(5):
+        db.session.add(Notification(user_id=user.id, type='info',
+                                    message=f'notification {n}'))
+    db.session.commit()
+    Notification.reconcile_unread_counts()
+    login(client, user)
+
+    messages, cursor = [], None
+    while True:
+        page = client.get('/api/notifications?limit=2' +
+                          (f'&before={cursor}' if cursor else '')).get_json()
+        messages.extend(n['message'] for n in page['notifications'])
+        assert page['unread_count'] == 5
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            break
+
+    assert sorted(messages) == [f'notification {n}' for n in range(5)]
+    assert len(set(messages)) == 5
+    assert client.get('/notifications').mimetype == 'text/html'
+
+
+def add_notifications(user, count, start=datetime(2024, 1, 1)):
+    """ Add unread notifications one minute apart, oldest first. """
+    db.session.add_all(Notification(user_id=user.id, type='info',
+                                    message=f'notification {n}',
+                                    timestamp=start + timedelta(minutes=n))
+                       for n in range(count))
+    db.session.commit()
+    Notification.reconcile_unread_counts()
+
+
+def ids_of(user):
+    """ The IDs of a user's notifications, oldest first. """
+    return [notification_id for notification_id, in db.session.query(
+        Notification.id).filter_by(user_id=user.id).order_by(
+        Notification.timestamp)]
+
+
+def unread(user):
+    """ The unread counter and the unread rows of a user. """
+    counter = db.session.get(User, user.id).unread_notifications
+    rows = Notification.query.filter_by(user_id=user.id,
+                                        is_read=False).count()
+    return counter, rows
+
+
+@pytest.fixture
+def owners(client):
+    """ Alice, logged in with 5 notifications, and Bob with 2. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    add_notifications(alice, 5)
+    add_notifications(bob, 2)
+    login(client, alice)
+    return alice, bob
+
+
+@pytest.mark.parametrize('selection, selected', [
+    (lambda ids: {'ids': ids[:2]}, 2),
+    (lambda ids: {'before': '2024-01-01T00:02:00'}, 3),
+    (lambda ids: {'before': '2024-01-01T01:02:00+01:00'}, 3),
+    (lambda ids: {'all': True}, 5),
+])
+def test_bulk_read_marks_the_selection(client, owners, selection, selected):
+    """ Each selection marks its notifications and adjusts the counter. """
+    alice, bob = owners
+    body = selection(ids_of(alice))
+
+    response = client.post('/notifications/read', json=body)
+    assert response.get_json() == {'success': True, 'updated': selected}
+    assert unread(alice) == (5 - selected, 5 - selected)
+
+    # Marking them again changes nothing
+    response = client.post('/notifications/read', json=body)
+    assert response.get_json()['updated'] == 0
+    assert unread(alice) == (5 - selected, 5 - selected)
+    assert Notification.query.count() == 7
+
+
+@pytest.mark.parametrize('selection, selected', [
+    (lambda ids: {'ids': ids[:2]}, 2),
+    (lambda ids: {'before': '2024-01-01T00:02:00'}, 3),
+    (lambda ids: {'all': True}, 5),
+])
+def test_bulk_delete_removes_the_selection(client, owners, selection,
+                                           selected):
+    """ Deleting unread notifications takes them off the counter. """
+    alice, bob = owners
+    # A read notification is deleted without touching the counter
+    client.post('/notifications/read',
+                json={'ids': ids_of(alice)[:1]})
+    assert unread(alice) == (4, 4)
+
+    response = client.post('/notifications/delete',
+                           json=selection(ids_of(alice)))
+    assert response.get_json() == {'success': True, 'deleted': selected}
+    assert Notification.query.filter_by(user_id=alice.id).count() == (
+        5 - selected)
+    assert unread(alice) == (5 - selected, 5 - selected)
+
+
+@pytest.mark.parametrize('url', ['/notifications/read',
+                                 '/notifications/delete'])
+def test_bulk_requests_touch_only_the_current_user(client, owners, url):
+    """ The IDs of another user's notifications are ignored. """
+    alice, bob = owners
+
+    response = client.post(url, json={'ids': ids_of(bob)})
+    assert response.status_code == 200
+    assert sum(response.get_json().get(key, 0)
+               for key in ('updated', 'deleted')) == 0
+
+    client.post(url, json={'all': True})
+    assert unread(bob) == (2, 2)
+    assert Notification.query.filter_by(user_id=bob.id).count() == 2
+
+
+@pytest.mark.parametrize('url', ['/notifications/read',
+                                 '/notifications/delete'])
+@pytest.mark.parametrize('body', [
+    None,
+    ['not', 'an', 'object'],
+    {},
+    {'ids': ['a'], 'all': True},
+    {'ids': 'a'},
+    {'ids': [1, 2]},
+    {'ids': [f'id-{n}' for n in range(MAX_BULK_IDS + 1)]},
+    {'before': 'yesterday'},
+    {'all': False},
+])
+def test_bulk_requests_reject_bad_selections(client, owners, url, body):
+    """ A missing, ambiguous or malformed selection is a 400. """
+    alice, bob = owners
+
+    response = (client.post(url, data='not json',
+                            content_type='application/json')
+                if body is None else client.post(url, json=body))
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert unread(alice) == (5, 5)
+    assert Notification.query.count() == 7
@@ -0,0 +1,101 @@
+""" Tests of the responsiveness of a worker while passwords are hashed. """
+import statistics
+import threading
+import time
+
+import pytest
+from werkzeug import security
+
+from website.routes import authentication
+
+from conftest import (Tab, load_test, make_member, start_worker,
+                      stop_worker)
+
+
+@pytest.fixture
+def hash_threads(monkeypatch):
+    """ The threads the password hashes of the routes ran on. """
+    threads = []
+
+    def recorded(func):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return func(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(authentication, 'check_password_hash',
+                        recorded(security.check_password_hash))
+    monkeypatch.setattr(authentication, 'generate_password_hash',
+                        recorded(security.generate_password_hash))
+    return threads
+
+
+@pytest.mark.parametrize('offload', [True, False])
+def test_password_hashes_leave_the_event_loop(app, client, monkeypatch,
+                                              hash_threads, offload):
+    """ Signing up and logging in hash in the pool, if offloading. """
+    monkeypatch.setitem(app.config, 'OFFLOAD_BLOCKING_CALLS', offload)
+    credentials = {'phone_number': '+15550000001', 'password': 'password'}
+
+    response = client.post('/signup', data={
+        'name': 'alice', 'confirm_password': 'password', **credentials})
+    assert response.status_code == 302
+    client.get('/logout')
+    response = client.post('/authentication', data=credentials)
+    assert response.status_code == 302
+
+    assert len(hash_threads) == 2
+    on_the_loop = [ident == threading.get_ident() for ident in hash_threads]
+    assert on_the_loop == [not offload] * 2
+
+
+def ping_during_login_burst(app, user, logins, offload):
+    """ Return the socket round trips measured during a burst of logins. """
+    import requests
+
+    process, url = start_worker(
+        app, OFFLOAD_BLOCKING_CALLS='true' if offload else 'false')
+    try:
+        tab = Tab(url, user)
+
+        def login():
+            requests.post(f'{url}/authentication', data={
+                'phone_number': user.phone_number, 'password': 'password'},
+                allow_redirects=False)
+
+        # Warm up the templates and the thread pool
+        login()
+
+        burst = [threading.Thread(target=login) for _ in range(logins)]
+        for thread in burst:
+            thread.start()
+
+        round_trips = []
+        while any(thread.is_alive() for thread in burst):
+            start = time.monotonic()
+            tab.socket.call('status_update', {'status': 'online'},
+                            timeout=60)
+            round_trips.append(time.monotonic() - start)
+            time.sleep(0.01)
+        tab.close()
+        return round_trips
+    finally:
+        stop_worker(process)
+
+
+@load_test
+def test_logins_do_not_stall_other_sockets(app):
+    """ Sockets stay responsive while a burst of logins is hashed. """
+    pytest.importorskip('requests')
+    pytest.importorskip('websocket')
+    user = make_member('alice', '+15550000001')
+    offloaded = ping_during_login_burst(app, user, logins=20, offload=True)
+    blocking = ping_during_login_burst(app, user, logins=20, offload=False)
+
+    print(f"Round trips offloaded: median "
+          f"{statistics.median(offloaded) * 1000:.0f} ms, longest "
+          f"{max(offloaded) * 1000:.0f} ms; on the event loop: longest "
+          f"{max(blocking) * 1000:.0f} ms")
+    # While hashing on the event loop, the socket waits for the whole burst
+    assert statistics.median(offloaded) < 0.05
+    assert max(offloaded) < max(blocking) / 2
@@ -0,0 +1,141 @@
+""" Tests of the presence registry of a single worker. """
+import pytest
+
+from website import db
+from website.models.friendship import Friendship
+from website.models.user import User
+from website.utils import presence as presence_module
+from website.utils.cluster import cluster
+from website.utils.presence import presence
+
+from conftest import connect_as, make_user
+
+
+def befriend(user1, user2):
+    """ Make two users friends. """
+    db.session.add(Friendship(user_id_1=user1.id, user_id_2=user2.id,
+                              status='accepted'))
+    db.session.commit()
+
+
+def status_changes(socket, user_id):
+    """ The statuses of a user announced to a socket since the last call. """
+    return [event['args'][0]['status'] for event in socket.get_received()
+            if event['name'] == 'status_update' and
+            event['args'][0]['user_id'] == user_id]
+
+
+def stored_status(user_id):
+    """ The status of a user written to the database. """
+    db.session.expire_all()
+    return db.session.get(User, user_id).status
+
+
+def test_user_stays_online_until_the_last_tab_closes(app):
+    """ Closing one of two tabs neither announces nor stores offline. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    befriend(alice, bob)
+    watcher = connect_as(app, bob.id)
+    watcher.get_received()
+
+    first_tab = connect_as(app, alice.id)
+    second_tab = connect_as(app, alice.id)
+    assert status_changes(watcher, alice.id) == ['online']
+    assert len(presence.get_sids(alice.id)) == 2
+
+    first_tab.disconnect()
+    assert status_changes(watcher, alice.id) == []
+    assert presence.is_online(alice.id)
+    assert len(presence.get_sids(alice.id)) == 1
+    presence.flush()
+    assert stored_status(alice.id) == 'online'
+
+    second_tab.disconnect()
+    assert status_changes(watcher, alice.id) == ['offline']
+    assert not presence.is_online(alice.id)
+    assert presence.get_sids(alice.id) == set()
+    presence.flush()
+    assert stored_status(alice.id) == 'offline'
+
+
+def test_each_socket_is_counted_once():
+    """ A repeated or unknown disconnect does not take a user offline. """
+    assert presence.connect('alice', 'a1') is True
+    assert presence.connect('alice', 'a2') is False
+
+    assert presence.disconnect('alice', 'a1') is False
+    assert presence.disconnect('alice', 'a1') is False
+    assert presence.disconnect('alice', 'unknown') is False
+    assert presence.is_online('alice')
+
+    assert presence.disconnect('alice', 'a2') is True
+    assert not presence.is_online('alice')
+
+
+def test_sweep_marks_users_without_a_socket_offline(app):
+    """ Users left online by a crash are stored offline by the sweep. """
+    alice = make_user('alice', '+15550000001')
+    carol = make_user('carol', '+15550000003')
+    User.query.update({User.status: 'online'})
+    db.session.commit()
+    socket = connect_as(app, alice.id)
+    presence.flush()
+
+    assert presence.sweep() == 1
+    assert stored_status(alice.id) == 'online'
+    assert stored_status(carol.id) == 'offline'
+    socket.disconnect()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """ A Redis stand-in shared with workers simulated by the test. """
+    fakeredis = pytest.importorskip('fakeredis')
+    monkeypatch.setattr(cluster, 'redis',
+                        fakeredis.FakeRedis(decode_responses=True))
+    return cluster.redis
+
+
+def add_worker_sockets(redis, worker_id, *sockets, alive):
+    """ Register the (user_id, sid) sockets of another worker. """
+    for user_id, sid in sockets:
+        redis.sadd(presence.USER_SOCKETS_KEY.format(user_id), sid)
+        redis.sadd(presence.WORKER_SOCKETS_KEY.format(worker_id),
+                   f'{user_id} {sid}')
+    redis.sadd(presence.WORKERS_KEY, worker_id)
+    if alive:
+        redis.set(presence.WORKER_ALIVE_KEY.format(worker_id), 1)
+
+
+def test_sweep_reaps_the_sockets_of_a_dead_worker(redis, monkeypatch):
+    """ A worker without a heartbeat loses its sockets to the sweep. """
+    announced = []
+    monkeypatch.setattr(presence_module, 'emit_presence',
+                        lambda user_id, status: announced.append(
+                            (user_id, status)))
+    alice = make_user('alice', '+15550000001')
+    carol = make_user('carol', '+15550000003')
+    dave = make_user('dave', '+15550000004')
+    User.query.update({User.status: 'online'})
+    db.session.commit()
+
+    # Alice has a tab on this worker and one on the dead worker
+    presence.connect(alice.id, 'a1')
+    presence.heartbeat()
+    presence.flush()
+    add_worker_sockets(redis, 'dead', (alice.id, 'a2'), (carol.id, 'c1'),
+                       alive=False)
+    add_worker_sockets(redis, 'alive', (dave.id, 'd1'), alive=True)
+
+    assert presence.sweep() == 1
+
+    assert announced == [(carol.id, 'offline')]
+    assert stored_status(carol.id) == 'offline'
+    assert presence.get_sids(alice.id) == {'a1'}
+    assert stored_status(alice.id) == 'online'
+    assert presence.get_sids(dave.id) == {'d1'}
+    assert stored_status(dave.id) == 'online'
+    assert redis.smembers(presence.WORKERS_KEY) == {cluster.worker_id,
+                                                    'alive'}
+    assert not redis.exists(presence.WORKER_SOCKETS_KEY.format('dead'))
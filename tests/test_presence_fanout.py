@@ -0,0 +1,48 @@
+""" Load tests of the presence fan-out. """
+import pytest
+from sqlalchemy import insert
+
+from website import db
+from website.models.friendship import Friendship
+from website.models.user import User
+
+from conftest import connect_as, load_test, login, make_user, socket_client
+
+FRIENDS = 10
+
+
+def seed_users(count):
+    """ Create `count` users, the first FRIENDS of them friends of 'me'. """
+    db.session.execute(insert(User), [{
+        'id': f'user-{i:06d}', 'name': f'user {i}',
+        'phone_number': f'+1{i:010d}',
+        'password': 'x', 'friend_id': f'{i:08d}',
+    } for i in range(count)])
+    db.session.commit()
+    me = make_user('me', '+19999999999')
+    db.session.execute(insert(Friendship), [{
+        'id': f'friendship-{i}', 'user_id_1': me.id,
+        'user_id_2': f'user-{i:06d}', 'status': 'accepted',
+    } for i in range(FRIENDS)])
+    db.session.commit()
+    return me
+
+
+def frames_per_connect(app, users):
+    """ Count the frames the other sockets receive when 'me' connects. """
+    me = seed_users(users)
+    others = [connect_as(app, f'user-{i:06d}') for i in range(users)]
+    for socket in others:
+        socket.get_received()
+
+    client = app.test_client()
+    login(client, me)
+    socket_client(app, client)
+    return sum(len(socket.get_received()) for socket in others)
+
+
+@pytest.mark.parametrize('users', [
+    100, 1000, pytest.param(10000, marks=load_test)])
+def test_connect_frames_do_not_grow_with_users(app, users):
+    """ A connect reaches the user's friends, however many are online. """
+    assert frames_per_connect(app, users) == FRIENDS
@@ -0,0 +1,13 @@
+""" Tests that the hot routes are served through indexes. """
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'scripts'))
+
+from check_query_plans import check  # noqa: E402
+
+
+def test_routes_do_not_scan_large_tables(app):
+    """ No statement run by the hot routes reads a large table whole. """
+    assert check(app, users=1000) == []
@@ -0,0 +1,129 @@
+""" Tests of the socket event rate limiter. """
+import time
+
+import pytest
+
+from website.utils.rate_limit import rate_limiter
+
+from conftest import connect_as, login, make_user
+
+ONLINE = {'status': 'online'}
+
+
+@pytest.fixture
+def limits(app, monkeypatch):
+    """ Enable the limiter with the given (rate, burst) of status_update. """
+    def configure(socket, user):
+        monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', True)
+        monkeypatch.setitem(app.config, 'RATE_LIMITS', {
+            'status_update': {'socket': socket, 'user': user}})
+    return configure
+
+
+def update_status(socket):
+    """ Send a status update and return its acknowledgement. """
+    return socket.emit('status_update', ONLINE, callback=True)
+
+
+def allowed(socket):
+    """ Send a status update and tell whether it reached the handler. """
+    ack = update_status(socket)
+    return not (isinstance(ack, dict) and ack.get('code') == 'rate_limited')
+
+
+def test_burst_then_structured_rejection(app, limits):
+    """ A socket gets its burst, then a structured error per event. """
+    limits(socket=(0.001, 3), user=(0.001, 10))
+    alice = make_user('alice', '+15550000001')
+    socket = connect_as(app, alice.id)
+
+    assert all(allowed(socket) for _ in range(3))
+
+    ack = update_status(socket)
+    assert ack['code'] == 'rate_limited'
+    assert ack['event'] == 'status_update'
+    assert ack['retry_after'] > 0
+    assert set(ack) == {'error', 'code', 'event', 'retry_after'}
+
+
+def test_tabs_of_a_user_share_one_bucket(app, limits):
+    """ Opening more sockets does not raise a user's limit. """
+    limits(socket=(0.001, 5), user=(0.001, 4))
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    first_tab = connect_as(app, alice.id)
+    second_tab = connect_as(app, alice.id)
+
+    for _ in range(2):
+        assert allowed(first_tab)
+        assert allowed(second_tab)
+
+    # Both sockets have tokens left, but the user has none
+    assert not allowed(first_tab)
+    assert not allowed(second_tab)
+    assert allowed(connect_as(app, bob.id))
+
+
+def test_buckets_refill_over_time(app, limits):
+    """ An event is allowed again once its retry_after has passed. """
+    limits(socket=(20, 2), user=(20, 2))
+    alice = make_user('alice', '+15550000001')
+    socket = connect_as(app, alice.id)
+
+    update_status(socket)
+    update_status(socket)
+    ack = update_status(socket)
+    assert 0 < ack['retry_after'] <= 0.05
+
+    time.sleep(ack['retry_after'] + 0.01)
+    assert allowed(socket)
+
+
+def test_stats_count_dropped_events_and_buckets(app, limits):
+    """ The stats count the rejected events and the tracked buckets. """
+    limits(socket=(0.001, 1), user=(0.001, 10))
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    alice_socket = connect_as(app, alice.id)
+    bob_socket = connect_as(app, bob.id)
+
+    for _ in range(3):
+        update_status(alice_socket)
+    update_status(bob_socket)
+
+    assert rate_limiter.stats() == {'dropped': {'status_update': 2},
+                                    'sockets': 2, 'users': 2}
+
+
+def test_stats_route_is_for_admins_only(app, client, limits, monkeypatch):
+    """ Only the users listed in ADMIN_USER_IDS can read the stats. """
+    limits(socket=(0.001, 1), user=(0.001, 10))
+    alice = make_user('alice', '+15550000001')
+    socket = connect_as(app, alice.id)
+    update_status(socket)
+    update_status(socket)
+    login(client, alice)
+
+    assert client.get('/admin/rate_limits').status_code == 403
+
+    monkeypatch.setitem(app.config, 'ADMIN_USER_IDS', {alice.id})
+    response = client.get('/admin/rate_limits')
+    assert response.status_code == 200
+    assert response.get_json()['dropped'] == {'status_update': 1}
+
+
+def test_buckets_are_dropped_on_disconnect(app, limits):
+    """ A socket's buckets go with it, the user's with their last socket. """
+    limits(socket=(0.001, 5), user=(0.001, 10))
+    alice = make_user('alice', '+15550000001')
+    first_tab = connect_as(app, alice.id)
+    second_tab = connect_as(app, alice.id)
+    update_status(first_tab)
+    update_status(second_tab)
+    assert rate_limiter.stats()['sockets'] == 2
+
+    first_tab.disconnect()
+    assert rate_limiter.stats() == {'dropped': {}, 'sockets': 1, 'users': 1}
+
+    second_tab.disconnect()
+    assert rate_limiter.stats() == {'dropped': {}, 'sockets': 0, 'users': 0}
@@ -0,0 +1,91 @@
+""" Tests of the socket connect path under reconnect storms. """
+from sqlalchemy import insert
+
+from website import db
+from website.models.message import Message
+from website.models.unread_counter import UnreadCounter
+
+from conftest import (connect_as, login, make_chat, make_group, make_user,
+                      reset_process_state, socket_client)
+
+
+def make_busy_user(chats, messages_per_chat=20):
+    """ Create a user with `chats` private chats full of messages. """
+    user = make_user('busy', '+15550000000')
+    rows = []
+    for i in range(chats):
+        friend = make_user(f'friend{i}', f'+1666{i:07d}')
+        chat = make_chat(user, friend)
+        rows.extend({'conversation_id': chat.id, 'sender_id': friend.id,
+                     'receiver_id': user.id, 'content': 'hi'}
+                    for _ in range(messages_per_chat))
+    db.session.execute(insert(Message), rows)
+    db.session.commit()
+    UnreadCounter.reconcile()
+    make_group(user, friend)
+    return user
+
+
+def reconnect_storm(app, client, queries, reconnects):
+    """ Reconnect a socket repeatedly and return the statements run. """
+    socket = socket_client(app, client)
+    socket.disconnect()
+    queries.clear()
+    for _ in range(reconnects):
+        socket.connect()
+        snapshot = socket.get_received()
+        socket.disconnect()
+    return list(queries), snapshot
+
+
+def test_reconnects_do_not_replay_history(app, client, queries):
+    """ Reconnecting sends a snapshot and never reads the messages table. """
+    user = make_busy_user(chats=30)
+    login(client, user)
+
+    statements, received = reconnect_storm(app, client, queries, 20)
+
+    snapshot = next(event['args'][0] for event in received
+                    if event['name'] == 'inbox_snapshot')
+    assert len(snapshot['conversations']) == 30
+    assert len(snapshot['groups']) == 1
+    assert all(chat['unread_count'] == 20
+               for chat in snapshot['conversations'])
+    assert not [s for s in statements
+                if 'FROM messages' in s and 'count(' not in s]
+
+
+def test_reconnect_cost_does_not_grow_with_chats(app, client, queries):
+    """ A reconnect runs as many queries for 200 chats as for 5. """
+    counts = []
+    for chats in (5, 200):
+        db.drop_all()
+        db.create_all()
+        reset_process_state()
+        user = make_busy_user(chats, messages_per_chat=2)
+        login(client, user)
+        statements, _ = reconnect_storm(app, client, queries, 10)
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_snapshot_previews_groups(app):
+    """ Group entries carry their last message like private chats. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    group = make_group(alice, bob)
+    quiet_group = make_group(alice, bob)
+    connect_as(app, bob.id).emit('send_group_message', {
+        'group_id': group.id, 'content': 'hello'}, callback=True)
+
+    received = connect_as(app, alice.id).get_received()
+    snapshot = next(event['args'][0] for event in received
+                    if event['name'] == 'inbox_snapshot')
+    groups = {entry['group_id']: entry for entry in snapshot['groups']}
+
+    assert groups[group.id]['last_message'] == 'hello'
+    assert groups[group.id]['last_message_date'] is not None
+    assert groups[group.id]['unread_count'] == 1
+    assert groups[quiet_group.id] == {
+        'group_id': quiet_group.id, 'room': f'group_{quiet_group.id}',
+        'last_message': None, 'last_message_date': None, 'unread_count': 0}
@@ -0,0 +1,86 @@
+""" Tests of the notification retention policy. """
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from website import db, socketio
+from website.models.notification import Notification
+from website.models.user import User
+from website.utils.retention import (NotificationRetention,
+                                     notification_retention)
+
+from conftest import ROOT, connect_as, make_user
+
+
+@pytest.fixture
+def started_tasks(monkeypatch):
+    """ The background tasks started while the test runs. """
+    tasks = []
+    monkeypatch.setattr(socketio, 'start_background_task',
+                        lambda task, *args: tasks.append(task))
+    return tasks
+
+
+def test_periodic_task_runs_in_the_designated_process_only(
+        app, monkeypatch, started_tasks):
+    """ Only a process with NOTIFICATION_RETENTION_TASK starts the task. """
+    monkeypatch.setitem(app.config, 'NOTIFICATION_RETENTION_TASK', False)
+    NotificationRetention().start(app)
+    assert not started_tasks
+
+    monkeypatch.setitem(app.config, 'NOTIFICATION_RETENTION_TASK', True)
+    NotificationRetention().start(app)
+    assert len(started_tasks) == 1
+
+
+def test_prune_deletes_old_and_excess_notifications(app):
+    """ Old notifications go first, then the oldest read ones. """
+    user = make_user('alice', '+15550000001')
+    now = datetime.utcnow()
+    db.session.add_all([
+        Notification(user_id=user.id, type='info', message='expired',
+                     timestamp=now - timedelta(days=100)),
+        *[Notification(user_id=user.id, type='info', message=f'read {n}',
+                       is_read=True, timestamp=now - timedelta(hours=n))
+          for n in range(3)],
+        *[Notification(user_id=user.id, type='info', message=f'unread {n}',
+                       timestamp=now - timedelta(hours=10 + n))
+          for n in range(2)],
+    ])
+    db.session.commit()
+    Notification.reconcile_unread_counts()
+
+    deleted = NotificationRetention().prune(
+        max_age_days=90, max_per_user=3, chunk_size=1)
+
+    assert deleted == {'expired': 1, 'excess': 2}
+    remaining = {n.message for n in Notification.query.all()}
+    assert remaining == {'read 0', 'unread 0', 'unread 1'}
+    assert db.session.get(User, user.id).unread_notifications == 2
+
+
+def test_task_starts_with_the_app_not_with_a_socket(app, monkeypatch,
+                                                    started_tasks):
+    """ The task runs from create_app, even before any client connects. """
+    # A fresh process, since create_app binds the shared Socket.IO server
+    script = (
+        "from website import create_app, socketio\n"
+        "tasks = []\n"
+        "socketio.start_background_task = "
+        "lambda task, *args: tasks.append(task.__qualname__)\n"
+        "create_app()\n"
+        "print(tasks)\n")
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=ROOT, capture_output=True,
+        text=True, timeout=60, check=True,
+        env={**os.environ, 'NOTIFICATION_RETENTION_TASK': 'true'})
+    assert "'NotificationRetention.start.<locals>.run'" in result.stdout
+
+    # Connecting a socket does not start it
+    monkeypatch.setattr(notification_retention, '_started', False)
+    user = make_user('alice', '+15550000001')
+    connect_as(app, user.id).disconnect()
+    assert not notification_retention._started
@@ -0,0 +1,75 @@
+""" Tests of sending private messages over Socket.IO. """
+from website.models.message import Message
+
+from conftest import login, make_chat, make_user, socket_client
+
+
+def connect(app, client, user):
+    """ Connect a socket logged in as a user. """
+    login(client, user)
+    return socket_client(app, client)
+
+
+def test_sender_is_the_authenticated_user(app, client):
+    """ A sender_id in the payload cannot impersonate another user. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    socket = connect(app, client, alice)
+
+    ack = socket.emit('send_message', {
+        'conversation_id': chat.id, 'sender_id': bob.id,
+        'receiver_id': alice.id, 'message': 'hello'}, callback=True)
+
+    message = Message.query.get(ack['message_id'])
+    assert (message.sender_id, message.receiver_id) == (alice.id, bob.id)
+
+
+def test_only_participants_can_send(app, client):
+    """ Users outside a conversation cannot send messages to it. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    mallory = make_user('mallory', '+15550000003')
+    chat = make_chat(alice, bob)
+    socket = connect(app, client, mallory)
+
+    ack = socket.emit('send_message', {
+        'conversation_id': chat.id, 'sender_id': alice.id,
+        'message': 'hello'}, callback=True)
+
+    assert 'error' in ack
+    assert Message.query.count() == 0
+
+
+def test_retries_are_keyed_by_the_authenticated_user(app):
+    """ Another user reusing a client message ID does not get its ack. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    alice_socket = connect(app, app.test_client(), alice)
+    bob_socket = connect(app, app.test_client(), bob)
+    payload = {'conversation_id': chat.id, 'sender_id': alice.id,
+               'message': 'hello', 'client_message_id': 'same-id'}
+
+    alice_ack = alice_socket.emit('send_message', payload, callback=True)
+    bob_ack = bob_socket.emit('send_message', payload, callback=True)
+    retry_ack = alice_socket.emit('send_message', payload, callback=True)
+
+    assert bob_ack['message_id'] != alice_ack['message_id']
+    assert retry_ack == alice_ack
+    assert Message.query.count() == 2
+
+
+def test_anonymous_sockets_cannot_send(app, client):
+    """ A socket without a logged in user cannot send messages. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    socket = socket_client(app, client)
+
+    ack = socket.emit('send_message', {
+        'conversation_id': chat.id, 'sender_id': alice.id,
+        'message': 'hello'}, callback=True)
+
+    assert ack == {'error': 'Authentication required.'}
+    assert Message.query.count() == 0
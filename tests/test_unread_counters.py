@@ -0,0 +1,93 @@
+""" Tests of the private chat unread counters. """
+from website import db
+from website.models.conversation import Conversation
+from website.models.message import Message
+from website.models.unread_counter import UnreadCounter
+
+from conftest import connect_as, login, make_chat, make_user
+
+
+def test_increment_creates_then_adds_to_counter():
+    """ The first increment creates the counter, later ones add to it. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    conversation = Conversation(user1_id=alice.id, user2_id=bob.id,
+                                type='private_chat')
+    db.session.add(conversation)
+    db.session.commit()
+
+    UnreadCounter.increment(bob.id, conversation.id)
+    UnreadCounter.increment(bob.id, conversation.id, 2)
+    db.session.commit()
+
+    assert UnreadCounter.get_count(bob.id, conversation.id) == 3
+    assert UnreadCounter.query.count() == 1
+
+    UnreadCounter.reset(bob.id, conversation.id)
+    UnreadCounter.increment(bob.id, conversation.id)
+    db.session.commit()
+    assert UnreadCounter.get_count(bob.id, conversation.id) == 1
+
+
+def send(socket, chat, text):
+    """ Send a private message over a socket and return its ID. """
+    ack = socket.emit('send_message', {'conversation_id': chat.id,
+                                       'message': text}, callback=True)
+    return ack['message_id']
+
+
+def test_counter_follows_send_history_and_mark_read(app, client):
+    """ Sends count up, and opening or marking the chat read resets. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    alice_socket = connect_as(app, alice.id)
+    bob_socket = connect_as(app, bob.id)
+
+    send(alice_socket, chat, 'one')
+    send(alice_socket, chat, 'two')
+    assert UnreadCounter.get_count(bob.id, chat.id) == 2
+    assert UnreadCounter.get_count(alice.id, chat.id) == 0
+
+    # Opening the chat history reads the messages
+    login(client, bob)
+    client.get(f'/chats/{chat.id}/history')
+    assert UnreadCounter.get_count(bob.id, chat.id) == 0
+
+    send(alice_socket, chat, 'three')
+    assert UnreadCounter.get_count(bob.id, chat.id) == 1
+    ack = bob_socket.emit('mark_messages_read', {'conversation_id': chat.id},
+                          callback=True)
+    assert ack == {'read_count': 1}
+    assert UnreadCounter.get_count(bob.id, chat.id) == 0
+
+
+def test_deleting_an_unread_message_decrements_the_counter(app, client):
+    """ Only deleting an unread message takes it off the counter. """
+    alice = make_user('alice', '+15550000001')
+    bob = make_user('bob', '+15550000002')
+    chat = make_chat(alice, bob)
+    socket = connect_as(app, alice.id)
+    login(client, alice)
+
+    read_id = send(socket, chat, 'read')
+    Message.mark_conversation_read(chat.id, bob.id)
+    UnreadCounter.reset(bob.id, chat.id)
+    db.session.commit()
+    first_id = send(socket, chat, 'one')
+    second_id = send(socket, chat, 'two')
+    assert UnreadCounter.get_count(bob.id, chat.id) == 2
+
+    assert client.delete(f'/messages/{first_id}/delete').status_code == 200
+    assert UnreadCounter.get_count(bob.id, chat.id) == 1
+
+    # Deleting a read message leaves the counter alone
+    assert client.delete(f'/messages/{read_id}/delete').status_code == 200
+    assert UnreadCounter.get_count(bob.id, chat.id) == 1
+
+    # The counter never goes below 0
+    UnreadCounter.reset(bob.id, chat.id)
+    db.session.commit()
+    assert client.delete(f'/messages/{second_id}/delete').status_code == 200
+    assert UnreadCounter.get_count(bob.id, chat.id) == 0
+    assert Message.query.count() == 0
@@ -0,0 +1,99 @@
+""" Tests of the user display cache. """
+import io
+import json
+
+import pytest
+
+from website import db
+from website.utils.cluster import cluster
+from website.utils.user_cache import user_display_cache
+
+from conftest import connect_as, login, make_group, make_user
+
+
+def send_group_message(app, user, group):
+    """ Send a group message and return the name it was sent under. """
+    socket = connect_as(app, user.id)
+    socket.emit('send_group_message', {'group_id': group.id,
+                                       'content': 'hello'}, callback=True)
+    payload = next(event['args'][0] for event in socket.get_received()
+                   if event['name'] == 'new_group_message')
+    socket.disconnect()
+    return payload['sender_name']
+
+
+def test_sends_after_a_rename_carry_the_new_name(app, client):
+    """ Changing the name drops the cached one. """
+    alice = make_user('alice', '+15550000001')
+    group = make_group(alice)
+    login(client, alice)
+    assert send_group_message(app, alice, group) == 'alice'
+
+    response = client.post('/update_profile',
+                           json={'field': 'name', 'value': 'Alice Smith'})
+    assert response.get_json() == {'success': True}
+
+    assert send_group_message(app, alice, group) == 'Alice Smith'
+
+
+def test_new_profile_picture_is_displayed(app, client, tmp_path,
+                                          monkeypatch):
+    """ Uploading a profile picture drops the cached picture URL. """
+    monkeypatch.setitem(app.config, 'PROFILE_PICS_UPLOAD_FOLDER',
+                        str(tmp_path))
+    alice = make_user('alice', '+15550000001')
+    login(client, alice)
+    assert user_display_cache.get(alice.id)['profile_picture_url'] == (
+        '/static/profile_pics/default.png')
+
+    client.post('/upload_profile_picture', data={
+        'file': (io.BytesIO(b'picture'), 'me.png')})
+
+    assert user_display_cache.get(alice.id)['profile_picture_url'] == (
+        f'/static/profile_pics/{alice.id}.png')
+
+
+@pytest.fixture
+def channel(monkeypatch):
+    """ A subscription to the invalidations of a Redis stand-in. """
+    fakeredis = pytest.importorskip('fakeredis')
+    monkeypatch.setattr(cluster, 'redis',
+                        fakeredis.FakeRedis(decode_responses=True))
+    pubsub = cluster.redis.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(cluster.CHANNEL)
+    # Consume the confirmation of the subscription
+    pubsub.get_message(timeout=1)
+    yield pubsub
+    pubsub.close()
+
+
+def test_rename_is_published_to_the_other_workers(client, channel):
+    """ The route publishes the invalidation of the renamed user. """
+    alice = make_user('alice', '+15550000001')
+    login(client, alice)
+
+    client.post('/update_profile',
+                json={'field': 'name', 'value': 'Alice Smith'})
+
+    message = json.loads(channel.get_message(timeout=1)['data'])
+    assert message == {'worker_id': cluster.worker_id,
+                       'name': 'user_display', 'keys': [alice.id]}
+
+
+def test_invalidation_from_another_worker_drops_the_entry():
+    """ A rename on another worker is picked up through the channel. """
+    alice = make_user('alice', '+15550000001')
+    assert user_display_cache.get(alice.id)['name'] == 'alice'
+
+    # Another worker renames the user and publishes the invalidation
+    alice.name = 'Alice Smith'
+    db.session.commit()
+    invalidation = {'name': 'user_display', 'keys': [alice.id]}
+
+    # This worker ignores its own messages, which it already applied
+    cluster._dispatch(json.dumps({**invalidation,
+                                  'worker_id': cluster.worker_id}))
+    assert user_display_cache.get(alice.id)['name'] == 'alice'
+
+    cluster._dispatch(json.dumps({**invalidation, 'worker_id': 'other'}))
+    assert user_display_cache.get(alice.id)['name'] == 'Alice Smith'
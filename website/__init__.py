@@ -18,7 +18,14 @@ def create_app():
     
     db.init_app(app)
     migrate.init_app(app, db)
-    socketio.init_app(app)
+    # Share emits between workers through the message queue, if any
+    socketio.init_app(app,
+                      message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+
+    # Share presence and cache invalidations between workers, if any
+    from website.utils.cluster import cluster
+    from website.utils.bounded_cache import configure_caches
+    cluster.init_app(app)
 
     # Register blueprints
     from .routes.authentication import authentication
@@ -45,7 +52,16 @@ def create_app():
     from website.models.notification import Notification
     from website.models.friendship import Friendship
     from website.models.group import Group
+    from website.models.unread_counter import UnreadCounter
     from website import socket_events
+    from website.commands import register_commands
+
+    register_commands(app)
+    configure_caches(app)
+
+    # Prune old notifications, in the designated process only
+    from website.utils.retention import notification_retention
+    notification_retention.start(app)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -0,0 +1,69 @@
+"""
+Module that contains the command line commands of the ChatFlow application.
+
+Commands:
+    - flask reconcile-unread:
+        Rebuilds the unread message counters from the messages table.
+    - flask reconcile-notifications:
+        Rebuilds the unread notification counts of the users.
+    - flask prune-notifications:
+        Deletes the notifications that fall outside the retention policy.
+"""
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from website.models.notification import Notification
+from website.models.unread_counter import UnreadCounter
+from website.utils.retention import notification_retention
+
+
+@click.command('reconcile-unread')
+@with_appcontext
+def reconcile_unread_command():
+    """ Rebuilds the unread message counters from the messages table. """
+    count = UnreadCounter.reconcile()
+    click.echo(f"Rebuilt {count} unread counters.")
+
+
+@click.command('reconcile-notifications')
+@with_appcontext
+def reconcile_notifications_command():
+    """ Rebuilds the unread notification counts of the users. """
+    count = Notification.reconcile_unread_counts()
+    click.echo(f"Rebuilt the unread notification counts of {count} users.")
+
+
+@click.command('prune-notifications')
+@click.option('--max-age-days', type=int, default=None,
+              help='Delete notifications older than this, 0 to disable.')
+@click.option('--max-per-user', type=int, default=None,
+              help='Keep at most this many notifications per user, '
+                   '0 to disable.')
+@click.option('--chunk-size', type=int, default=None,
+              help='Number of notifications deleted per transaction.')
+@with_appcontext
+def prune_notifications_command(max_age_days, max_per_user, chunk_size):
+    """ Deletes the notifications that fall outside the retention policy. """
+    config = current_app.config
+    deleted = notification_retention.prune(
+        config['NOTIFICATION_MAX_AGE_DAYS'] if max_age_days is None
+        else max_age_days,
+        config['NOTIFICATION_MAX_PER_USER'] if max_per_user is None
+        else max_per_user,
+        config['NOTIFICATION_RETENTION_CHUNK_SIZE'] if chunk_size is None
+        else chunk_size)
+    click.echo(f"Deleted {deleted['expired']} expired and "
+               f"{deleted['excess']} excess notifications.")
+
+
+def register_commands(app):
+    """
+    Registers the command line commands on the application.
+
+    Args:
+        app (Flask): The application to register the commands on.
+    """
+    app.cli.add_command(reconcile_unread_command)
+    app.cli.add_command(reconcile_notifications_command)
+    app.cli.add_command(prune_notifications_command)
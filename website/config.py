@@ -13,4 +13,34 @@ class Config:
     ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'webm', 'mov', 'avi', 'mkv'}
     ALLOWED_EXTENSIONS = ALLOWED_IMAGE_EXTENSIONS.union(ALLOWED_VIDEO_EXTENSIONS)
-
+    PRESENCE_FLUSH_INTERVAL = int(os.getenv('PRESENCE_FLUSH_INTERVAL', 5))
+    PRESENCE_SWEEP_INTERVAL = int(os.getenv('PRESENCE_SWEEP_INTERVAL', 60))
+    MESSAGE_WRITE_BEHIND = os.getenv('MESSAGE_WRITE_BEHIND', 'false').lower() == 'true'
+    MESSAGE_WRITE_BEHIND_MAX_PENDING = int(os.getenv('MESSAGE_WRITE_BEHIND_MAX_PENDING', 1000))
+    MESSAGE_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('MESSAGE_WRITE_BEHIND_BATCH_SIZE', 200))
+    MESSAGE_WRITE_BEHIND_INTERVAL = float(os.getenv('MESSAGE_WRITE_BEHIND_INTERVAL', 0.05))
+    MESSAGE_WRITE_BEHIND_JOURNAL = os.getenv('MESSAGE_WRITE_BEHIND_JOURNAL')
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    CACHE_TTL = float(os.getenv('CACHE_TTL', 300))
+    OFFLOAD_BLOCKING_CALLS = os.getenv('OFFLOAD_BLOCKING_CALLS', 'true').lower() == 'true'
+    BLOCKING_POOL_SIZE = int(os.getenv('BLOCKING_POOL_SIZE', os.cpu_count() or 1))
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    # Event -> (tokens per second, burst) of its per socket and per user buckets
+    RATE_LIMITS = {
+        'send_message': {'socket': (5, 10), 'user': (10, 20)},
+        'send_group_message': {'socket': (5, 10), 'user': (10, 20)},
+        'status_update': {'socket': (1, 5), 'user': (2, 10)},
+    }
+    ADMIN_USER_IDS = set(filter(None, os.getenv('ADMIN_USER_IDS', '').split(',')))
+    NOTIFICATION_COALESCE_WINDOW = float(os.getenv('NOTIFICATION_COALESCE_WINDOW', 2))
+    NOTIFICATION_MAX_PENDING = int(os.getenv('NOTIFICATION_MAX_PENDING', 1000))
+    NOTIFICATION_MAX_AGE_DAYS = int(os.getenv('NOTIFICATION_MAX_AGE_DAYS', 90))
+    NOTIFICATION_MAX_PER_USER = int(os.getenv('NOTIFICATION_MAX_PER_USER', 1000))
+    NOTIFICATION_RETENTION_CHUNK_SIZE = int(os.getenv('NOTIFICATION_RETENTION_CHUNK_SIZE', 500))
+    NOTIFICATION_RETENTION_INTERVAL = int(os.getenv('NOTIFICATION_RETENTION_INTERVAL', 3600))
+    # Whether this process runs the periodic retention task; with several
+    # workers it is off by default and enabled on one of them only
+    NOTIFICATION_RETENTION_TASK = os.getenv(
+        'NOTIFICATION_RETENTION_TASK',
+        'false' if SOCKETIO_MESSAGE_QUEUE else 'true').lower() == 'true'
@@ -1,9 +1,8 @@
 """ Module that contaisn the Conversation class. """
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, case, func
 from sqlalchemy.orm import relationship
 from uuid import uuid4
-from .message import Message
 from website import db
 
 
@@ -35,15 +34,22 @@ class Conversation(db.Model):
             List of Message objects associated with the conversation.
 
     Methods:
+        get_inbox: Retrieves the user's private conversations together with
+            the other participant and the unread message count.
+        get_participant_ids: Retrieves the IDs of the users taking part
+            in the conversation.
         __repr__: Returns a string representation of the Conversation object.
     """
 
     __tablename__ = 'conversations'
     id = Column(String(255), primary_key=True, default=lambda: str(uuid4()))
     type = Column(String(20), nullable=False)
-    user1_id = Column(String(255), ForeignKey('users.id'), nullable=True)
-    user2_id = Column(String(255), ForeignKey('users.id'), nullable=True)
-    group_id = Column(String(255), ForeignKey('groups.id'), nullable=True)
+    user1_id = Column(String(255), ForeignKey('users.id'),
+                      nullable=True, index=True)
+    user2_id = Column(String(255), ForeignKey('users.id'),
+                      nullable=True, index=True)
+    group_id = Column(String(255), ForeignKey('groups.id'),
+                      nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime,
                         default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -54,6 +60,67 @@ class Conversation(db.Model):
     group = relationship('Group', backref='conversations')
     messages = relationship('Message', backref='conversation_messages')
 
+    @staticmethod
+    def get_inbox(user_id):
+        """
+        Retrieves all private conversations of a user in a single query.
+
+        The other participant and the user's unread counter are joined in
+        directly, so the number of queries does not grow with the number
+        of conversations.
+
+        Args:
+            user_id (str): The ID of the user whose inbox is retrieved.
+
+        Returns:
+            list: A list of (Conversation, User, int) tuples holding the
+                conversation, the other participant (or None if missing)
+                and the number of unread messages for the user.
+        """
+        from .user import User
+        from .unread_counter import UnreadCounter
+
+        # ID of the other participant in the conversation
+        friend_id = case(
+            (Conversation.user1_id == user_id, Conversation.user2_id),
+            else_=Conversation.user1_id
+        )
+
+        return db.session.query(
+            Conversation,
+            User,
+            func.coalesce(UnreadCounter.count, 0)
+        ).outerjoin(
+            User, User.id == friend_id
+        ).outerjoin(
+            UnreadCounter,
+            (UnreadCounter.conversation_id == Conversation.id) &
+            (UnreadCounter.user_id == user_id)
+        ).filter(
+            ((Conversation.user1_id == user_id) |
+             (Conversation.user2_id == user_id)) &
+            (Conversation.type == 'private_chat')
+        ).all()
+
+    def get_participant_ids(self):
+        """
+        Retrieves the IDs of the users taking part in the conversation.
+
+        Private chats have their two users; group conversations have
+        every member of the group.
+
+        Returns:
+            list: The IDs of the participants.
+        """
+        if self.type == 'group':
+            from .group import GroupMembership
+            members = db.session.query(GroupMembership.user_id).filter_by(
+                id=self.group_id)
+            return [user_id for user_id, in members]
+
+        return [user_id for user_id in (self.user1_id, self.user2_id)
+                if user_id]
+
     def __repr__(self):
         """
         Returns a string representation of the Conversation object.
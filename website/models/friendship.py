@@ -2,7 +2,7 @@
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy import Column, String, DateTime, Integer
-from sqlalchemy.schema import UniqueConstraint
+from sqlalchemy.schema import UniqueConstraint, Index
 from datetime import datetime
 from website import db
 from enum import Enum
@@ -66,6 +66,7 @@ class Friendship(db.Model):
                           foreign_keys=[user_id_2], backref='friendships_2')
     __table_args__ = (
         UniqueConstraint('user_id_1', 'user_id_2', name='unique_friendship'),
+        Index('ix_friendships_user_id_2_status', 'user_id_2', 'status'),
     )
 
     def accept_request(self):
@@ -78,6 +79,8 @@ class Friendship(db.Model):
         if self.status == FriendshipStatus.PENDING.value:
             self.status = FriendshipStatus.ACCEPTED.value
             db.session.commit()
+            self._update_graph(FriendshipStatus.ACCEPTED.value)
+            self._invalidate_audience()
 
     def decline_request(self):
         """
@@ -89,6 +92,7 @@ class Friendship(db.Model):
         if self.status == FriendshipStatus.PENDING.value:
             db.session.delete(self)
             db.session.commit()
+            self._update_graph(None)
 
     def remove_friendship(self):
         """
@@ -100,6 +104,8 @@ class Friendship(db.Model):
         if self.status == FriendshipStatus.ACCEPTED.value:
             db.session.delete(self)
             db.session.commit()
+            self._update_graph(None)
+            self._invalidate_audience()
 
     def block_user(self):
         """
@@ -110,6 +116,8 @@ class Friendship(db.Model):
         """
         self.status = FriendshipStatus.BLOCKED.value
         db.session.commit()
+        self._update_graph(FriendshipStatus.BLOCKED.value)
+        self._invalidate_audience()
 
     def unblock_user(self):
         """
@@ -121,6 +129,29 @@ class Friendship(db.Model):
         if self.status == FriendshipStatus.BLOCKED.value:
             self.status = FriendshipStatus.PENDING.value
             db.session.commit()
+            self._update_graph(FriendshipStatus.PENDING.value)
+
+    def _update_graph(self, status):
+        """
+        Records the new status of the friendship in the friend graph.
+
+        Args:
+            status (str): The new status, or None if the friendship
+                was deleted.
+        """
+        from website.utils.friend_graph import friend_graph
+        if status is None:
+            friend_graph.remove(self.user_id_1, self.user_id_2)
+        else:
+            friend_graph.set(self.user_id_1, self.user_id_2, status)
+
+    def _invalidate_audience(self):
+        """
+        Drops the cached presence audience of both users,
+            since they were or are no longer friends.
+        """
+        from website.utils.presence_audience import presence_audience
+        presence_audience.invalidate(self.user_id_1, self.user_id_2)
 
     @staticmethod
     def get_pending_requests(user_id):
@@ -163,19 +194,16 @@ class Friendship(db.Model):
         """
         Retrieves a list of friends for a user.
 
+        The friends are read from the in-memory friend graph.
+
         Args:
             user_id (str): The ID of the user whose friends are retrieved.
 
         Returns:
             list: A list of user IDs representing the user's friends.
         """
-        friendships = db.session.query(Friendship).filter(
-            ((Friendship.user_id_1 == user_id) |
-             (Friendship.user_id_2 == user_id)) &
-            (Friendship.status == FriendshipStatus.ACCEPTED.value)
-        ).all()
-        return [f.user_id_1 if f.user_id_2 == user_id
-                else f.user_id_2 for f in friendships]
+        from website.utils.friend_graph import friend_graph
+        return friend_graph.friends(user_id, FriendshipStatus.ACCEPTED.value)
 
     @staticmethod
     def get_user_by_friend_id(friend_id):
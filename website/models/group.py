@@ -1,10 +1,11 @@
 """ Module that contains the Group class. """
 from datetime import datetime
-from sqlalchemy import Column, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, String, ForeignKey, DateTime, Text, func
 from sqlalchemy.orm import relationship
 from website import db
 from uuid import uuid4
 from .conversation import Conversation
+from .message import Message, PreciseDateTime
 
 
 class Group(db.Model):
@@ -36,7 +37,8 @@ class Group(db.Model):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow,
                         onupdate=datetime.utcnow)
-    owner_id = Column(String(255), ForeignKey('users.id'), nullable=False)
+    owner_id = Column(String(255), ForeignKey('users.id'), nullable=False,
+                      index=True)
     owner = relationship('User', backref='owned_groups')
     group_members = relationship(
         'GroupMembership', back_populates='group',
@@ -83,6 +85,7 @@ class Group(db.Model):
         conversation = Conversation(
             id=self.id,
             type='group',
+            group_id=self.id,
             user1_id=self.owner_id,  # Initial user (group owner)
             user2_id=None  # Not applicable for groups
         )
@@ -90,6 +93,77 @@ class Group(db.Model):
         db.session.commit()
         return conversation
 
+    @staticmethod
+    def get_unread_counts(user_id):
+        """
+        Counts the unread messages of every group the user is a member of.
+
+        A message is unread when it was sent by another member after the
+        user's read watermark (or after they joined, if they never read
+        the group). Messages are ordered by (timestamp, id), so a message
+        sharing the timestamp of the watermark is compared by ID. All groups
+        are counted with a single grouped query.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            dict: A mapping of group IDs to unread message counts.
+        """
+        rows = db.session.query(
+            GroupMembership.id,
+            func.count(Message.id)
+        ).join(
+            Message, Group._unread_condition(user_id)
+        ).filter(
+            GroupMembership.user_id == user_id
+        ).group_by(GroupMembership.id).all()
+        return dict(rows)
+
+    @staticmethod
+    def get_inbox(user_id):
+        """
+        Retrieves the last message and unread count of every group the
+        user is a member of, in a single grouped query.
+
+        Unread messages are counted like in `get_unread_counts`; groups
+        without unread messages or without a conversation are included.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            list: A list of (group_id, last_message, last_message_date,
+                unread_count) tuples.
+        """
+        return db.session.query(
+            GroupMembership.id,
+            Conversation.last_message,
+            Conversation.last_message_date,
+            func.count(Message.id)
+        ).outerjoin(
+            Conversation, Conversation.group_id == GroupMembership.id
+        ).outerjoin(
+            Message, Group._unread_condition(user_id)
+        ).filter(
+            GroupMembership.user_id == user_id
+        ).group_by(
+            GroupMembership.id,
+            Conversation.last_message,
+            Conversation.last_message_date
+        ).all()
+
+    @staticmethod
+    def _unread_condition(user_id):
+        """ Join condition of the messages a member has not read yet. """
+        watermark = func.coalesce(GroupMembership.last_read_at,
+                                  GroupMembership.joined_at)
+        return ((Message.group_id == GroupMembership.id) &
+                ((Message.timestamp > watermark) |
+                 ((Message.timestamp == GroupMembership.last_read_at) &
+                  (Message.id > GroupMembership.last_read_message_id))) &
+                (Message.sender_id != user_id))
+
     def __repr__(self):
         """
         Returns a string representation of the Group object.
@@ -110,6 +184,10 @@ class GroupMembership(db.Model):
         joined_at (datetime): Timestamp of when the user joined the group.
         role (str):
             The role of the user in the group (e.g., 'admin', 'member').
+        last_read_at (datetime, optional): Read watermark; timestamp of
+            the newest message of the group the user has read.
+        last_read_message_id (str, optional):
+            ID of the newest message of the group the user has read.
         group (Group):
             Relationship to the Group model, representing the group.
         user (User): Relationship to the User model, representing the member.
@@ -117,12 +195,50 @@ class GroupMembership(db.Model):
 
     __tablename__ = 'group_memberships'
     id = Column(String(255), ForeignKey('groups.id'), primary_key=True)
-    user_id = Column(String(255), ForeignKey('users.id'), primary_key=True)
-    joined_at = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(String(255), ForeignKey('users.id'), primary_key=True,
+                     index=True)
+    joined_at = Column(PreciseDateTime, default=datetime.utcnow)
     role = Column(String(20), default='member')
+    last_read_at = Column(PreciseDateTime, nullable=True)
+    last_read_message_id = Column(String(255), nullable=True)
     group = relationship('Group', backref='memberships')
     user = relationship('User', backref='group_memberships')
 
+    @staticmethod
+    def mark_read(group_id, user_id):
+        """
+        Moves the user's read watermark to the newest message of the group.
+
+        The watermark is a (timestamp, id) position that only moves
+        forward and is updated with a single UPDATE. The caller commits
+        the change.
+
+        Args:
+            group_id (str): The ID of the group.
+            user_id (str): The ID of the member who read the messages.
+
+        Returns:
+            Message: The newest message of the group,
+                or None if the group has no messages.
+        """
+        newest = Message.query.filter_by(group_id=group_id).order_by(
+            Message.timestamp.desc(), Message.id.desc()).first()
+        if not newest:
+            return None
+
+        GroupMembership.query.filter(
+            (GroupMembership.id == group_id) &
+            (GroupMembership.user_id == user_id) &
+            ((GroupMembership.last_read_at.is_(None)) |
+             (GroupMembership.last_read_at < newest.timestamp) |
+             ((GroupMembership.last_read_at == newest.timestamp) &
+              (GroupMembership.last_read_message_id < newest.id)))
+        ).update({
+            GroupMembership.last_read_at: newest.timestamp,
+            GroupMembership.last_read_message_id: newest.id
+        }, synchronize_session=False)
+        return newest
+
     def __repr__(self):
         """
         Returns a string representation of the GroupMembership object.
@@ -3,10 +3,17 @@ from datetime import datetime
 from sqlalchemy import (
     Column, String, ForeignKey, Text, DateTime, Boolean, JSON
 )
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
+from sqlalchemy import and_, or_, Index, UniqueConstraint
 from uuid import uuid4
 from website import db
 
+# DateTime with microseconds on MySQL, which otherwise rounds to seconds;
+# used where messages are ordered and compared against read watermarks
+PreciseDateTime = DateTime().with_variant(mysql.DATETIME(fsp=6),
+                                          'mysql', 'mariadb')
+
 
 class Message(db.Model):
     """
@@ -27,6 +34,8 @@ class Message(db.Model):
         media_type (str, optional):
             Type of media attached to the message (e.g., 'image', 'video').
         media_url (str, optional): URL of the media attached to the message.
+        client_message_id (str, optional): ID generated by the sending
+            client, unique per sender, used to detect retried sends.
 
     Methods:
         mark_as_read():
@@ -35,6 +44,11 @@ class Message(db.Model):
         delete_message():
             Permanently deletes the message from the database.
             Commits the deletion to the database.
+        get_page(conversation_id, before, after, limit):
+            Retrieves one page of a conversation using keyset pagination.
+        mark_conversation_read(conversation_id, receiver_id):
+            Marks all unread messages of a conversation sent to a user as read
+            with a single UPDATE.
         __repr__():
             Returns a string representation of the Message object.
     """
@@ -44,7 +58,7 @@ class Message(db.Model):
     conversation_id = Column(String(255),
                              ForeignKey('conversations.id'), nullable=False)
     content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(PreciseDateTime, default=datetime.utcnow)
     group_id = Column(String(255),
                       ForeignKey('groups.id'), nullable=True)
     is_read = Column(Boolean, default=False)
@@ -58,6 +72,14 @@ class Message(db.Model):
                                backref='received_messages')
     media_type = Column(String(50), nullable=True)
     media_url = Column(String(255), nullable=True)
+    client_message_id = Column(String(64), nullable=True)
+    __table_args__ = (
+        UniqueConstraint('sender_id', 'client_message_id',
+                         name='uq_messages_sender_id_client_message_id'),
+        Index('ix_messages_conversation_id_timestamp',
+              'conversation_id', 'timestamp', 'id'),
+        Index('ix_messages_group_id_timestamp', 'group_id', 'timestamp'),
+    )
 
     def mark_as_read(self):
         """
@@ -77,6 +99,76 @@ class Message(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+    @staticmethod
+    def mark_conversation_read(conversation_id, receiver_id):
+        """
+        Marks all unread messages of a conversation sent to a user as read.
+
+        The messages are updated with a single UPDATE statement without
+        being loaded into the session. The caller commits the change.
+
+        Args:
+            conversation_id (str): The ID of the conversation.
+            receiver_id (str): The ID of the user who read the messages.
+
+        Returns:
+            int: The number of messages that were marked as read.
+        """
+        return Message.query.filter(
+            (Message.conversation_id == conversation_id) &
+            (Message.receiver_id == receiver_id) &
+            (Message.is_read.is_(False))
+        ).update({Message.is_read: True}, synchronize_session=False)
+
+    @staticmethod
+    def get_page(conversation_id, before=None, after=None, limit=50):
+        """
+        Retrieves one page of a conversation using keyset pagination.
+
+        Messages are ordered by (timestamp, id), so the cost of a page
+        depends on the page size and not on the length of the conversation.
+
+        Args:
+            conversation_id (str): The ID of the conversation.
+            before (tuple, optional): A (timestamp, id) position;
+                only messages older than it are returned.
+            after (tuple, optional): A (timestamp, id) position;
+                only messages newer than it are returned.
+            limit (int): The maximum number of messages to return.
+
+        Returns:
+            tuple: A list of messages in chronological order and a boolean
+                telling whether more messages exist in the paging direction.
+        """
+        query = Message.query.filter_by(conversation_id=conversation_id)
+
+        if after:
+            timestamp, message_id = after
+            query = query.filter(or_(
+                Message.timestamp > timestamp,
+                and_(Message.timestamp == timestamp, Message.id > message_id)
+            )).order_by(Message.timestamp.asc(), Message.id.asc())
+        else:
+            # Without a cursor the newest page is returned
+            if before:
+                timestamp, message_id = before
+                query = query.filter(or_(
+                    Message.timestamp < timestamp,
+                    and_(Message.timestamp == timestamp,
+                         Message.id < message_id)
+                ))
+            query = query.order_by(Message.timestamp.desc(),
+                                   Message.id.desc())
+
+        # Fetch one extra row to know whether another page exists
+        messages = query.limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+
+        if not after:
+            messages.reverse()
+        return messages, has_more
+
     def __repr__(self):
         """
         Returns a string representation of the Message object.
@@ -1,6 +1,9 @@
 """ Moudle that contains the notification class. """
 from datetime import datetime
-from sqlalchemy import Column, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import (
+    Column, String, ForeignKey, DateTime, Boolean, Index,
+    and_, or_, bindparam, func, select, update
+)
 from sqlalchemy.orm import relationship
 from website import db
 from uuid import uuid4
@@ -24,6 +27,16 @@ class Notification(db.Model):
 
     Methods:
         mark_as_read(): Marks the notification as read.
+        mark_many_read(user_id, ids, before):
+            Marks many notifications of a user as read.
+        delete_many(user_id, ids, before):
+            Deletes many notifications of a user.
+        adjust_unread_counts(amounts):
+            Adds to the unread notification counts of users.
+        reconcile_unread_counts():
+            Rebuilds the unread notification counts from the notifications.
+        get_page(user_id, before, limit, unread_only):
+            Retrieves one page of a user's notifications.
         __repr__(): Provides a string representation of the notification.
     """
     __tablename__ = 'notifications'
@@ -34,17 +47,166 @@ class Notification(db.Model):
     timestamp = Column(DateTime, default=datetime.utcnow)
     type = Column(String(50), nullable=False)
     user = relationship('User', backref='notifications')
+    __table_args__ = (
+        Index('ix_notifications_user_id_is_read_timestamp',
+              'user_id', 'is_read', 'timestamp'),
+        Index('ix_notifications_user_id_timestamp_id',
+              'user_id', 'timestamp', 'id'),
+        Index('ix_notifications_timestamp', 'timestamp'),
+    )
 
     def mark_as_read(self):
         """
         Marks the notification as read.
 
-        This method updates the `is_read` field to True
-            and commits the change to the database.
+        This method updates the `is_read` field to True, updates the
+            user's unread count and commits the change to the database.
         """
-        self.is_read = True
+        # A conditional UPDATE, so concurrent requests count it only once
+        Notification.mark_many_read(self.user_id, ids=[self.id])
         db.session.commit()
 
+    @staticmethod
+    def mark_many_read(user_id, ids=None, before=None):
+        """
+        Marks many notifications of a user as read.
+
+        The notifications are selected by ID, by timestamp, or all of them
+        if neither is given, and updated with a single UPDATE statement.
+        The caller commits the change.
+
+        Args:
+            user_id (str): The ID of the user.
+            ids (list, optional): The IDs of the notifications.
+            before (datetime, optional): Select the notifications
+                created at or before this time.
+
+        Returns:
+            int: The number of notifications that were marked as read.
+        """
+        updated = Notification._select_many(user_id, ids, before).filter(
+            Notification.is_read.is_(False)
+        ).update({Notification.is_read: True}, synchronize_session=False)
+        Notification.adjust_unread_counts({user_id: -updated})
+        return updated
+
+    @staticmethod
+    def delete_many(user_id, ids=None, before=None):
+        """
+        Deletes many notifications of a user.
+
+        The notifications are selected like in `mark_many_read`. Unread
+        ones are first marked as read, which keeps the user's unread count
+        right, and all of them are then deleted with a single DELETE
+        statement. The caller commits the change.
+
+        Args:
+            user_id (str): The ID of the user.
+            ids (list, optional): The IDs of the notifications.
+            before (datetime, optional): Select the notifications
+                created at or before this time.
+
+        Returns:
+            int: The number of notifications that were deleted.
+        """
+        Notification.mark_many_read(user_id, ids=ids, before=before)
+        return Notification._select_many(user_id, ids, before).delete(
+            synchronize_session=False)
+
+    @staticmethod
+    def adjust_unread_counts(amounts):
+        """
+        Adds to the unread notification counts of users.
+
+        All counts are updated with a single statement. The change is
+        added to the current session and committed together with the
+        notifications that caused it.
+
+        Args:
+            amounts (dict): The change of the count, by user ID.
+        """
+        from website.models.user import User
+
+        rows = [{'b_id': user_id, 'b_amount': amount}
+                for user_id, amount in amounts.items() if amount]
+        if not rows:
+            return
+
+        users = User.__table__
+        db.session.execute(
+            update(users).where(users.c.id == bindparam('b_id')).values(
+                unread_notifications=(users.c.unread_notifications +
+                                      bindparam('b_amount'))),
+            rows)
+
+    @staticmethod
+    def reconcile_unread_counts():
+        """
+        Rebuilds the unread notification counts from the notifications.
+
+        Returns:
+            int: The number of users whose count was written.
+        """
+        from website.models.user import User
+
+        unread = select(func.count(Notification.id)).where(
+            (Notification.user_id == User.id) &
+            (Notification.is_read.is_(False))
+        ).scalar_subquery()
+        updated = User.query.update({User.unread_notifications: unread},
+                                    synchronize_session=False)
+        db.session.commit()
+        return updated
+
+    @staticmethod
+    def get_page(user_id, before=None, limit=50, unread_only=False):
+        """
+        Retrieves one page of a user's notifications using keyset
+        pagination.
+
+        Notifications are ordered from the newest by (timestamp, id), so
+        the cost of a page depends on the page size and not on the number
+        of notifications of the user.
+
+        Args:
+            user_id (str): The ID of the user.
+            before (tuple, optional): A (timestamp, id) position;
+                only notifications older than it are returned.
+            limit (int): The maximum number of notifications to return.
+            unread_only (bool): Whether to return only unread notifications.
+
+        Returns:
+            tuple: A list of notifications from the newest and a boolean
+                telling whether older notifications exist.
+        """
+        query = Notification.query.filter_by(user_id=user_id)
+        if unread_only:
+            query = query.filter_by(is_read=False)
+
+        if before:
+            timestamp, notification_id = before
+            query = query.filter(or_(
+                Notification.timestamp < timestamp,
+                and_(Notification.timestamp == timestamp,
+                     Notification.id < notification_id)
+            ))
+
+        # Fetch one extra row to know whether another page exists
+        notifications = query.order_by(
+            Notification.timestamp.desc(), Notification.id.desc()
+        ).limit(limit + 1).all()
+        return notifications[:limit], len(notifications) > limit
+
+    @staticmethod
+    def _select_many(user_id, ids, before):
+        """ Build the query of the notifications of a bulk operation. """
+        query = Notification.query.filter(Notification.user_id == user_id)
+        if ids is not None:
+            query = query.filter(Notification.id.in_(ids))
+        if before is not None:
+            query = query.filter(Notification.timestamp <= before)
+        return query
+
     def __repr__(self):
         """
         Returns a string representation of the notification.
@@ -0,0 +1,164 @@
+""" Module that contains the UnreadCounter class. """
+from sqlalchemy import (
+    Column, String, Integer, ForeignKey, case, func, insert
+)
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from website import db
+from .message import Message
+from .conversation import Conversation
+
+
+class UnreadCounter(db.Model):
+    """
+    Represents the number of unread messages of a user in a private chat.
+
+    The counters are maintained when messages are sent and read,
+    so unread badges can be looked up by primary key instead of
+    being recomputed from the messages table. Group chats track
+    read state with per-member watermarks on GroupMembership instead.
+
+    Attributes:
+        user_id (str): ID of the user the counter belongs to.
+        conversation_id (str): ID of the conversation the counter tracks.
+        count (int): Number of unread messages for the user
+            in the conversation.
+
+    Methods:
+        increment: Increments the counter of a user in a conversation.
+        decrement: Decrements the counter of a user in a conversation.
+        reset: Resets the counter of a user in a conversation.
+        get_count: Retrieves the counter of a user in a conversation.
+        reconcile: Rebuilds the private chat counters from the messages table.
+    """
+
+    __tablename__ = 'unread_counters'
+    user_id = Column(String(255), ForeignKey('users.id'), primary_key=True)
+    conversation_id = Column(String(255),
+                             ForeignKey('conversations.id'), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    @staticmethod
+    def increment(user_id, conversation_id, amount=1):
+        """
+        Increments the counter of a user in a conversation.
+
+        The change is added to the current session and committed
+        together with the message that caused it.
+
+        Args:
+            user_id (str): The ID of the user receiving the message.
+            conversation_id (str): The ID of the conversation.
+            amount (int): The number of new unread messages.
+        """
+        values = {'user_id': user_id, 'conversation_id': conversation_id,
+                  'count': amount}
+
+        # Create the counter on the first unread message in the same
+        # statement, so concurrent first messages cannot both insert it
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('mysql', 'mariadb'):
+            statement = mysql_insert(UnreadCounter).values(**values)
+            statement = statement.on_duplicate_key_update(
+                count=UnreadCounter.count + statement.inserted.count)
+        else:
+            upsert = (postgresql_insert if dialect == 'postgresql'
+                      else sqlite_insert)
+            statement = upsert(UnreadCounter).values(**values)
+            statement = statement.on_conflict_do_update(
+                index_elements=[UnreadCounter.user_id,
+                                UnreadCounter.conversation_id],
+                set_={'count': UnreadCounter.count + statement.excluded.count})
+        db.session.execute(statement)
+
+    @staticmethod
+    def decrement(user_id, conversation_id, amount=1):
+        """
+        Decrements the counter of a user in a conversation, down to 0.
+
+        The change is added to the current session and committed
+        together with the deletion of the unread message.
+
+        Args:
+            user_id (str): The ID of the receiver of the message.
+            conversation_id (str): The ID of the conversation.
+            amount (int): The number of unread messages removed.
+        """
+        UnreadCounter.query.filter_by(
+            user_id=user_id, conversation_id=conversation_id
+        ).update({UnreadCounter.count: case(
+            (UnreadCounter.count > amount, UnreadCounter.count - amount),
+            else_=0
+        )}, synchronize_session=False)
+
+    @staticmethod
+    def reset(user_id, conversation_id):
+        """
+        Resets the counter of a user in a conversation.
+
+        Args:
+            user_id (str): The ID of the user who read the messages.
+            conversation_id (str): The ID of the conversation.
+        """
+        UnreadCounter.query.filter_by(
+            user_id=user_id, conversation_id=conversation_id
+        ).update({UnreadCounter.count: 0}, synchronize_session=False)
+
+    @staticmethod
+    def get_count(user_id, conversation_id):
+        """
+        Retrieves the counter of a user in a conversation.
+
+        Args:
+            user_id (str): The ID of the user.
+            conversation_id (str): The ID of the conversation.
+
+        Returns:
+            int: The number of unread messages, 0 if there is no counter.
+        """
+        counter = UnreadCounter.query.get((user_id, conversation_id))
+        return counter.count if counter else 0
+
+    @staticmethod
+    def reconcile():
+        """
+        Rebuilds the private chat counters from the messages table.
+
+        Returns:
+            int: The number of counters written.
+        """
+        # Unread private messages grouped per receiver and conversation
+        unread = db.session.query(
+            Message.receiver_id,
+            Message.conversation_id,
+            func.count(Message.id)
+        ).filter(
+            (Message.receiver_id.isnot(None)) &
+            (Message.is_read.is_(False))
+        ).group_by(Message.receiver_id, Message.conversation_id)
+
+        # Drop every counter of a private conversation
+        private_conversations = db.session.query(Conversation.id).filter(
+            Conversation.type == 'private_chat')
+        UnreadCounter.query.filter(
+            UnreadCounter.conversation_id.in_(private_conversations)
+        ).delete(synchronize_session=False)
+
+        result = db.session.execute(
+            insert(UnreadCounter).from_select(
+                ['user_id', 'conversation_id', 'count'], unread)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def __repr__(self):
+        """
+        Returns a string representation of the UnreadCounter object.
+
+        Returns:
+            str: A string representing the UnreadCounter object.
+        """
+        return (f"<UnreadCounter(user_id='{self.user_id}', "
+                f"conversation_id='{self.conversation_id}', "
+                f"count={self.count})>")
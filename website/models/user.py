@@ -1,7 +1,9 @@
 """ Module that contains the User class. """
 from datetime import datetime
 from uuid import uuid4
-from sqlalchemy import Column, String, DateTime, Text, Boolean, Date
+from sqlalchemy import (
+    Column, String, DateTime, Text, Boolean, Date, Integer
+)
 from flask_login import UserMixin
 from website import db
 from .friendship import Friendship
@@ -48,6 +50,8 @@ class User(db.Model, UserMixin):
         job_title (str): User's job title.
         job_title_is_private (bool): Indicates if the job title is private.
         friend_id (str): Unique identifier for friends.
+        unread_notifications (int): The number of unread notifications,
+            kept up to date when notifications are added, read or deleted.
 
     Methods:
         change_username(new_username): Changes the user's username.
@@ -100,6 +104,8 @@ class User(db.Model, UserMixin):
                        nullable=False,
                        default=lambda:
                        str(random.randint(10000000, 99999999)))
+    unread_notifications = Column(Integer, nullable=False, default=0,
+                                  server_default='0')
     conversations_user1 = db.relationship('Conversation',
                                           foreign_keys='Conversation.user1_id',
                                           backref='user1_conversation',
@@ -175,20 +181,24 @@ class User(db.Model, UserMixin):
         """
         Returns a list of connected friends for the user.
 
+        The friends are read from the friend graph and
+            loaded with a single query.
+
         Returns:
             list: A list of dictionaries with friend information such as ID,
                 username, profile picture, and friendship status.
         """
-        friends = Friendship.get_friends(self.id)
-        connected_friends = []
+        friend_ids = Friendship.get_friends(self.id)
+        if not friend_ids:
+            return []
 
-        for friend_id in friends:
-            friend = User.query.get(friend_id)
+        connected_friends = []
+        for friend in User.query.filter(User.id.in_(friend_ids)):
             connected_friends.append({
                 'friend_id': friend.id,
-                'username': friend.username,
+                'username': friend.name,
                 'profile_picture': friend.profile_picture,
-                'status': self.check_friendship_status(friend_id)
+                'status': self.check_friendship_status(friend.id)
             })
 
         return connected_friends
@@ -205,13 +215,8 @@ class User(db.Model, UserMixin):
                 (e.g., 'pending', 'accepted', 'rejected')
                 or None if no friendship exists.
         """
-        friendship = db.session.query(Friendship).filter(
-            ((Friendship.user_id_1 == self.id) &
-             (Friendship.user_id_2 == friend_id)) |
-            ((Friendship.user_id_1 == friend_id) &
-             (Friendship.user_id_2 == self.id))
-        ).first()
-        return friendship.status if friendship else None
+        from website.utils.friend_graph import friend_graph
+        return friend_graph.status(self.id, friend_id)
 
     @staticmethod
     def allowed_file(filename):
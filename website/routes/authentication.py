@@ -15,6 +15,7 @@ from flask_login import login_user, login_required, logout_user, current_user
 from ..models.user import User
 from werkzeug.security import generate_password_hash, check_password_hash
 from website import db
+from website.utils.offload import run_blocking
 
 # Define authentication blueprint
 authentication = Blueprint('authentication', __name__)
@@ -36,8 +37,9 @@ def login():
         # Check if the user exists by looking up the phone number
         user = User.query.filter_by(phone_number=phone_number).first()
         if user:
-            # If the password matches, log the user in
-            if check_password_hash(user.password, password):
+            # If the password matches, log the user in; the hash is
+            # checked off the event loop so other sockets are not stalled
+            if run_blocking(check_password_hash, user.password, password):
                 flash('Logged in successfully!', 'success')
                 # Log the user in with the 'remember me' option
                 login_user(user, remember=True)
@@ -103,9 +105,9 @@ def sign_up():
                 new_user = User(
                     name=name,
                     phone_number=phone_number,
-                    # Hash the password
-                    password=generate_password_hash(password,
-                                                    method='pbkdf2:sha256')
+                    # Hash the password off the event loop
+                    password=run_blocking(generate_password_hash, password,
+                                          method='pbkdf2:sha256')
                 )
 
                 # Add the new user to the database and commit the changes
@@ -5,8 +5,10 @@ Routes:
     - POST /create_private_chat:
         Creates a private chat between the current user and another user.
     - GET /chats/<chat_id>/history:
-        Retrieves the chat history for a specific conversation
+        Retrieves one page of the chat history for a specific conversation
             and marks messages as read.
+        Query parameters `before` / `after` (optional): Cursors returned
+            by a previous page. `limit` (optional): The page size.
 """
 from flask import Blueprint, request, jsonify
 from flask_login import current_user, login_required
@@ -16,6 +18,10 @@ from ..models.user import User
 from ..models.conversation import Conversation
 from ..models.message import Message
 from ..models.group import Group
+from ..models.unread_counter import UnreadCounter
+from website.utils.pagination import (
+    encode_cursor, decode_cursor, parse_page_size)
+from website.utils.room_cache import user_rooms
 
 
 # Define conversation blueprint
@@ -77,6 +83,10 @@ def create_private_chat():
         db.session.add(new_conversation)
         db.session.commit()
 
+        # Add the chat's room to both users and their connected sockets
+        for user_id in (current_user.id, chat_user_id):
+            user_rooms.join(user_id, f'conversation_{new_conversation.id}')
+
         # Return the ID of the new chat
         return jsonify({"chat_id": new_conversation.id})
     except Exception as e:
@@ -88,14 +98,28 @@ def create_private_chat():
 @login_required
 def get_chat_history(chat_id):
     """
-    Loads chat history for a specific conversation and marks messages as read.
+    Loads one page of chat history for a specific conversation
+        and marks messages as read.
+
+    Pages are selected with (timestamp, id) cursors, so the response time
+    depends on the page size and not on the length of the conversation.
 
     Args:
         chat_id (str): The ID of the conversation to retrieve the history for.
 
+    Query Parameters:
+        - before (optional): Cursor of the oldest loaded message;
+            returns the page of older messages.
+        - after (optional): Cursor of the newest loaded message;
+            returns the page of newer messages.
+        - limit (optional): The page size (default 50, at most 100).
+
     Returns:
-        JSON: A list of messages in the conversation
+        JSON: A page of messages in chronological order, whether more
+            messages exist in the paging direction, and the cursors of the
+            oldest and newest message of the page.
         If the conversation is not found, returns a 404 error with a message.
+        If a cursor or the limit is invalid, returns a 400 error.
     """
     # Fetch the conversation based on the provided chat_id
     conversation = Conversation.query.filter_by(id=chat_id).first()
@@ -104,14 +128,22 @@ def get_chat_history(chat_id):
     if not conversation:
         return jsonify({"error": "Conversation not found"}), 404
 
-    # Fetch all messages related to this conversation, ordered by timestamp
-    messages = Message.query.filter_by(
-        conversation_id=chat_id).order_by(Message.timestamp.asc()).all()
+    # Parse the pagination parameters
+    try:
+        before = request.args.get('before')
+        after = request.args.get('after')
+        limit = parse_page_size(request.args.get('limit'))
+        before = decode_cursor(before) if before else None
+        after = decode_cursor(after) if after else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Fetch one page of messages related to this conversation
+    messages, has_more = Message.get_page(chat_id, before=before,
+                                          after=after, limit=limit)
 
     # List to store message data to be returned
     message_data = []
-    # List to store unread messages for marking them as read
-    unread_messages = []
 
     for message in messages:
         # Add the message details to the response data
@@ -125,18 +157,28 @@ def get_chat_history(chat_id):
             'is_read': message.is_read
         })
 
-        # Mark unread messages as read if they are sent to the current user
-        if not message.is_read and message.receiver_id == current_user.id:
-            message.is_read = True
-            unread_messages.append(message)
+    # Cursors of the oldest and newest message of the page
+    before_cursor = (encode_cursor(messages[0].timestamp, messages[0].id)
+                     if messages else None)
+    after_cursor = (encode_cursor(messages[-1].timestamp, messages[-1].id)
+                    if messages else None)
+
+    # Mark the messages sent to the current user as read
+    # and reset the user's unread counter for this conversation
+    Message.mark_conversation_read(chat_id, current_user.id)
+    UnreadCounter.reset(current_user.id, chat_id)
 
     # Commit the changes to mark unread messages as read
-    if unread_messages:
-        try:
-            db.session.commit()
-        except Exception as e:
-            # Roll back the session
-            db.session.rollback()
-
-    # Return the chat history as JSON
-    return jsonify({'messages': message_data})
+    try:
+        db.session.commit()
+    except Exception as e:
+        # Roll back the session
+        db.session.rollback()
+
+    # Return the page of chat history as JSON
+    return jsonify({
+        'messages': message_data,
+        'has_more': has_more,
+        'before_cursor': before_cursor,
+        'after_cursor': after_cursor
+    })
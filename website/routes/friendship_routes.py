@@ -27,9 +27,10 @@ from flask import (
 from flask_login import login_required, current_user
 from ..models.friendship import Friendship, FriendshipStatus
 from ..models.conversation import Conversation
-from ..models.notification import Notification
 from ..models.user import User
-from website import db, socketio
+from website import db
+from website.utils.friend_graph import friend_graph
+from website.utils.notifier import notifications
 
 friendship_routes_bp = Blueprint('friendship', __name__)
 
@@ -94,23 +95,15 @@ def add_friend():
                                 user_id_2=friend.id)
     db.session.add(new_friendship)
     db.session.commit()
+    friend_graph.set(current_user.id, friend.id,
+                     FriendshipStatus.PENDING.value)
 
-    # Send a notification to the user about the friend request
-    notification_message = (
-        f"{current_user.name} "
-        "has sent you a friend request."
-    )
-    notification = Notification(user_id=friend.id,
-                                message=notification_message,
-                                type='friend_request', is_read=False
-                                )
-    db.session.add(notification)
-    db.session.commit()
-
-    # Emit a real-time notification to the friend
-    socketio.emit('new_notification',
-                  {'message': notification_message, 'type': 'friend_request'},
-                  room=f"user_{friend.id}")
+    # Queue a notification to the user about the friend request;
+    # requests received in a short time are merged into one
+    notifications.notify(
+        friend.id, 'friend_request',
+        f"{current_user.name} has sent you a friend request.",
+        summary="You have {count} new friend requests.")
 
     # Show a success message and redirect to the dashboard
     flash("Friend request sent successfully", "success")
@@ -150,6 +143,7 @@ def cancel_request(friendship_id):
     # Delete the pending friend request from the database
     db.session.delete(friendship)
     db.session.commit()
+    friend_graph.remove(friendship.user_id_1, friendship.user_id_2)
 
     # Show a success message and redirect to the dashboard
     flash("Friend request has been canceled.", "success")
@@ -189,28 +183,12 @@ def accept_request(friendship_id):
     # Call the method to accept the friend request
     friendship.accept_request()
 
-    # Prepare the notification message
-    # to inform the sender that the request was accepted
-    notification_message = (
-        f"{current_user.name} has accepted your friend request."
-        )
-
-    # Create a new notification for the sender
-    notification = Notification(
-        user_id=friendship.user_id_1,
-        message=notification_message,
-        type='friend_request',
-        is_read=False
-    )
-
-    # Add the notification to the database and commit the changes
-    db.session.add(notification)
-    db.session.commit()
-
-    # Emit a real-time notification to the sender using Socket.IO
-    socketio.emit('new_notification',
-                  {'message': notification_message, 'type': 'friend_request'},
-                  room=f"user_{friendship.user_id_1}")
+    # Queue a notification to inform the sender
+    # that the request was accepted
+    notifications.notify(
+        friendship.user_id_1, 'friend_request',
+        f"{current_user.name} has accepted your friend request.",
+        summary="{count} of your friend requests were accepted.")
 
     # Show a success message and redirect to the dashboard
     flash("Friend request accepted.", "success")
@@ -296,8 +274,8 @@ def friends():
     Displays the list of friends, incoming friend requests
         and outgoing friend requests for the currently logged-in user.
 
-    Retrieves all users excluding the current user, the accepted friendships,
-    and the pending incoming and outgoing friend requests.
+    Retrieves the accepted friendships and the pending incoming
+    and outgoing friend requests.
 
     Returns:
         Renders the 'friends.html' template with the relevant data.
@@ -305,9 +283,6 @@ def friends():
     # Retrieve the current logged-in user
     user = current_user
 
-    # Retrieve all users excluding the current user
-    all_users = User.query.filter(User.id != current_user.id).all()
-
     # Retrieve all accepted friendships
     friendships = Friendship.query.filter(
         (Friendship.user_1 == user) | (Friendship.user_2 == user),
@@ -325,7 +300,6 @@ def friends():
     # Render the friends template and pass the relevant data
     return render_template(
         'friends.html',
-        all_users=all_users,
         friendships=friendships,
         incoming_requests=incoming_requests,
         outgoing_requests=outgoing_requests
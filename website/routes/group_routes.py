@@ -21,6 +21,9 @@ from flask_login import current_user, login_required
 
 from website import db
 from website.utils.allowed_file import allowed_file
+from website.utils.presence_audience import presence_audience
+from website.utils.group_cache import group_cache
+from website.utils.room_cache import user_rooms
 from ..models.user import User
 from ..models.conversation import Conversation
 from ..models.message import Message
@@ -110,6 +113,9 @@ def create_group():
         db.session.add(owner_membership)
         db.session.commit()
 
+        # Add the group's room to the owner and their connected sockets.
+        user_rooms.join(current_user.id, f'group_{new_group.id}')
+
         # Create a conversation for the newly created group.
         new_conversation = Conversation(
             type='group',
@@ -162,6 +168,12 @@ def delete_group(id):
         if group.owner_id != current_user.id:
             return jsonify({"error": "Unauthorized action"}), 403
 
+        # Drop the cached presence audience of the members
+        # while their memberships still exist.
+        presence_audience.invalidate_group(id)
+        member_ids = [user_id for user_id, in db.session.query(
+            GroupMembership.user_id).filter_by(id=id)]
+
         # Delete all messages associated with the group from the database.
         Message.query.filter_by(group_id=id).delete()
 
@@ -171,6 +183,12 @@ def delete_group(id):
         # Commit the transaction to apply all the changes.
         db.session.commit()
 
+        # Drop the cached members and conversation of the group
+        # and take the members' sockets out of its room.
+        group_cache.invalidate(id)
+        for user_id in member_ids:
+            user_rooms.leave(user_id, f'group_{id}')
+
         # After successful deletion, redirect the user back to the dashboard.
         return redirect(url_for('main_routes_bp.dashboard'))
 
@@ -204,50 +222,40 @@ def get_group_chat_history(group_id):
         # Return a 404 error indicating the group was not found.
         return jsonify({"error": "Group not found"}), 404
 
-    # Fetch all messages associated with the group,
-    # ordered by timestamp (ascending).
-    messages = Message.query.filter_by(group_id=group_id).order_by(
-                                                Message.timestamp.asc()).all()
+    # Fetch all messages associated with the group together with
+    # the sender's name, ordered by timestamp (ascending).
+    messages = db.session.query(Message, User.name).outerjoin(
+        User, User.id == Message.sender_id
+    ).filter(Message.group_id == group_id).order_by(
+        Message.timestamp.asc()).all()
 
-    # Prepare lists to hold formatted message data and track unread messages.
+    # Prepare a list to hold formatted message data.
     message_data = []
-    unread_messages = []
 
     # Loop through each message to build the response data.
-    for message in messages:
-        # Get the sender's user object using the sender_id from the message.
-        sender = User.query.get(message.sender_id)
-
-        # If the sender exists, get their name; otherwise,
-        # mark the sender as "Unknown".
-        sender_name = sender.name if sender else 'Unknown'
-
+    for message, sender_name in messages:
         # Append the message data to the message_data list.
         message_data.append({
             'id': message.id,
             'sender_id': message.sender_id,
-            'sender_name': sender_name,
+            # Mark the sender as "Unknown" if they no longer exist.
+            'sender_name': sender_name or 'Unknown',
             'content': message.content,
             'timestamp': message.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
             'is_read': message.is_read
         })
 
-        # If the message is unread and it is sent to the current user,
-        # mark it as read.
-        if not message.is_read and message.receiver_id == current_user.id:
-            message.is_read = True
-            unread_messages.append(message)
-
-    # If there are any unread messages,
-    # commit the changes to mark them as read in the database.
-    if unread_messages:
-        try:
-            # Attempt to commit the changes to the database.
-            db.session.commit()
-        except Exception as e:
-            # If an error occurs, print the error and roll back the changes.
-            print(f"Error marking messages as read: {e}")
-            db.session.rollback()
+    # Move the user's read watermark to the newest message of the group.
+    GroupMembership.mark_read(group_id, current_user.id)
+
+    # Commit the changes to mark the messages as read in the database.
+    try:
+        # Attempt to commit the changes to the database.
+        db.session.commit()
+    except Exception as e:
+        # If an error occurs, print the error and roll back the changes.
+        print(f"Error marking messages as read: {e}")
+        db.session.rollback()
 
     # Return a JSON response with the message data,
     # representing the group chat history.
@@ -288,6 +296,7 @@ def add_member_to_group(group_id):
             return jsonify({"error": "Unauthorized action"}), 403
 
         # Loop through the list of user IDs
+        added_ids = []
         for user_id in members:
             # Fetch the user from the database
             user = User.query.filter_by(id=user_id).first()
@@ -306,10 +315,20 @@ def add_member_to_group(group_id):
             # Create a new GroupMembership entry
             new_membership = GroupMembership(group=group, user_id=user_id)
             db.session.add(new_membership)
+            added_ids.append(user_id)
 
         # Commit the changes to the database
         db.session.commit()
 
+        # Drop the cached presence audience of the old and new members
+        # and the cached members of the group
+        presence_audience.invalidate_group(group_id)
+        group_cache.invalidate(group_id)
+
+        # Add the group's room to the new members and their sockets
+        for user_id in added_ids:
+            user_rooms.join(user_id, f'group_{group_id}')
+
         # Return a success message after successfully adding the users
         return jsonify(
             {"message": "Users added to the group successfully"}), 200
@@ -346,10 +365,19 @@ def leave_group(group_id):
             return jsonify({"error":
                             "You are not a member of this group"}), 404
 
+        # Drop the cached presence audience of the members,
+        # including the user leaving the group
+        presence_audience.invalidate_group(group_id)
+
         # Remove the user from the group
         db.session.delete(membership)
         db.session.commit()
 
+        # Drop the cached members of the group
+        # and take the user's sockets out of its room
+        group_cache.invalidate(group_id)
+        user_rooms.leave(current_user.id, f'group_{group_id}')
+
         return jsonify({"message": "Successfully left the group"}), 200
 
     except Exception as e:
@@ -398,12 +426,21 @@ def kick_member_from_group(group_id):
                             f"User {member_id} is not a member of this group"
                             }), 404
 
+        # Drop the cached presence audience of the members,
+        # including the member being kicked
+        presence_audience.invalidate_group(group_id)
+
         # Remove the member from the group
         db.session.delete(membership)
 
         # Commit the changes to the database
         db.session.commit()
 
+        # Drop the cached members of the group
+        # and take the member's sockets out of its room
+        group_cache.invalidate(group_id)
+        user_rooms.leave(member_id, f'group_{group_id}')
+
         return jsonify({"message":
                         "User kicked from the group successfully"}), 200
 
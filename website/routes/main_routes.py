@@ -5,7 +5,7 @@ Routes:
     - GET /home: Determines the appropriate page for the user
         (dashboard or landing page).
     - GET /welcome: Renders the landing page for new or unauthenticated users.
-    - GET /notifications: Displays a list of notifications
+    - GET /notifications: Displays one page of notifications
         for the authenticated user.
     - GET /settings: Renders the settings main page
         for the authenticated user.
@@ -14,15 +14,19 @@ Routes:
             (e.g., profile, privacy, notifications, etc.).
     - GET /dashboard: Displays the dashboard page for the authenticated user.
         Retrieves the user's conversations, groups, notifications, and more.
+    - GET /admin/rate_limits: Returns the rate limiter counters
+        to administrators.
 """
-from flask import (Blueprint, render_template,
-                   redirect, url_for, session)
+from flask import (Blueprint, render_template, current_app,
+                   redirect, url_for, session, jsonify, request, abort)
 from flask_login import login_required, current_user
 
-from ..models.user import User
 from ..models.conversation import Conversation
 from ..models.notification import Notification
 from ..models.group import Group, GroupMembership
+from website.utils.pagination import (
+    encode_cursor, decode_cursor, parse_page_size)
+from website.utils.rate_limit import rate_limiter
 
 # Define main_routes blueprint
 main_routes_bp = Blueprint('main_routes_bp', __name__)
@@ -71,24 +75,41 @@ def notifications():
     """
     Displays the notifications page for authenticated users.
 
-    - Fetches all notifications for the currently authenticated user,
-        ordered by timestamp
-    - in descending order. The notifications are passed to the template
-        for display.
+    - Fetches one page of notifications for the currently authenticated
+        user, ordered from the most recent by (timestamp, id).
+    - The notifications and the cursor of the next page are passed to
+        the template for display.
+
+    Query Parameters:
+        - before (optional): Cursor of the oldest loaded notification;
+            shows the page of older notifications.
+        - limit (optional): The page size (default 50, at most 100).
 
     Returns:
-        Response: The rendered notifications template with the
-            user's notifications.
+        Response: The rendered notifications template with one page of
+            the user's notifications.
+        If a cursor or the limit is invalid, returns a 400 error.
     """
-    # Fetch all notifications for the current user, ordered by the most recent
-    notifications = (
-        Notification.query
-        .filter_by(user_id=current_user.id)
-        .order_by(Notification.timestamp.desc())
-        .all()
-    )
+    # Parse the pagination parameters
+    try:
+        before = request.args.get('before')
+        limit = parse_page_size(request.args.get('limit'))
+        before = decode_cursor(before) if before else None
+    except ValueError:
+        abort(400)
+
+    # Fetch one page of notifications, starting from the most recent
+    notifications, has_more = Notification.get_page(
+        current_user.id, before=before, limit=limit)
+
+    # Cursor of the oldest notification, if older ones exist
+    next_cursor = (encode_cursor(notifications[-1].timestamp,
+                                 notifications[-1].id)
+                   if has_more else None)
+
     # Render the notifications page
-    return render_template('notifications.html', notifications=notifications)
+    return render_template('notifications.html', notifications=notifications,
+                           next_cursor=next_cursor)
 
 
 @main_routes_bp.route('/settings')
@@ -167,28 +188,24 @@ def dashboard():
     if not current_user.is_authenticated:
         return redirect(url_for('auth.login'))
 
-    # Retrieve all individual conversations where the user is involved
-    individual_conversations = Conversation.query.filter(
-        ((Conversation.user1_id == current_user.id) |
-            (Conversation.user2_id == current_user.id)) &
-        (Conversation.type == 'private_chat')
-    ).all()
+    # Retrieve all individual conversations where the user is involved,
+    # together with the other participant and the unread message count
+    inbox = Conversation.get_inbox(current_user.id)
 
-    # Retrieve all groups the user is a member of or owns
+    # Retrieve all groups the user is a member of or owns; both sides
+    # of the condition are looked up through an index
+    member_of = GroupMembership.query.with_entities(
+        GroupMembership.id).filter_by(user_id=current_user.id)
     groups = Group.query.filter(
-        (Group.owner_id == current_user.id) |
-        (Group.group_members.any(GroupMembership.user_id == current_user.id))
+        (Group.owner_id == current_user.id) | (Group.id.in_(member_of))
     ).all()
+
+    # Count the unread messages of every group above the user's watermark
+    group_unread = Group.get_unread_counts(current_user.id)
+
     # Initialize an empty list to store chat data
     private_chats = []
-    for conv in individual_conversations:
-        # Retrieve the friend involved in this conversation
-        friend = User.query.get(
-            conv.user2_id
-            if conv.user1_id == current_user.id
-            else conv.user1_id
-        )
-
+    for conv, friend, unread_messages in inbox:
         # Get the last message and its timestamp if available
         last_message = conv.last_message
         if conv.last_message_date:
@@ -202,6 +219,9 @@ def dashboard():
             # Conversation ID
             'id': (conv.id),
 
+            # Friend's user ID, used to match their status updates
+            'user_id': (friend.id if friend else None),
+
             # Friend's username or "Unknown" if not available
             'name': (friend.name if friend else "Unknown"),
 
@@ -293,13 +313,7 @@ def dashboard():
                                   else "N/A"),
 
             # Count of unread messages for the current user
-            'unread_messages': (
-                len([msg for msg in conv.messages
-                    if not msg.is_read and
-                    msg.receiver_id == current_user.id])
-                if conv.messages
-                else 0
-            ),
+            'unread_messages': unread_messages,
 
             # Friend's online/offline status
             'status': friend.status if friend else 'offline',
@@ -319,24 +333,34 @@ def dashboard():
         # Append the chat data to the list
         private_chats.append(chat_data)
 
-    # Fetch notifications for the authenticated user
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id).order_by(Notification.timestamp.desc()).all()
-
-    # Count unread notifications for the user
-    unread_notifications = Notification.query.filter_by(
-        user_id=current_user.id, is_read=False).count()
-
-    # Retrieve all users except the currently logged-in user
-    users = User.query.filter(User.id != current_user.id).all()
+    # Unread notifications are counted as they are added and read
+    unread_notifications = current_user.unread_notifications
 
     # Render the dashboard page with the chat, group, user,
     # and notification data
     return render_template('dashboard.html',
                            private_chats=private_chats,
                            groups=groups,
-                           users=users,
+                           group_unread=group_unread,
                            current_user_id=current_user.id,
                            theme=theme,
-                           notifications=notifications,
                            unread_notifications=unread_notifications)
+
+
+@main_routes_bp.route('/admin/rate_limits')
+@login_required
+def rate_limit_stats():
+    """
+    Returns the counters of the socket event rate limiter.
+
+    Only users listed in ADMIN_USER_IDS may read them. The counters
+    belong to the worker that serves the request.
+
+    Returns:
+        Response: A JSON response with the number of dropped events
+            per event type and the number of tracked sockets and users.
+    """
+    if current_user.id not in current_app.config.get('ADMIN_USER_IDS', ()):
+        return jsonify({"error": "Unauthorized action"}), 403
+
+    return jsonify(rate_limiter.stats()), 200
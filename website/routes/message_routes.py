@@ -11,6 +11,7 @@ from flask import Blueprint, jsonify
 from flask_login import login_required, current_user
 from website import db
 from ..models.message import Message
+from ..models.unread_counter import UnreadCounter
 from website import socketio
 
 message_routes_bp = Blueprint('message', __name__)
@@ -25,7 +26,8 @@ def delete_message(message_id):
     - Retrieves the message by its ID.
     - Checks if the message exists.
     - Verifies that the current user is the sender of the message.
-    - Deletes the message if the user is authorized.
+    - Deletes the message if the user is authorized, and takes an unread
+        private message off the receiver's unread counter.
     - Emits a chat history update event to all users in the conversation.
     - Returns a success message or error message in the response.
 
@@ -51,6 +53,10 @@ def delete_message(message_id):
         # Get the conversation ID before deleting the message
         conversation_id = message.conversation_id
 
+        # An unread private message no longer counts for its receiver
+        if not message.is_read and message.receiver_id:
+            UnreadCounter.decrement(message.receiver_id, conversation_id)
+
         # Delete the message from the database
         db.session.delete(message)
         db.session.commit()
@@ -2,64 +2,151 @@
 Module that contains notification routes in the ChatFlow application.
 
 Routes:
-    - GET /notifications:
-        Fetches notifications for the logged-in user.
+    - GET /api/notifications:
+        Fetches one page of notifications for the logged-in user, as JSON.
+        The notifications page itself is served by main_routes
+        at /notifications.
         Query parameter `unread` (optional): If set to true,
             returns only unread notifications.
+        Query parameters `before` and `limit` (optional):
+            The cursor of the page and the page size.
     - POST /notifications/<notification_id>/read:
         Marks a specific notification as read for the logged-in user.
     - DELETE /notifications/<notification_id>:
         Deletes a specific notification for the logged-in user.
+    - POST /notifications/read:
+        Marks many notifications of the logged-in user as read.
+    - POST /notifications/delete:
+        Deletes many notifications of the logged-in user.
 """
+from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from website import db
 from ..models.notification import Notification
+from website.utils.pagination import (
+    encode_cursor, decode_cursor, parse_page_size)
 
 
 # Define notification routes blueprint
 notification_routes_bp = Blueprint('notification', __name__)
 
+# Largest number of notification IDs accepted by a bulk request
+MAX_BULK_IDS = 500
 
-@notification_routes_bp.route('/notifications', methods=['GET'])
+
+def parse_bulk_selection(data):
+    """
+    Parses the notifications selected by a bulk request.
+
+    The request body holds exactly one of:
+        - ids: A list of notification IDs.
+        - before: An ISO 8601 timestamp; selects the notifications
+            created at or before it.
+        - all: true; selects every notification.
+
+    Args:
+        data (dict): The JSON body of the request.
+
+    Returns:
+        tuple: The (ids, before) selection, both None to select all.
+
+    Raises:
+        ValueError: If the selection is missing or malformed.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("A JSON body is required")
+
+    selectors = [key for key in ('ids', 'before', 'all') if key in data]
+    if len(selectors) != 1:
+        raise ValueError("Exactly one of 'ids', 'before' or 'all' is required")
+
+    if 'ids' in data:
+        ids = data['ids']
+        if (not isinstance(ids, list)
+                or not all(isinstance(i, str) for i in ids)):
+            raise ValueError("'ids' must be a list of notification IDs")
+        if len(ids) > MAX_BULK_IDS:
+            raise ValueError(f"At most {MAX_BULK_IDS} IDs are allowed")
+        return ids, None
+
+    if 'before' in data:
+        try:
+            before = datetime.fromisoformat(data['before'])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid timestamp: {data['before']}") from e
+        # Timestamps are stored as naive UTC
+        if before.tzinfo is not None:
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+        return None, before
+
+    if data['all'] is not True:
+        raise ValueError("'all' must be true")
+    return None, None
+
+
+@notification_routes_bp.route('/api/notifications', methods=['GET'])
 @login_required
 def get_notifications():
     """
-    Fetches notifications for the logged-in user.
+    Fetches one page of notifications for the logged-in user, as JSON.
+
+    Pages are selected with (timestamp, id) cursors, from the most
+    recent notification.
 
     Query Parameters:
         - unread (optional): If set to 'true',
             only unread notifications are returned.
+        - before (optional): Cursor of the oldest loaded notification;
+            returns the page of older notifications.
+        - limit (optional): The page size (default 50, at most 100).
 
     Returns:
-        - JSON response containing a list of notifications with details like:
-            - id: Notification ID.
-            - message: Notification message.
-            - type: Notification type (e.g., 'info', 'alert').
-            - is_read: Boolean indicating if the notification is read.
-            - timestamp: Date and time of the notification
+        - JSON response containing:
+            - notifications: A list of notifications with details like:
+                - id: Notification ID.
+                - message: Notification message.
+                - type: Notification type (e.g., 'info', 'alert').
+                - is_read: Boolean indicating if the notification is read.
+                - timestamp: Date and time of the notification
+            - has_more: Whether older notifications exist.
+            - next_cursor: Cursor of the page of older notifications.
+            - unread_count: The number of unread notifications.
+        - 400 error if a cursor or the limit is invalid.
     """
     # Check if only unread notifications should be fetched
     unread_only = request.args.get('unread', 'false').lower() == 'true'
 
-    # Query the database for notifications belonging to the current user
-    notifications_query = Notification.query.filter_by(
-        user_id=current_user.id)
-    if unread_only:
-        notifications_query = notifications_query.filter_by(is_read=False)
+    # Parse the pagination parameters
+    try:
+        before = request.args.get('before')
+        limit = parse_page_size(request.args.get('limit'))
+        before = decode_cursor(before) if before else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Fetch one page of notifications, starting from the most recent
+    notifications, has_more = Notification.get_page(
+        current_user.id, before=before, limit=limit, unread_only=unread_only)
 
-    # Order notifications by the most recent and fetch all results
-    notifications = notifications_query.order_by(
-        Notification.timestamp.desc()).all()
+    # Cursor of the oldest notification, if older ones exist
+    next_cursor = (encode_cursor(notifications[-1].timestamp,
+                                 notifications[-1].id)
+                   if has_more else None)
 
     # Return notifications in JSON format
-    return jsonify([{
-        'id': n.id,
-        'message': n.message,
-        'type': n.type,
-        'is_read': n.is_read,
-        'timestamp': n.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-    } for n in notifications])
+    return jsonify({
+        'notifications': [{
+            'id': n.id,
+            'message': n.message,
+            'type': n.type,
+            'is_read': n.is_read,
+            'timestamp': n.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        } for n in notifications],
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'unread_count': current_user.unread_notifications
+    })
 
 
 @notification_routes_bp.route(
@@ -82,9 +169,8 @@ def mark_notification_read(notification_id):
         id=notification_id, user_id=current_user.id).first()
 
     if notification:
-        # Update the notification's read status
-        notification.is_read = True
-        db.session.commit()
+        # Update the notification's read status and the unread count
+        notification.mark_as_read()
         return jsonify({"success": True})
 
     # Return an error if the notification is not found
@@ -114,7 +200,58 @@ def delete_notification(notification_id):
         return jsonify(
             {'error': 'Notification not found or access denied'}), 404
 
-    # Delete the notification and commit the changes
-    db.session.delete(notification)
+    # Delete the notification, update the unread count
+    # and commit the changes
+    Notification.delete_many(current_user.id, ids=[notification_id])
     db.session.commit()
     return jsonify({'success': True})
+
+
+@notification_routes_bp.route('/notifications/read', methods=['POST'])
+@login_required
+def mark_notifications_read():
+    """
+    Marks many notifications as read for the logged-in user.
+
+    The notifications are selected as described in `parse_bulk_selection`
+    and updated with a single statement.
+
+    Returns:
+        - JSON response with a success flag and the number of
+            notifications that were marked as read.
+        - 400 error if the selection is missing or malformed.
+    """
+    try:
+        ids, before = parse_bulk_selection(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    updated = Notification.mark_many_read(current_user.id,
+                                          ids=ids, before=before)
+    db.session.commit()
+    return jsonify({"success": True, "updated": updated})
+
+
+@notification_routes_bp.route('/notifications/delete', methods=['POST'])
+@login_required
+def delete_notifications():
+    """
+    Deletes many notifications for the logged-in user.
+
+    The notifications are selected as described in `parse_bulk_selection`
+    and deleted with a single statement.
+
+    Returns:
+        - JSON response with a success flag and the number of
+            notifications that were deleted.
+        - 400 error if the selection is missing or malformed.
+    """
+    try:
+        ids, before = parse_bulk_selection(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    deleted = Notification.delete_many(current_user.id,
+                                       ids=ids, before=before)
+    db.session.commit()
+    return jsonify({"success": True, "deleted": deleted})
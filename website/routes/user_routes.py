@@ -15,9 +15,10 @@ from flask import (Blueprint, redirect, flash,
                    url_for, jsonify, request, current_app)
 from flask_login import login_required, current_user
 
-from ..utils import allowed_file
+from ..utils.allowed_file import allowed_file
 from website import db
 from website.models.user import User
+from website.utils.user_cache import user_display_cache
 
 import os
 import datetime
@@ -88,6 +89,7 @@ def upload_profile_picture():
         # Update the user's profile picture in the database
         current_user.profile_picture = filename
         db.session.commit()
+        user_display_cache.invalidate(current_user.id)
         # Redirect to the dashboard with a success message
         return redirect(url_for(
             'main_routes_bp.dashboard',
@@ -197,6 +199,7 @@ def update_profile():
         # Return an error for unsupported or invalid fields
         return jsonify({'success': False, 'message': 'Invalid field'}), 400
     db.session.commit()
+    user_display_cache.invalidate(current_user.id)
     return jsonify({'success': True})
 
 
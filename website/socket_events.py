@@ -1,247 +1,390 @@
 from website import socketio
+from flask import current_app, request
 from flask_login import current_user
-from flask_socketio import emit, join_room, leave_room
-from website.models.user import User
+from flask_socketio import emit, join_room
 from website.models.message import Message
 from website.models.conversation import Conversation
 from website.models.group import Group, GroupMembership
-from website.models.notification import Notification
+from website.models.unread_counter import UnreadCounter
 from website import db
+from website.utils.user_cache import user_display_cache
+from website.utils.group_cache import group_cache
+from website.utils.room_cache import user_rooms
+from website.utils.presence import presence
+from website.utils.presence_audience import emit_presence
+from website.utils.message_writer import (
+    find_original, message_writer, write_messages)
+from website.utils.send_dedup import send_dedup
+from website.utils.rate_limit import rate_limited, rate_limiter
+from website.utils.session_scope import session_scope
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+from uuid import uuid4
 
 import pytz
 
 
 @socketio.on('connect')
+@session_scope
 def user_connected():
     """
     Handles a new socket connection when a user connects to the server.
 
     - Checks if the user is authenticated.
-    - Updates the user's status to 'online'
-        and updates the last seen timestamp.
-    - Retrieves all conversations that the user is a part of
-        (either as user1 or user2).
-    - Retrieves all groups the user is a member of.
-    - Joins the corresponding rooms for each conversation and group
-        to receive real-time updates.
-    - Emits the chat history for each conversation and group.
+    - Registers the socket in the presence registry, which marks the user
+        as online on their first socket and persists the status
+        and last seen timestamp in periodic batches.
+    - Joins the rooms of the user's conversations and groups
+        to receive real-time updates, taken from the room cache
+        without querying the database.
+    - Emits a compact inbox snapshot with the room of every conversation
+        and group, the last message and the unread counts.
+        Chat history is fetched on demand when a chat is opened.
     """
     if current_user.is_authenticated:
-        # Update user's status to 'online' and set the 'last_seen' timestamp
-        current_user.status = 'online'
-        current_user.last_seen = datetime.now(pytz.utc)
-        db.session.commit()
-
-        # Retrieve all conversations the user is part of
-        conversations = Conversation.query.filter(
-            (Conversation.user1_id == current_user.id) |
-            (Conversation.user2_id == current_user.id)
-        ).all()
-
-        # Retrieve all groups the user is a member of
-        groups = Group.query.join(Group.group_members).filter(
-            GroupMembership.user_id == current_user.id
-        ).all()
-
-        # Iterate through each conversation the user is part of
-        for conversation in conversations:
-            # Join the conversation room using the conversation ID
-            join_room(f'conversation_{conversation.id}')
-
-            # Fetch all messages for the current conversation
-            messages = Message.query.filter_by(
-                conversation_id=conversation.id
-            ).order_by(Message.timestamp).all()
-
-            # Prepare the message data to be sent as a list of dictionaries
-            messages_data = [{'message': msg.content,
-                              'sender_id': msg.sender_id,
-                              'timestamp': msg.timestamp.isoformat()}
-                             for msg in messages]
-
-            # Emit the chat history to the client for the specific conversation
-            emit('chat_history',
-                 {'conversation_id': conversation.id,
-                  'messages': messages_data},
-                 room=f'conversation_{conversation.id}')
-
-        # Iterate through each group the user is a member of
-        for group in groups:
-            # Join the group room using the group ID
-            join_room(f'group_{group.id}')
-
-            # Fetch all messages for the current group
-            group_messages = Message.query.filter_by(
-                conversation_id=group.id
-            ).order_by(Message.timestamp).all()
-
-            # Prepare the message data for groups to be sent
-            group_messages_data = [{'message': msg.content,
-                                    'sender_id': msg.sender_id,
-                                    'timestamp': msg.timestamp.isoformat()}
-                                   for msg in group_messages]
-
-            # Emit the chat history to the client for the specific group
-            emit('group_chat_history',
-                 {'group_id': group.id,
-                  'messages': group_messages_data},
-                 room=f'group_{group.id}')
-
-        # Emit the user's online status to all connected clients,
-        # broadcasting the status update
-        emit('status_update',
-             {'user_id': current_user.id, 'status': 'online'}, broadcast=True)
+        # Register the socket; the user comes online with their first one
+        presence.start_flusher(current_app._get_current_object())
+        came_online = presence.connect(current_user.id, request.sid)
+
+        # Join the user's personal room for events addressed to them
+        join_room(f'user_{current_user.id}')
+
+        # Join the rooms of the user's conversations and groups
+        rooms = user_rooms.get(current_user.id)
+        for room in rooms:
+            join_room(room)
+
+        # Retrieve all private conversations the user is part of
+        # together with their unread counts
+        inbox = Conversation.get_inbox(current_user.id)
+
+        # Retrieve the last message and unread count of every group
+        # the user is a member of
+        group_inbox = Group.get_inbox(current_user.id)
+
+        conversations_data = []
+        for conversation, _, unread_count in inbox:
+            conversations_data.append({
+                'conversation_id': conversation.id,
+                'room': f'conversation_{conversation.id}',
+                'last_message': conversation.last_message,
+                'last_message_date': (
+                    conversation.last_message_date.isoformat()
+                    if conversation.last_message_date else None),
+                'unread_count': unread_count
+            })
+
+        groups_data = []
+        for group_id, last_message, last_message_date, unread_count in (
+                group_inbox):
+            groups_data.append({
+                'group_id': group_id,
+                'room': f'group_{group_id}',
+                'last_message': last_message,
+                'last_message_date': (last_message_date.isoformat()
+                                      if last_message_date else None),
+                'unread_count': unread_count
+            })
+
+        # Send the snapshot to the connecting socket only
+        emit('inbox_snapshot', {'conversations': conversations_data,
+                                'groups': groups_data})
+
+        # Emit the user's online status to their friends
+        # and the members of their groups
+        if came_online:
+            emit_presence(current_user.id, 'online')
 
 
 @socketio.on('disconnect')
+@session_scope
 def user_disconnected():
     """
     Handles socket disconnection when a user disconnects from the server.
 
     - Checks if the user is authenticated.
-    - Updates the user's status to 'offline' and sets the last seen timestamp.
-    - Commits the changes to the database.
-    - Retrieves all conversations the user is part of
-        (either as user1 or user2).
-    - Removes the user from the corresponding rooms for each conversation.
+    - Unregisters the socket from the presence registry, which marks the
+        user as offline only when their last socket closes.
+        Socket.IO takes the socket out of its rooms by itself.
     - Emits the user's updated status ('offline')
-        to the frontend for all connected clients.
+        to their friends and the members of their groups
+        once their last socket is closed.
+    - Drops the rate limit buckets of the socket, and of the user
+        once their last socket is closed.
     """
-    if current_user.is_authenticated:
-        # Update user's status to 'offline' and set the 'last_seen' timestamp
-        current_user.status = 'offline'
-        current_user.last_seen = datetime.utcnow()
-        db.session.commit()
-
-        # Retrieve all conversations the user is part of
-        conversations = Conversation.query.filter(
-            (Conversation.user1_id == current_user.id) |
-            (Conversation.user2_id == current_user.id)
-        ).all()
+    rate_limiter.discard_socket(request.sid)
 
-        # Iterate through each conversation the user is part of
-        for conversation in conversations:
-            # Leave the conversation room using the conversation ID
-            leave_room(f'conversation_{conversation.id}')
+    if current_user.is_authenticated:
+        # Unregister the socket; the user goes offline with their last one
+        went_offline = presence.disconnect(current_user.id, request.sid)
+        if went_offline:
+            rate_limiter.discard_user(current_user.id)
 
-        # Emit status update to the frontend for all connected clients
-        emit('status_update',
-             {'user_id': current_user.id, 'status': 'offline'},
-             room=current_user.id)
+            # Emit the user's offline status to their friends
+            # and the members of their groups
+            emit_presence(current_user.id, 'offline')
 
 
 @socketio.on('status_update')
+@session_scope
+@rate_limited('status_update')
 def handle_status_update(data):
-    user_id = data.get('user_id')
+    """
+    Forwards a status change of the current user to their audience.
+
+    The status is always attributed to the authenticated user and only
+    delivered to their friends and the members of their groups.
+    """
+    if not current_user.is_authenticated:
+        return {'error': 'Authentication required.'}
+
     status = data.get('status')
-    emit('status_update', {'user_id': user_id,
-         'status': status}, broadcast=True)
+    if status not in ('online', 'offline', 'away'):
+        return {'error': 'Invalid status.'}
+
+    emit_presence(current_user.id, status)
+
+
+# Version of the message_created payload, bumped on breaking changes
+MESSAGE_CREATED_VERSION = 1
+
+
+def persist_message(message_row):
+    """
+    Persists a sent message, directly or through the write-behind queue.
+
+    With MESSAGE_WRITE_BEHIND enabled, the message is queued and written
+    in a later batch, so it can be emitted right away. When the queue is
+    full, or write-behind is disabled, the message is written before
+    returning.
+
+    A send retried with the same client message ID after it left the
+    dedup window returns the original message instead: from the
+    write-behind queue while it is waiting there, or from the database,
+    whose unique constraint rejects the retry.
+
+    Args:
+        message_row (dict): The message as a dictionary of Message columns.
+
+    Returns:
+        dict: The stored message row, which is the original message's
+            row for a retried send.
+    """
+    if current_app.config.get('MESSAGE_WRITE_BEHIND'):
+        message_writer.start(current_app._get_current_object())
+
+        # The original of a retried send may still be queued
+        if message_row.get('client_message_id'):
+            pending = message_writer.find_pending(
+                message_row['sender_id'], message_row['client_message_id'])
+            if pending:
+                return pending
+
+        if message_writer.submit(message_row):
+            return message_row
+
+    try:
+        write_messages([message_row])
+    except IntegrityError:
+        db.session.rollback()
+        original = find_original(message_row)
+        if not original:
+            raise
+        return {**message_row, 'id': original.id,
+                'timestamp': original.timestamp}
+    return message_row
 
 
 @socketio.on('send_message')
+@session_scope
+@rate_limited('send_message')
 def handle_send_message(data):
+    """
+    Sends a message from the current user to a private chat.
+
+    - Authorizes the sender as a participant of the conversation and
+        takes the receiver from the conversation, not from the payload.
+    - Persists the message and emits one message_created event
+        to the inboxes of the participants.
+
+    Returns:
+        dict: The acknowledgement with the message ID, or an error.
+    """
+    if not current_user.is_authenticated:
+        return {'error': 'Authentication required.'}
+
     try:
         conversation_id = data['conversation_id']
-        sender_id = data['sender_id']
+        # The sender is always the authenticated user
+        sender_id = current_user.id
         message_content = data['message']
+        client_message_id = data.get('client_message_id')
         timestamp = datetime.now(pytz.utc)
 
+        if client_message_id and len(str(client_message_id)) > 64:
+            return {'error': 'Invalid client message ID.'}
+
+        # Answer a retried send with its original acknowledgement
+        if client_message_id:
+            ack = send_dedup.get(sender_id, client_message_id)
+            if ack:
+                return ack
+
         # Get the conversation from the database
         conversation = Conversation.query.filter_by(id=conversation_id).first()
 
         if conversation:
             last_message_date = datetime.now(pytz.utc)
 
-            # For group conversations, there is no specific receiver_id
-            receiver_id = None if conversation.type == 'group' else data.get(
-                'receiver_id')
-
-            # Create a new message and add it to the database
-            new_message = Message(
-                conversation_id=conversation_id,
-                sender_id=sender_id,
-                receiver_id=receiver_id,
-                content=message_content,
-                timestamp=timestamp
-            )
-            timestamp_str = timestamp.isoformat()
-            db.session.add(new_message)
-
-            # Update the conversation's last message and last message date
-            conversation.last_message = message_content
-            conversation.last_message_date = last_message_date
-            db.session.commit()
+            # Only participants may send messages to the conversation
+            participant_ids = conversation.get_participant_ids()
+            if sender_id not in participant_ids:
+                return {'error': 'You are not part of this conversation.'}
 
-            # Emit the message with the formatted timestamp
-            emit('new_message', {
+            # For group conversations, there is no specific receiver_id
+            receiver_id = None if conversation.type == 'group' else next(
+                (participant_id for participant_id in participant_ids
+                 if participant_id != sender_id), None)
+
+            # Collect the inboxes of the participants
+            inbox_rooms = [f'user_{participant_id}'
+                           for participant_id in participant_ids]
+
+            # Create the new message with a server-assigned ID and persist
+            # it together with the conversation's last message and the
+            # receiver's unread counter
+            message_row = {
+                'id': str(uuid4()),
                 'conversation_id': conversation_id,
                 'sender_id': sender_id,
-                'message': message_content,
-                'timestamp': timestamp_str,
-                # Use isoformat for a standard timestamp
-                'last_message_date': last_message_date.isoformat()
-            }, room=f'conversation_{conversation_id}')
-
-            # Emit last message update to all users listening
-            emit('last_message_update', {
+                'receiver_id': receiver_id,
+                'content': message_content,
+                'timestamp': timestamp,
+                'client_message_id': client_message_id
+            }
+            timestamp_str = timestamp.isoformat()
+            stored_row = persist_message(message_row)
+
+            # Acknowledge the send and remember it for retries
+            ack = {
+                'message_id': stored_row['id'],
                 'conversation_id': conversation_id,
-                'last_message': message_content,
-                'last_message_date': last_message_date.isoformat()
-            }, broadcast=True)
-
-            # Emit chat history update to the room
-            emit('chat_history_update', {
-                 'conversation_id': conversation_id},
-                 room=f'conversation_{conversation_id}')
+                'timestamp': stored_row['timestamp'].isoformat()
+            }
+            if client_message_id:
+                send_dedup.remember(sender_id, client_message_id, ack)
+
+            # The original of a retried send was already emitted
+            if stored_row['id'] != message_row['id']:
+                return ack
+
+            # Emit one event with everything the participants need to
+            # update the open chat and their inbox
+            emit('message_created', {
+                'version': MESSAGE_CREATED_VERSION,
+                'message': {
+                    'id': message_row['id'],
+                    'conversation_id': conversation_id,
+                    'sender_id': sender_id,
+                    'receiver_id': receiver_id,
+                    'content': message_content,
+                    'timestamp': timestamp_str,
+                    'is_read': False
+                },
+                'conversation': {
+                    'id': conversation_id,
+                    'last_message': message_content,
+                    'last_message_date': last_message_date.isoformat()
+                }
+            }, to=inbox_rooms)
+            return ack
         else:
             emit('error', {'error': 'Conversation not found.'})
+            return {'error': 'Conversation not found.'}
 
     except KeyError as e:
         print(f"Missing key: {e}")
         emit('error', {'error': f'Missing key: {e}'})
+        return {'error': f'Missing key: {e}'}
     except Exception as e:
         print(f"Error: {e}")
         emit('error', {'error': f'An error occurred: {e}'})
+        return {'error': f'An error occurred: {e}'}
 
 
 @socketio.on('send_group_message')
+@session_scope
+@rate_limited('send_group_message')
 def handle_send_group_message(data):
+    """
+    Sends a message from the current user to a group.
+
+    - Authorizes the sender as a member of the group and resolves the
+        group's conversation from the group cache.
+    - Persists the message; a cache hit needs no other query.
+    - Emits the message to the group room.
+
+    Returns:
+        dict: The acknowledgement with the message ID, or an error.
+    """
+    if not current_user.is_authenticated:
+        return {'error': 'Authentication required.'}
+
     try:
-        sender_id = data['sender_id']
         group_id = data['group_id']
         content = data['content']
-        timestamp = datetime.now()
+        client_message_id = data.get('client_message_id')
+        timestamp = datetime.now(pytz.utc)
     except KeyError as e:
         print(f'Missing key: {str(e)}')  # Log which key is missing
         return {'error': f'Missing key: {str(e)}'}
 
-    # Check if the group exists
-    group = Group.query.get(group_id)
+    # The sender is always the authenticated user
+    sender_id = current_user.id
+
+    if client_message_id and len(str(client_message_id)) > 64:
+        return {'error': 'Invalid client message ID.'}
+
+    # Answer a retried send with its original acknowledgement
+    if client_message_id:
+        ack = send_dedup.get(sender_id, client_message_id)
+        if ack:
+            return ack
+
+    # Resolve the group's conversation and members from the cache
+    group = group_cache.get(group_id)
     if not group:
         return {"error": "Group not found"}
 
-    # Find or create a conversation for the group
-    conversation = Conversation.query.filter_by(group_id=group.id).first()
-    if not conversation:
-        conversation = group.create_group_conversation()
-
-    sender = User.query.get(sender_id)
-    if not sender:
-        return {"error": "Sender not found"}
-    sender_name = sender.name
-    # Create the message
-    message = Message(
-        content=content,
-        sender_id=sender_id,
-        group_id=group_id,
-        conversation_id=conversation.id,
-        timestamp=datetime.now(pytz.utc)
-    )
+    # Only members may send messages to the group
+    if sender_id not in group['member_ids']:
+        return {"error": "You are not a member of this group"}
+
+    sender_name = user_display_cache.get(sender_id)['name']
+    conversation_id = group['conversation_id']
+
+    # Create the message with a server-assigned ID and persist it
+    message_row = {
+        'id': str(uuid4()),
+        'content': content,
+        'sender_id': sender_id,
+        'group_id': group_id,
+        'conversation_id': conversation_id,
+        'timestamp': timestamp,
+        'client_message_id': client_message_id
+    }
     timestamp_str = timestamp.isoformat()
+    stored_row = persist_message(message_row)
 
-    db.session.add(message)
-    db.session.commit()
+    # Acknowledge the send and remember it for retries
+    ack = {"success": "Message sent successfully",
+           'message_id': stored_row['id']}
+    if client_message_id:
+        send_dedup.remember(sender_id, client_message_id, ack)
+
+    # The original of a retried send was already emitted
+    if stored_row['id'] != message_row['id']:
+        return ack
 
     # Emit the message to the group room
     emit('new_group_message', {
@@ -250,12 +393,94 @@ def handle_send_group_message(data):
         'group_id': group_id,
         'content': content,
         'timestamp': timestamp_str,
-        'message_id': message.id,
-        'conversation_id': conversation.id
-    }, room=f'group_{group.id}')
+        'message_id': message_row['id'],
+        'conversation_id': conversation_id
+    }, room=f'group_{group_id}')
     # Emit group history update
     emit('group_history_update', {
-        'group_id': group.id,
-        'conversation_id': conversation.id
-    }, room=f'group_{group.id}')
-    return {"success": "Message sent successfully"}
+        'group_id': group_id,
+        'conversation_id': conversation_id
+    }, room=f'group_{group_id}')
+    return ack
+
+
+@socketio.on('mark_messages_read')
+@session_scope
+def handle_mark_messages_read(data):
+    """
+    Marks all messages of a conversation sent to the current user as read.
+
+    - Marks the messages as read with a single UPDATE.
+    - Resets the user's unread counter for the conversation.
+    - Emits a read receipt with the number of messages read
+        to the conversation room.
+
+    Returns:
+        dict: The number of messages that were marked as read.
+    """
+    if not current_user.is_authenticated:
+        return {'error': 'Authentication required.'}
+
+    conversation_id = data.get('conversation_id')
+    if not conversation_id:
+        return {'error': 'Missing key: conversation_id'}
+
+    # Mark the messages as read and reset the unread counter
+    read_count = Message.mark_conversation_read(conversation_id,
+                                                current_user.id)
+    UnreadCounter.reset(current_user.id, conversation_id)
+    db.session.commit()
+
+    # Let the sender know their messages were read
+    if read_count:
+        emit('messages_read', {
+            'conversation_id': conversation_id,
+            'reader_id': current_user.id,
+            'read_count': read_count
+        }, room=f'conversation_{conversation_id}')
+
+    return {'read_count': read_count}
+
+
+@socketio.on('mark_group_read')
+@session_scope
+def handle_mark_group_read(data):
+    """
+    Marks all messages of a group as read for the current user.
+
+    - Authorizes the user as a member of the group from the group cache.
+    - Moves the user's read watermark to the newest message of the group.
+    - Emits a read receipt with the newest read message to the group room.
+
+    Returns:
+        dict: The ID of the newest message that was read.
+    """
+    if not current_user.is_authenticated:
+        return {'error': 'Authentication required.'}
+
+    group_id = data.get('group_id')
+    if not group_id:
+        return {'error': 'Missing key: group_id'}
+
+    # Only members may read the messages of the group
+    group = group_cache.get(group_id)
+    if not group:
+        return {"error": "Group not found"}
+    if current_user.id not in group['member_ids']:
+        return {"error": "You are not a member of this group"}
+
+    # Move the watermark to the newest message of the group
+    newest = GroupMembership.mark_read(group_id, current_user.id)
+    db.session.commit()
+
+    if not newest:
+        return {'last_read_message_id': None}
+
+    # Let the other members know up to which message the user has read
+    emit('group_read', {
+        'group_id': group_id,
+        'reader_id': current_user.id,
+        'last_read_message_id': newest.id
+    }, room=f'group_{group_id}')
+
+    return {'last_read_message_id': newest.id}
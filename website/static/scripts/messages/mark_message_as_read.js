@@ -10,3 +10,29 @@ function markMessageAsRead (messageId) {
   // Emit the 'mark_message_read' event with the message ID to notify the server
   socket.emit('mark_message_read', { message_id: messageId });
 }
+
+/**
+ * Marks all messages of a conversation sent to the current user as read.
+ *
+ * The server marks the messages with a single update and emits a 'messages_read'
+ * read receipt to the conversation room.
+ *
+ * @param {string} conversationId - The unique identifier of the conversation.
+ */
+function markConversationAsRead (conversationId) {
+  // Emit the 'mark_messages_read' event with the conversation ID to notify the server
+  socket.emit('mark_messages_read', { conversation_id: conversationId });
+}
+
+/**
+ * Marks all messages of a group as read for the current user.
+ *
+ * The server moves the user's read watermark to the newest message of the group
+ * and emits a 'group_read' read receipt to the group room.
+ *
+ * @param {string} groupId - The unique identifier of the group.
+ */
+function markGroupAsRead (groupId) {
+  // Emit the 'mark_group_read' event with the group ID to notify the server
+  socket.emit('mark_group_read', { group_id: groupId });
+}
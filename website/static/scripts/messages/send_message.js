@@ -1,3 +1,38 @@
+/**
+ * Emits a send event until the server acknowledges it.
+ *
+ * The payload carries a client-generated message ID, so the server answers
+ * a retry of an already handled send with the original acknowledgement
+ * instead of storing the message twice.
+ *
+ * @param {string} eventName - The name of the send event.
+ * @param {Object} payload - The message data, including its client message ID.
+ * @param {number} [attempt=1] - The number of the current attempt.
+ */
+function emitWithRetry (eventName, payload, attempt = 1) {
+  socket.timeout(5000).emit(eventName, payload, (err, ack) => {
+    // Retry with the same client message ID when no acknowledgement arrived
+    if (err) {
+      if (attempt < 5) {
+        setTimeout(() => emitWithRetry(eventName, payload, attempt + 1), 1000 * attempt);
+      } else {
+        console.error(`Failed to send message ${payload.client_message_id}`);
+      }
+      return;
+    }
+
+    // Send again once the rate limit allows it
+    if (ack && ack.code === 'rate_limited' && attempt < 5) {
+      setTimeout(() => emitWithRetry(eventName, payload, attempt + 1), ack.retry_after * 1000);
+      return;
+    }
+
+    if (ack && ack.error) {
+      console.error('Error sending message:', ack.error);
+    }
+  });
+}
+
 /**
  * Function to handle sending a message in a conversation.
  *
@@ -18,22 +53,17 @@ function sendMessage(conversationId) {
   // If no message content, do not proceed
   if (!messageContent) return;
 
-  // Get the sender ID from the send button's data attributes
+  // The server takes the sender and the receiver from the session and the conversation
   const sendButton = document.querySelector(`button[data-conversation-id="${conversationId}"]`);
-  const senderId = sendButton.getAttribute('data-sender-id');
-
-  // Determine if this is a group conversation by checking if the receiver_id is available
-  const receiverId = sendButton.getAttribute('data-receiver-id') || null;
 
   // Disable the send button temporarily to prevent multiple sends
   sendButton.disabled = true;
 
   // Emit the message via Socket.IO to the server
-  socket.emit('send_message', {
+  emitWithRetry('send_message', {
     conversation_id: conversationId, // The current conversation ID
-    sender_id: senderId, // The sender's user ID
-    receiver_id: receiverId, // The receiver's user ID (null for group chats)
-    message: messageContent // The actual message content
+    message: messageContent, // The actual message content
+    client_message_id: crypto.randomUUID() // Lets the server detect retries
   });
 
   // Clear the input field after sending the message
@@ -102,11 +132,12 @@ function sendGroupMessage(groupId) {
   sendButton.disabled = true;
 
   // Emit message to the server for this group
-  socket.emit('send_group_message', {
+  emitWithRetry('send_group_message', {
     conversation_id: groupId,
     group_id: groupId,
     sender_id: sendButton.getAttribute('data-sender-id'),
-    content: messageContent
+    content: messageContent,
+    client_message_id: crypto.randomUUID()
   });
 
   // Clear the input and re-enable the send button
@@ -2,7 +2,7 @@
  * This script handles the functionality of loading and displaying notifications
  * when the "Notifications" link is clicked. It fetches the notifications content
  * from the server, formats timestamps, and attaches event listeners for deleting
- * notifications and marking them as read.
+ * notifications and marking them as read, one at a time or in bulk.
  */
 document.addEventListener('DOMContentLoaded', function () {
   /**
@@ -27,10 +27,7 @@ document.addEventListener('DOMContentLoaded', function () {
         middleBar.innerHTML = html; // Insert the HTML content into the middle bar
 
         // Format timestamps for each notification after loading the HTML
-        middleBar.querySelectorAll('#notification-timestamp').forEach(element => {
-          const rawTimestamp = element.getAttribute('data-timestamp');
-          element.textContent = formatTimestamp(rawTimestamp);
-        });
+        formatNotificationTimestamps(middleBar);
 
         // Attach delete listeners to the "Delete" buttons
         attachDeleteListeners();
@@ -42,13 +39,27 @@ document.addEventListener('DOMContentLoaded', function () {
       });
   });
 
+  /**
+     * Formats the timestamps of the notifications inside an element.
+     *
+     * @param {Document|HTMLElement} container - The element holding the notifications.
+     */
+  function formatNotificationTimestamps (container) {
+    container.querySelectorAll('#notification-timestamp').forEach(element => {
+      const rawTimestamp = element.getAttribute('data-timestamp');
+      element.textContent = formatTimestamp(rawTimestamp);
+    });
+  }
+
   /**
      * Attaches click event listeners to each "Delete" button for the notifications.
      * When a "Delete" button is clicked, it sends a DELETE request to the server
      * to remove the notification.
+     *
+     * @param {Document|HTMLElement} container - The element holding the buttons.
      */
-  function attachDeleteListeners () {
-    const deleteButtons = document.querySelectorAll('.delete-notification');
+  function attachDeleteListeners (container = document) {
+    const deleteButtons = container.querySelectorAll('.delete-notification');
 
     // Iterate over each "Delete" button and add a click listener
     deleteButtons.forEach(button => {
@@ -120,6 +131,7 @@ document.addEventListener('DOMContentLoaded', function () {
             const notificationItem = event.target.closest('.notification-item');
             notificationItem.classList.remove('unread'); // Mark the notification as read
             event.target.remove(); // Optionally remove the "Mark as Read" button
+            updateNotificationsIndicator(-1);
           } else {
             console.error('Failed to mark notification as read:', data.message);
           }
@@ -130,4 +142,114 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
   });
+
+  /**
+     * Sends a bulk request for the notifications selected by the body and
+     * returns the parsed response, or throws if the request failed.
+     *
+     * @param {string} url - The URL of the bulk endpoint.
+     * @param {Object} body - The selection: ids, before or all.
+     * @returns {Promise<Object>} The response with the affected count.
+     */
+  function sendBulkRequest (url, body) {
+    return fetch(url, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify(body)
+    })
+      .then(response => response.json())
+      .then(data => {
+        if (!data.success) {
+          throw new Error(data.message);
+        }
+        return data;
+      });
+  }
+
+  /**
+     * Attaches event listeners to the "Mark all as read" and "Delete read
+     * notifications" buttons. Each sends a single bulk request instead of
+     * one request per notification.
+     */
+  document.querySelector('.middle-bar').addEventListener('click', function (event) {
+    const middleBar = this;
+
+    // Mark every loaded notification as read, up to the newest one,
+    // so notifications received since the page was loaded stay unread
+    if (event.target.closest('.mark-all-read')) {
+      const newest = middleBar.querySelector('#notification-timestamp');
+      if (!newest) {
+        return;
+      }
+
+      sendBulkRequest('/notifications/read', { before: newest.getAttribute('data-timestamp') })
+        .then(data => {
+          middleBar.querySelectorAll('.notification-item.unread').forEach(item => {
+            item.classList.remove('unread');
+            const markReadButton = item.querySelector('.mark-read');
+            if (markReadButton) {
+              markReadButton.remove();
+            }
+          });
+          updateNotificationsIndicator(-data.updated);
+        })
+        .catch(error => {
+          console.error('Error marking notifications as read:', error);
+        });
+    }
+
+    // Append the next page of older notifications to the list
+    const loadMoreButton = event.target.closest('.load-more-notifications');
+    if (loadMoreButton) {
+      const cursor = encodeURIComponent(loadMoreButton.getAttribute('data-cursor'));
+      loadMoreButton.disabled = true;
+
+      fetch(`/notifications?before=${cursor}`)
+        .then(response => {
+          if (!response.ok) {
+            throw new Error('Failed to fetch notifications');
+          }
+          return response.text();
+        })
+        .then(html => {
+          const page = new DOMParser().parseFromString(html, 'text/html');
+          const list = middleBar.querySelector('.notifications-list');
+          formatNotificationTimestamps(page);
+          attachDeleteListeners(page);
+          page.querySelectorAll('.notification-item').forEach(item => list.appendChild(item));
+
+          // Replace the button with the one of the new page, if any
+          const nextButton = page.querySelector('.load-more-notifications');
+          if (nextButton) {
+            loadMoreButton.replaceWith(nextButton);
+          } else {
+            loadMoreButton.remove();
+          }
+        })
+        .catch(error => {
+          console.error('Error loading notifications:', error);
+          loadMoreButton.disabled = false;
+        });
+    }
+
+    // Delete every loaded notification that has been read
+    if (event.target.closest('.delete-read-notifications')) {
+      const readItems = middleBar.querySelectorAll('.notification-item:not(.unread)');
+      const ids = Array.from(readItems, item => item.getAttribute('data-id'));
+      if (!ids.length) {
+        return;
+      }
+
+      sendBulkRequest('/notifications/delete', { ids })
+        .then(() => {
+          readItems.forEach(item => item.remove());
+        })
+        .catch(error => {
+          console.error('Error deleting notifications:', error);
+          alert('Error deleting notifications');
+        });
+    }
+  });
 });
@@ -1,10 +1,51 @@
 /**
- * Loads the chat history for a specific conversation and displays it in the chat window.
+ * Creates the element for a single chat message.
  *
- * This function fetches the chat history from the server for the given `conversationId`,
- * processes the message data, and updates the chat messages container with the retrieved
- * messages. It also displays the last message timestamp and updates the message status
- * (read/unread) for each message. If there are no messages, it shows a placeholder message.
+ * @param {Object} message - The message data returned by the chat history endpoint.
+ * @returns {HTMLElement} The message element.
+ */
+function createChatMessageElement (message) {
+  const messageElement = document.createElement('div');
+  const isRead = message.is_read; // Check if the message is read
+  messageElement.classList.add('message'); // Add the 'message' class to the message element
+
+  // Add the data-message-id attribute to the message element for later reference
+  messageElement.dataset.messageId = message.id;
+
+  // Dynamically style sent vs. received messages based on the sender
+  if (message.sender_id === currentUserId) {
+    messageElement.classList.add('sent');
+  } else {
+    messageElement.classList.add('received');
+  }
+
+  // Set the inner HTML for the message element, including message text, timestamp, and options
+  messageElement.innerHTML = `
+          <p class="message-text">${message.content}</p>
+          <span class="message-timestamp">${formatTimestamp(message.timestamp)}</span>
+          <div class="message-status">
+              <span class="seen-icon">${isRead ? '<img src="/static/icons/seen.png" />' : ''}</span>
+              <span class="unseen-icon">${!isRead ? '<img src="/static/icons/unseen.png" />' : ''}</span>
+          </div>
+          <div class="message-options">
+              <button class="message-settings-btn"><img id="message-settings-btn-img" src="/static/icons/down.png"></button>
+              <div class="message-settings-menu">
+                  <ul id="message-menu-${message.id}">
+                      ${message.sender_id === currentUserId ? '<li class="delete-option">Delete</li>' : ''}
+                  </ul>
+      `;
+
+  return messageElement;
+}
+
+/**
+ * Loads the latest page of chat history for a specific conversation and displays it in the chat window.
+ *
+ * This function fetches the newest page of messages from the server for the given `conversationId`,
+ * replaces the content of the chat messages container with it and remembers the cursor of the
+ * oldest loaded message. Older pages are fetched by `loadOlderChatHistory` when the user scrolls
+ * to the top of the chat. It also displays the last message timestamp and updates the message
+ * status (read/unread) for each message.
  *
  * @param {string} conversationId - The unique identifier for the conversation.
  */
@@ -19,7 +60,21 @@ function loadChatHistory (conversationId) {
     return;
   }
 
-  // Fetch the chat history for the given conversation ID
+  // Load older pages when the user scrolls to the top of the chat
+  if (!chatMessagesContainer.dataset.scrollListener) {
+    chatMessagesContainer.addEventListener('scroll', () => {
+      // The container uses column-reverse, so the top is reached when the
+      // scrolled distance covers the whole scrollable height
+      const distanceToTop = chatMessagesContainer.scrollHeight -
+        chatMessagesContainer.clientHeight - Math.abs(chatMessagesContainer.scrollTop);
+      if (distanceToTop < 50) {
+        loadOlderChatHistory(conversationId);
+      }
+    });
+    chatMessagesContainer.dataset.scrollListener = 'true';
+  }
+
+  // Fetch the latest page of chat history for the given conversation ID
   fetch(`/chats/${conversationId}/history`)
     .then(response => {
       // If the network response isn't okay, throw an error
@@ -32,6 +87,10 @@ function loadChatHistory (conversationId) {
       // Clear the existing messages in the chat container
       chatMessagesContainer.innerHTML = '';
 
+      // Remember where the next older page starts
+      chatMessagesContainer.dataset.beforeCursor = data.before_cursor || '';
+      chatMessagesContainer.dataset.hasMore = data.has_more ? 'true' : 'false';
+
       // Check if there are messages to display
       if (data.messages && data.messages.length > 0) {
         // Show the timestamp of the last message
@@ -42,38 +101,8 @@ function loadChatHistory (conversationId) {
 
         // Loop through the messages, reverse them for chronological order, and display them
         data.messages.reverse().forEach(message => {
-          const messageElement = document.createElement('div');
-          const isRead = message.is_read; // Check if the message is read
-          messageElement.classList.add('message'); // Add the 'message' class to the message element
-
-          // Add the data-message-id attribute to the message element for later reference
-          messageElement.dataset.messageId = message.id;
-
-          // Dynamically style sent vs. received messages based on the sender
-          if (message.sender_id === currentUserId) {
-            messageElement.classList.add('sent');
-          } else {
-            messageElement.classList.add('received');
-          }
-
-          // Set the inner HTML for the message element, including message text, timestamp, and options
-          messageElement.innerHTML = `
-                  <p class="message-text">${message.content}</p>
-                  <span class="message-timestamp">${formatTimestamp(message.timestamp)}</span>
-                  <div class="message-status">
-                      <span class="seen-icon">${isRead ? '<img src="/static/icons/seen.png" />' : ''}</span>
-                      <span class="unseen-icon">${!isRead ? '<img src="/static/icons/unseen.png" />' : ''}</span>
-                  </div>
-                  <div class="message-options">
-                      <button class="message-settings-btn"><img id="message-settings-btn-img" src="/static/icons/down.png"></button>
-                      <div class="message-settings-menu">
-                          <ul id="message-menu-${message.id}">
-                              ${message.sender_id === currentUserId ? '<li class="delete-option">Delete</li>' : ''}
-                          </ul>
-              `;
-
           // Append the message element to the chat messages container
-          chatMessagesContainer.appendChild(messageElement);
+          chatMessagesContainer.appendChild(createChatMessageElement(message));
         });
 
         // Scroll to the bottom of the chat container to show the newest messages
@@ -86,3 +115,49 @@ function loadChatHistory (conversationId) {
       chatMessagesContainer.innerHTML = 'Failed to load messages.'; // Show a failure message
     });
 }
+
+/**
+ * Loads the page of messages older than the oldest loaded message of a conversation.
+ *
+ * The messages are added above the already loaded ones. Nothing happens while a page
+ * is already being loaded or when the start of the conversation has been reached.
+ *
+ * @param {string} conversationId - The unique identifier for the conversation.
+ */
+function loadOlderChatHistory (conversationId) {
+  const chatMessagesContainer = document.querySelector(`#chat-window-${conversationId} .chat-messages`);
+
+  // Stop if there is nothing more to load or a page is already loading
+  if (!chatMessagesContainer ||
+      chatMessagesContainer.dataset.hasMore !== 'true' ||
+      chatMessagesContainer.dataset.loading === 'true') {
+    return;
+  }
+
+  chatMessagesContainer.dataset.loading = 'true';
+  const cursor = encodeURIComponent(chatMessagesContainer.dataset.beforeCursor);
+
+  // Fetch the page of older messages
+  fetch(`/chats/${conversationId}/history?before=${cursor}`)
+    .then(response => {
+      if (!response.ok) {
+        throw new Error('Network response was not ok');
+      }
+      return response.json();
+    })
+    .then(data => {
+      chatMessagesContainer.dataset.beforeCursor = data.before_cursor || '';
+      chatMessagesContainer.dataset.hasMore = data.has_more ? 'true' : 'false';
+
+      // The container uses column-reverse, so appending places older messages on top
+      data.messages.reverse().forEach(message => {
+        chatMessagesContainer.appendChild(createChatMessageElement(message));
+      });
+    })
+    .catch(err => {
+      console.error('Error fetching older chat history:', err);
+    })
+    .finally(() => {
+      chatMessagesContainer.dataset.loading = 'false';
+    });
+}
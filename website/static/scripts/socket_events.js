@@ -1,48 +1,51 @@
 // Connect to the socket
 const socket = io.connect();
 
-// Listen for chat history updates
 // Listening for new private chat messages
-socket.on('new_message', function (data) {
-  const chatWindow = document.getElementById(`chat-messages-${data.conversation_id}`);
+socket.on('message_created', function (data) {
+  // Ignore payloads of a newer format than this page understands
+  if (data.version !== 1) {
+    console.error(`Unsupported message_created version ${data.version}`);
+    return;
+  }
+
+  const message = data.message;
+  const isReceived = message.sender_id !== currentUserId;
+
+  // Add the message to the chat window if it has been loaded
+  const chatWindow = document.getElementById(`chat-messages-${message.conversation_id}`);
+  const openChatWindow = document.getElementById(`chat-window-${message.conversation_id}`);
+  const isOpen = openChatWindow && openChatWindow.style.display === 'block';
   if (chatWindow) {
-    // Create new message element
-    const msgElement = document.createElement('div');
-    msgElement.classList.add('message');
-    msgElement.dataset.messageId = data.message_id;  // Retain the message ID
+    chatWindow.prepend(createChatMessageElement(message));
 
-    // Dynamically style sent vs. received messages based on the sender
-    if (data.sender_id === currentUserId) {
-      msgElement.classList.add('sent');
-    } else {
-      msgElement.classList.add('received');
+    // Scroll to the bottom to show the newest message
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+  }
+
+  // Update the conversation in the chat list
+  const chatItem = document.querySelector(`.chat-item[data-conversation-id="${message.conversation_id}"]`);
+  if (chatItem) {
+    const lastMessageElement = chatItem.querySelector('.chat-details p');
+    if (lastMessageElement) {
+      lastMessageElement.textContent = data.conversation.last_message;
     }
 
-    // Set inner HTML with message content, timestamp, and options
-    msgElement.innerHTML = `
-      <p class="message-text">${data.message}</p>
-      <span class="message-timestamp">${formatTimestamp(data.timestamp)}</span>
-      <div class="message-status">
-        <span class="seen-icon">${data.isRead ? '<img src="/static/icons/seen.png" />' : ''}</span>
-        <span class="unseen-icon">${!data.isRead ? '<img src="/static/icons/unseen.png" />' : ''}</span>
-      </div>
-      <div class="message-options">
-        <button class="message-settings-btn"><img id="message-settings-btn-img" src="/static/icons/down.png"></button>
-        <div class="message-settings-menu">
-          <ul id="message-menu-${data.message_id}">
-            ${data.sender_id === currentUserId ? '<li class="delete-option">Delete</li>' : ''}
-          </ul>
-        </div>
-      </div>
-    `;
+    const lastMessageDateElement = chatItem.querySelector('.chat-date');
+    if (lastMessageDateElement) {
+      lastMessageDateElement.textContent = formatTimestamp(data.conversation.last_message_date);
+    }
 
-    // Append the new message to the chat window
-    chatWindow.prepend(msgElement);
+    // Count received messages as unread while the chat is closed
+    if (isReceived && !isOpen) {
+      const unreadCount = chatItem.querySelector('.unread-count');
+      updateUnreadIndicator(chatItem, (unreadCount ? parseInt(unreadCount.textContent, 10) : 0) + 1);
+    }
+  }
 
-    // Scroll to the bottom to show the newest message
-    chatWindow.scrollTop = chatWindow.scrollHeight;
-  } else {
-    console.error(`Chat window not found for conversation ${data.conversation_id}`);
+  // Mark received messages as read while the chat is open
+  if (isReceived && isOpen) {
+    markConversationAsRead(message.conversation_id);
   }
 });
 
@@ -91,7 +94,155 @@ socket.on('new_group_message', function (data) {
 
     // Scroll to the bottom to show the newest message
     groupChatWindow.scrollTop = groupChatWindow.scrollHeight;
+
+    // Move the read watermark while the group is open
+    const openGroupWindow = document.getElementById(`group-window-${data.group_id}`);
+    if (data.sender_id !== currentUserId && openGroupWindow.style.display === 'block') {
+      markGroupAsRead(data.group_id);
+    }
   } else {
     console.error(`Group chat window not found for group ${data.group_id}`);
   }
-});
\ No newline at end of file
+});
+
+// Listening for read receipts of private chats
+socket.on('messages_read', function (data) {
+  // The user read the chat in another tab, so clear its unread count here too
+  if (data.reader_id === currentUserId) {
+    const chatItem = document.querySelector(`.chat-item[data-conversation-id="${data.conversation_id}"]`);
+    if (chatItem) {
+      updateUnreadIndicator(chatItem, 0);
+    }
+    return;
+  }
+
+  // The other user read the chat, so show the sent messages as seen
+  const chatWindow = document.getElementById(`chat-messages-${data.conversation_id}`);
+  if (chatWindow) {
+    chatWindow.querySelectorAll('.message.sent .message-status').forEach(status => {
+      status.querySelector('.seen-icon').innerHTML = '<img src="/static/icons/seen.png" />';
+      status.querySelector('.unseen-icon').innerHTML = '';
+    });
+  }
+});
+
+// Listening for read receipts of groups
+socket.on('group_read', function (data) {
+  // The user read the group in another tab, so clear its unread count here too
+  if (data.reader_id === currentUserId) {
+    const groupItem = document.querySelector(`.group-item[onclick="selectGroup('${data.group_id}')"]`);
+    if (groupItem) {
+      updateUnreadIndicator(groupItem, 0);
+    }
+  }
+});
+
+/**
+ * Shows, updates or removes the unread indicator of a chat or group item.
+ *
+ * @param {HTMLElement} item - The chat or group item in the list.
+ * @param {number} unreadCount - The number of unread messages.
+ */
+function updateUnreadIndicator (item, unreadCount) {
+  let indicator = item.querySelector('.unread-indicator');
+
+  // Remove the indicator once everything is read
+  if (!unreadCount) {
+    if (indicator) {
+      indicator.remove();
+    }
+    return;
+  }
+
+  // Create the indicator for the first unread message
+  if (!indicator) {
+    indicator = document.createElement('div');
+    indicator.classList.add('unread-indicator');
+    indicator.innerHTML = '<span class="unread-count"></span>';
+    item.appendChild(indicator);
+  }
+  indicator.querySelector('.unread-count').textContent = unreadCount;
+}
+
+// Listening for the inbox snapshot sent on connect
+socket.on('inbox_snapshot', function (data) {
+  // Update the last message and unread count of every private chat
+  data.conversations.forEach(conversation => {
+    const chatItem = document.querySelector(`.chat-item[data-conversation-id="${conversation.conversation_id}"]`);
+    if (!chatItem) {
+      return;
+    }
+
+    const lastMessageElement = chatItem.querySelector('.chat-details p');
+    if (lastMessageElement && conversation.last_message) {
+      lastMessageElement.textContent = conversation.last_message;
+    }
+    updateUnreadIndicator(chatItem, conversation.unread_count);
+  });
+
+  // Update the unread count of every group
+  data.groups.forEach(group => {
+    const groupItem = document.querySelector(`.group-item[onclick="selectGroup('${group.group_id}')"]`);
+    if (groupItem) {
+      updateUnreadIndicator(groupItem, group.unread_count);
+    }
+  });
+});
+
+// Listening for status changes of friends and group members
+socket.on('status_update', function (data) {
+  // Update the status shown in the header of the private chat
+  const chatWindow = document.querySelector(`.chat-window[data-user-id="${data.user_id}"]`);
+  if (chatWindow) {
+    const chatStatus = chatWindow.querySelector('#chat-status');
+    if (chatStatus) {
+      chatStatus.textContent = data.status === 'online' ? 'Online' : 'Offline';
+    }
+  }
+
+  // Update the status circle shown in the friends list
+  const statusCircle = document.getElementById(`status-circle-${data.user_id}`);
+  if (statusCircle) {
+    statusCircle.classList.toggle('online', data.status === 'online');
+    statusCircle.classList.toggle('offline', data.status !== 'online');
+  }
+});
+
+/**
+ * Adds to the unread count shown on the notifications bell, showing the
+ * indicator for the first unread notification and removing it at zero.
+ *
+ * @param {number} delta - The change of the number of unread notifications.
+ */
+function updateNotificationsIndicator (delta) {
+  const bell = document.querySelector('a[data-tooltip="Notifications"]');
+  if (!bell || !delta) {
+    return;
+  }
+
+  let indicator = bell.querySelector('.notifications-unread-indicator');
+  const current = indicator ? parseInt(indicator.querySelector('.unread-count').textContent, 10) : 0;
+  const unreadCount = Math.max(0, current + delta);
+
+  // Remove the indicator once everything is read
+  if (!unreadCount) {
+    if (indicator) {
+      indicator.remove();
+    }
+    return;
+  }
+
+  // Create the indicator for the first unread notification
+  if (!indicator) {
+    indicator = document.createElement('div');
+    indicator.classList.add('notifications-unread-indicator');
+    indicator.innerHTML = '<span class="unread-count"></span>';
+    bell.appendChild(indicator);
+  }
+  indicator.querySelector('.unread-count').textContent = unreadCount;
+}
+
+// Listening for new notifications, sent in batches
+socket.on('new_notification', function (data) {
+  updateNotificationsIndicator(data.notifications.length);
+});
@@ -0,0 +1,125 @@
+""" Module that contains the BoundedCache class. """
+import time
+from collections import OrderedDict
+
+from website.utils.cluster import cluster
+
+
+class BoundedCache:
+    """
+    Process-local LRU cache with a time to live, invalidated cluster-wide.
+
+    The cache holds at most `max_entries` entries, evicting the least
+    recently used one when full, and an entry is only served for `ttl`
+    seconds after it was stored. Invalidations are applied locally and
+    published to the other workers, which drop the same keys; the time
+    to live bounds how stale an entry can get if a message is missed.
+
+    Every cache is registered in `instances`, so `configure_caches`
+    can apply CACHE_MAX_ENTRIES and CACHE_TTL to all of them.
+
+    Attributes:
+        name (str): The name invalidations are published under.
+        max_entries (int): The maximum number of entries kept.
+        ttl (float): The number of seconds an entry is served,
+            0 to keep entries until they are evicted or invalidated.
+    """
+
+    instances = []
+
+    def __init__(self, name, max_entries=10000, ttl=300):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expiry time, value)
+        self._entries = OrderedDict()
+        BoundedCache.instances.append(self)
+        cluster.register(name, self.discard)
+
+    def get(self, key):
+        """
+        Return a cached value.
+
+        Args:
+            key (str): The key of the entry.
+
+        Returns:
+            The value, or None if it is missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        # Mark the entry as the most recently used one
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if full.
+
+        Args:
+            key (str): The key of the entry.
+            value: The value; None cannot be cached.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """
+        Drop entries on this worker and on every other worker.
+
+        Args:
+            *keys (str): The keys of the entries.
+        """
+        self.discard(*keys)
+        if keys:
+            cluster.publish(self.name, *keys)
+
+    def invalidate_others(self, *keys):
+        """
+        Drop entries on every other worker, after this worker updated them.
+
+        Args:
+            *keys (str): The keys of the entries.
+        """
+        if keys:
+            cluster.publish(self.name, *keys)
+
+    def discard(self, *keys):
+        """
+        Drop entries on this worker only.
+
+        Args:
+            *keys (str): The keys of the entries.
+        """
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """ Drop all entries on this worker. """
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def configure_caches(app):
+    """
+    Apply the cache size and time to live settings to every cache.
+
+    Args:
+        app (Flask): The application.
+    """
+    for cache in BoundedCache.instances:
+        cache.max_entries = app.config.get('CACHE_MAX_ENTRIES',
+                                           cache.max_entries)
+        cache.ttl = app.config.get('CACHE_TTL', cache.ttl)
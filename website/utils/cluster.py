@@ -0,0 +1,106 @@
+""" Module that contains the Cluster class. """
+import json
+from uuid import uuid4
+
+from website import socketio
+
+
+class Cluster:
+    """
+    Coordination between the workers that share a Socket.IO message queue.
+
+    When SOCKETIO_MESSAGE_QUEUE points to Redis, the same server holds the
+    state that must be shared by every worker, such as the connected
+    sockets of each user, and carries the invalidation messages of the
+    process-local caches: a cache that drops an entry publishes its name
+    and keys, and every other worker drops them too. Without a Redis
+    queue a single worker is assumed and nothing is shared.
+
+    Attributes:
+        worker_id (str): The unique ID of this worker process.
+        redis (Redis): The client of the shared Redis server,
+            or None when running as a single worker.
+    """
+
+    CHANNEL = 'chatflow:invalidate'
+
+    def __init__(self):
+        self.worker_id = uuid4().hex
+        self.redis = None
+        self._handlers = {}
+        self._listening = False
+
+    @property
+    def enabled(self):
+        """ bool: Whether state is shared with other workers. """
+        return self.redis is not None
+
+    def init_app(self, app):
+        """
+        Connect to the Redis server of the message queue, if any, and
+        start listening to the invalidations of the other workers.
+
+        Args:
+            app (Flask): The application.
+        """
+        url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+        if not url or not url.startswith(('redis://', 'rediss://',
+                                          'unix://')):
+            return
+
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        if not self._listening:
+            self._listening = True
+            socketio.start_background_task(self._listen)
+
+    def register(self, name, handler):
+        """
+        Register the handler of the invalidations published under a name.
+
+        Args:
+            name (str): The name of the invalidated state, e.g. a cache.
+            handler (callable): Called with the invalidated keys.
+        """
+        self._handlers[name] = handler
+
+    def publish(self, name, *keys):
+        """
+        Ask the other workers to invalidate some keys.
+
+        Args:
+            name (str): The name the handler was registered under.
+            *keys (str): The invalidated keys.
+        """
+        if self.redis is None:
+            return
+        self.redis.publish(self.CHANNEL, json.dumps({
+            'worker_id': self.worker_id, 'name': name, 'keys': keys}))
+
+    def _listen(self):
+        """ Apply the invalidations published by the other workers. """
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    self._dispatch(message.get('data'))
+            except Exception as e:
+                print(f"Cluster invalidation listener failed: {e}")
+            # Reconnect after a failure
+            socketio.sleep(1)
+
+    def _dispatch(self, data):
+        """ Call the handler of one published invalidation. """
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get('worker_id') == self.worker_id:
+            return
+        handler = self._handlers.get(message.get('name'))
+        if handler:
+            handler(*message.get('keys', ()))
+
+
+cluster = Cluster()
@@ -0,0 +1,126 @@
+""" Module that contains the FriendGraph class. """
+from website import db
+from website.models.friendship import Friendship
+from website.utils.bounded_cache import BoundedCache
+
+
+class FriendGraph:
+    """
+    Process-local index of the friendship graph.
+
+    Every user's adjacency set maps the users they have a friendship with
+    to the status of that friendship. It is loaded from the database the
+    first time the user is looked up, with a single query, and then kept
+    up to date by the methods of `Friendship` and the friendship routes,
+    so friend lists and status lookups run in memory.
+
+    The adjacency sets are held in a bounded LRU cache with a time to
+    live. A change updates the sets of this worker and drops those of
+    both users on every other worker, which reload them from the database.
+    """
+
+    def __init__(self):
+        # user_id -> {other user_id: friendship status}
+        self._adjacency = BoundedCache('friends')
+
+    def get(self, user_id):
+        """
+        Return the friendships of a user, loading them on a cache miss.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            dict: The status of the friendship with each other user.
+        """
+        adjacency = self._adjacency.get(user_id)
+        if adjacency is None:
+            adjacency = self._load(user_id)
+            self._adjacency.set(user_id, adjacency)
+        return adjacency
+
+    def friends(self, user_id, status='accepted'):
+        """
+        Return the users a user has a friendship of a given status with.
+
+        Args:
+            user_id (str): The ID of the user.
+            status (str): The status of the friendships.
+
+        Returns:
+            list: The IDs of the other users.
+        """
+        return [other_id for other_id, other_status
+                in self.get(user_id).items() if other_status == status]
+
+    def status(self, user_id, other_id):
+        """
+        Return the status of the friendship between two users.
+
+        Args:
+            user_id (str): The ID of one user.
+            other_id (str): The ID of the other user.
+
+        Returns:
+            str: The friendship status, or None if there is no friendship.
+        """
+        return self.get(user_id).get(other_id)
+
+    def set(self, user_id, other_id, status):
+        """
+        Record the status of the friendship between two users.
+
+        Users whose friendships are not loaded yet are skipped,
+        since they will be loaded from the database anyway.
+
+        Args:
+            user_id (str): The ID of one user.
+            other_id (str): The ID of the other user.
+            status (str): The new friendship status.
+        """
+        for a, b in ((user_id, other_id), (other_id, user_id)):
+            adjacency = self._adjacency.get(a)
+            if adjacency is not None:
+                adjacency[b] = status
+        self._adjacency.invalidate_others(user_id, other_id)
+
+    def remove(self, user_id, other_id):
+        """
+        Forget the friendship between two users.
+
+        Args:
+            user_id (str): The ID of one user.
+            other_id (str): The ID of the other user.
+        """
+        for a, b in ((user_id, other_id), (other_id, user_id)):
+            adjacency = self._adjacency.get(a)
+            if adjacency is not None:
+                adjacency.pop(b, None)
+        self._adjacency.invalidate_others(user_id, other_id)
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached friendships of a user on every worker.
+
+        Args:
+            user_id (str): The ID of the user.
+        """
+        self._adjacency.invalidate(user_id)
+
+    def clear(self):
+        """ Drop all cached friendships. """
+        self._adjacency.clear()
+
+    @staticmethod
+    def _load(user_id):
+        """ Load the friendships of a user, in either direction. """
+        friendships = db.session.query(
+            Friendship.user_id_1, Friendship.user_id_2, Friendship.status
+        ).filter(
+            (Friendship.user_id_1 == user_id) |
+            (Friendship.user_id_2 == user_id))
+        return {(user_id_2 if user_id_1 == user_id else user_id_1): status
+                for user_id_1, user_id_2, status in friendships}
+
+
+friend_graph = FriendGraph()
@@ -0,0 +1,100 @@
+""" Module that contains the GroupCache class. """
+from website import db
+from website.models.conversation import Conversation
+from website.models.group import Group, GroupMembership
+from website.utils.bounded_cache import BoundedCache
+from website.utils.cluster import cluster
+
+
+class GroupCache:
+    """
+    Process-local cache of what is needed to send a message to a group.
+
+    Entries hold the ID of the group's conversation and the IDs of its
+    members, so a group message can be authorized and stored without
+    looking up the group first. They are invalidated by the group routes
+    that change the members or delete the group.
+
+    Since the members authorize group messages, a stale entry must never
+    be served. With several workers every group has a version number in
+    Redis, which `invalidate` increments after the change is committed;
+    `get` reads the version before using or loading an entry, and
+    reloads the entries stored under an older one. A single worker
+    relies on its own invalidations.
+    """
+
+    VERSION_KEY = 'chatflow:group:{}:version'
+
+    def __init__(self):
+        # group_id -> {'conversation_id': str, 'member_ids': frozenset,
+        #              'version': str}
+        self._entries = BoundedCache('group')
+
+    def get(self, group_id):
+        """
+        Return the conversation and members of a group, loading them on
+        a cache miss or when the group changed on another worker.
+
+        The group's conversation is created if it does not exist yet.
+
+        Args:
+            group_id (str): The ID of the group.
+
+        Returns:
+            dict: The group's 'conversation_id' and 'member_ids',
+                or None if the group does not exist.
+        """
+        # Read the version first, so a change committed during the load
+        # makes the loaded entry stale
+        version = (cluster.redis.get(self.VERSION_KEY.format(group_id))
+                   if cluster.enabled else None)
+
+        entry = self._entries.get(group_id)
+        if entry is None or entry['version'] != version:
+            entry = self._load(group_id)
+            if entry is None:
+                self._entries.discard(group_id)
+                return None
+            entry['version'] = version
+            self._entries.set(group_id, entry)
+        return entry
+
+    def invalidate(self, group_id):
+        """
+        Drop the cached entry of a group on every worker.
+
+        Call it after the change is committed.
+
+        Args:
+            group_id (str): The ID of the group whose members changed.
+        """
+        if cluster.enabled:
+            cluster.redis.incr(self.VERSION_KEY.format(group_id))
+        self._entries.invalidate(group_id)
+
+    def clear(self):
+        """ Drop all cached entries. """
+        self._entries.clear()
+
+    @staticmethod
+    def _load(group_id):
+        """ Load the conversation and members of a group. """
+        group = Group.query.get(group_id)
+        if not group:
+            return None
+
+        # Find or create the conversation of the group
+        conversation = db.session.query(Conversation.id).filter_by(
+            group_id=group_id).first()
+        conversation_id = (conversation.id if conversation
+                           else group.create_group_conversation().id)
+
+        members = db.session.query(GroupMembership.user_id).filter_by(
+            id=group_id)
+        return {
+            'conversation_id': conversation_id,
+            'member_ids': frozenset(user_id for user_id, in members)
+        }
+
+
+group_cache = GroupCache()
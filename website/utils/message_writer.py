@@ -0,0 +1,364 @@
+""" Module that contains the MessageWriteBehind class. """
+import atexit
+import json
+import os
+from collections import Counter, deque
+from datetime import datetime
+
+from sqlalchemy import bindparam, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from website import db, socketio
+from website.models.conversation import Conversation
+from website.models.message import Message
+from website.models.unread_counter import UnreadCounter
+
+
+def write_messages(rows):
+    """
+    Persist a batch of messages with a single commit.
+
+    The messages are inserted with one multi-row INSERT, the last message
+    of every affected conversation is updated with one executemany UPDATE
+    and the unread counters of the receivers are incremented once per
+    conversation.
+
+    Args:
+        rows (list): The messages as dictionaries of Message columns.
+            Every row must carry its server-assigned 'id'.
+    """
+    if not rows:
+        return
+
+    db.session.execute(insert(Message), rows)
+
+    # Keep the newest message of every conversation
+    last_messages = {}
+    for row in rows:
+        last = last_messages.get(row['conversation_id'])
+        if last is None or row['timestamp'] >= last['b_date']:
+            last_messages[row['conversation_id']] = {
+                'b_id': row['conversation_id'],
+                'b_message': row['content'],
+                'b_date': row['timestamp']
+            }
+
+    # Batches may be committed out of order, so a conversation only moves
+    # forward to a newer last message
+    conversations = Conversation.__table__
+    db.session.execute(
+        update(conversations).where(
+            conversations.c.id == bindparam('b_id'),
+            or_(conversations.c.last_message_date.is_(None),
+                conversations.c.last_message_date <= bindparam('b_date'))
+        ).values(last_message=bindparam('b_message'),
+                 last_message_date=bindparam('b_date')),
+        list(last_messages.values()))
+
+    # Count the private messages as unread for their receivers
+    unread = Counter(
+        (row['receiver_id'], row['conversation_id'])
+        for row in rows if row.get('receiver_id'))
+    for (receiver_id, conversation_id), amount in unread.items():
+        UnreadCounter.increment(receiver_id, conversation_id, amount)
+
+    db.session.commit()
+
+
+def find_original(row):
+    """
+    Find the stored message that a retried send duplicates.
+
+    Args:
+        row (dict): The message as a dictionary of Message columns.
+
+    Returns:
+        Message: The message stored earlier with the same sender and
+            client message ID, or None if the row is not a retry.
+    """
+    if not row.get('client_message_id'):
+        return None
+    return Message.query.filter(
+        Message.sender_id == row['sender_id'],
+        Message.client_message_id == row['client_message_id'],
+        Message.id != row['id']).first()
+
+
+class MessageWriteBehind:
+    """
+    Process-local queue of sent messages waiting to be persisted.
+
+    When write-behind is enabled, the socket handlers emit a message as
+    soon as it has its server-assigned ID and queue it here. A background
+    task writes the queue in batches with `write_messages`, so many
+    messages share a single commit.
+
+    The queue is bounded: once it is full, `submit` refuses new messages
+    and the handlers write them synchronously, which slows the senders
+    down to the speed of the database. Pending messages are flushed when
+    the process exits.
+
+    If a journal file is configured, queued messages are appended to it
+    and replayed by `recover` on the next start. The appends are batched:
+    the background task writes and fsyncs the messages queued since its
+    last run before every flush, so a crash loses at most the messages
+    acknowledged during the last flush interval.
+
+    Attributes:
+        max_pending (int): The maximum number of queued messages.
+        batch_size (int): The maximum number of messages per commit.
+        journal_path (str): The path of the journal file, or None.
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        # (sender_id, client_message_id) -> queued row, to answer retries
+        self._sends = {}
+        self._journal_buffer = []
+        self._started = False
+        self.max_pending = 1000
+        self.batch_size = 200
+        self.journal_path = None
+
+    def submit(self, row):
+        """
+        Queue a message for the next batch.
+
+        Args:
+            row (dict): The message as a dictionary of Message columns.
+
+        Returns:
+            bool: True if the message was queued,
+                False if the queue is full.
+        """
+        if len(self._queue) >= self.max_pending:
+            return False
+
+        if self.journal_path:
+            self._journal_buffer.append(self._dump(row))
+        self._queue.append(row)
+        self._track(row)
+        return True
+
+    def find_pending(self, sender_id, client_message_id):
+        """
+        Find a queued message by its sender and client message ID.
+
+        Args:
+            sender_id (str): The ID of the sender.
+            client_message_id (str): The ID generated by the sender.
+
+        Returns:
+            dict: The queued message row, or None if it is not queued.
+        """
+        return self._sends.get((sender_id, client_message_id))
+
+    def sync_journal(self):
+        """ Append the messages queued since the last call to the journal. """
+        if not self._journal_buffer:
+            return
+        lines, self._journal_buffer = self._journal_buffer, []
+        with open(self.journal_path, 'a') as journal:
+            journal.write(''.join(line + '\n' for line in lines))
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def pending(self):
+        """
+        Get the number of queued messages.
+
+        Returns:
+            int: The number of messages waiting to be persisted.
+        """
+        return len(self._queue)
+
+    def flush(self):
+        """
+        Persist all queued messages in batches.
+
+        If a batch fails, its messages are put back at the front of the
+        queue for the next flush and the error is raised.
+
+        Returns:
+            int: The number of messages written.
+        """
+        written = 0
+        while self._queue:
+            batch = [self._queue.popleft() for _ in
+                     range(min(self.batch_size, len(self._queue)))]
+            try:
+                write_messages(batch)
+            except IntegrityError:
+                db.session.rollback()
+                # A retried send that left the dedup window is in the
+                # batch, so write it row by row and drop the duplicates
+                self._queue.extendleft(reversed(batch))
+                written += self._write_one_by_one(len(batch))
+                continue
+            except Exception:
+                db.session.rollback()
+                self._queue.extendleft(reversed(batch))
+                raise
+            self._untrack(batch)
+            written += len(batch)
+
+        # Only the messages queued during the flush still need the journal
+        if written and self.journal_path:
+            self._rewrite_journal()
+        return written
+
+    def _write_one_by_one(self, count):
+        """
+        Persist the next messages of the queue one at a time.
+
+        A retried send whose original is already stored is dropped.
+        A message rejected for any other integrity error, such as a
+        deleted conversation, can never be written; it is dropped and
+        logged as an error. Any other error leaves the failed message at
+        the front of the queue and is raised.
+
+        Args:
+            count (int): The number of messages to write.
+
+        Returns:
+            int: The number of messages written.
+        """
+        written = 0
+        for _ in range(count):
+            row = self._queue[0]
+            try:
+                write_messages([row])
+                written += 1
+            except IntegrityError as e:
+                db.session.rollback()
+                if find_original(row):
+                    print(f"Dropped duplicate message {row['id']}")
+                else:
+                    print(f"Error: dropped message {row['id']}, "
+                          f"which cannot be written: {e}")
+            except Exception:
+                db.session.rollback()
+                raise
+            self._untrack([self._queue.popleft()])
+        return written
+
+    def recover(self):
+        """
+        Persist the messages left in the journal by a previous process.
+
+        Messages that were already written before the crash are skipped.
+
+        Returns:
+            int: The number of messages recovered.
+        """
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+
+        with open(self.journal_path) as journal:
+            rows = [self._load(line) for line in journal if line.strip()]
+
+        # Skip the messages whose batch was committed before the crash
+        written_ids = set()
+        ids = [row['id'] for row in rows]
+        for start in range(0, len(ids), self.batch_size):
+            written_ids.update(message_id for message_id, in
+                               db.session.query(Message.id).filter(
+                                   Message.id.in_(
+                                       ids[start:start + self.batch_size])))
+        rows = [row for row in rows if row['id'] not in written_ids]
+
+        # Write the rest ahead of anything queued since the start
+        self._queue.extendleft(reversed(rows))
+        for row in rows:
+            self._track(row)
+        recovered = self.flush()
+        self._rewrite_journal()
+        return recovered
+
+    def start(self, app):
+        """
+        Start the background task that periodically flushes the queue.
+
+        The task is started once per process. The journal of a previous
+        process is recovered first, and pending messages are also flushed
+        when the process exits.
+
+        Args:
+            app (Flask): The application used for database access.
+        """
+        if self._started:
+            return
+        self._started = True
+
+        self.max_pending = app.config.get('MESSAGE_WRITE_BEHIND_MAX_PENDING',
+                                          self.max_pending)
+        self.batch_size = app.config.get('MESSAGE_WRITE_BEHIND_BATCH_SIZE',
+                                         self.batch_size)
+        self.journal_path = app.config.get('MESSAGE_WRITE_BEHIND_JOURNAL')
+        interval = app.config.get('MESSAGE_WRITE_BEHIND_INTERVAL', 0.05)
+
+        with app.app_context():
+            self._run_safely(self.recover)
+
+        def run():
+            while True:
+                socketio.sleep(interval)
+                if self._queue:
+                    self._run_safely(self.sync_journal)
+                    with app.app_context():
+                        self._run_safely(self.flush)
+
+        def flush_on_exit():
+            self._run_safely(self.sync_journal)
+            with app.app_context():
+                self._run_safely(self.flush)
+
+        socketio.start_background_task(run)
+        atexit.register(flush_on_exit)
+
+    def _track(self, row):
+        """ Index a queued message by its sender and client message ID. """
+        if row.get('client_message_id'):
+            self._sends[(row['sender_id'], row['client_message_id'])] = row
+
+    def _untrack(self, rows):
+        """ Forget messages that left the queue. """
+        for row in rows:
+            self._sends.pop((row['sender_id'], row.get('client_message_id')),
+                            None)
+
+    def _rewrite_journal(self):
+        """ Replace the journal with the messages still in the queue. """
+        temp_path = f'{self.journal_path}.tmp'
+        with open(temp_path, 'w') as journal:
+            for row in self._queue:
+                journal.write(self._dump(row) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, self.journal_path)
+
+        # The queued messages not synced yet were written above
+        self._journal_buffer = []
+
+    @staticmethod
+    def _dump(row):
+        """ Serialize a message row as a journal line. """
+        return json.dumps({**row, 'timestamp': row['timestamp'].isoformat()})
+
+    @staticmethod
+    def _load(line):
+        """ Parse a journal line back into a message row. """
+        row = json.loads(line)
+        row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+        return row
+
+    @staticmethod
+    def _run_safely(task):
+        """ Run a periodic task, logging instead of raising errors. """
+        try:
+            task()
+        except Exception as e:
+            print(f"Message write-behind {task.__name__} failed: {e}")
+
+
+message_writer = MessageWriteBehind()
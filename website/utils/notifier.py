@@ -0,0 +1,164 @@
+""" Module that contains the NotificationPipeline class. """
+import atexit
+from collections import Counter
+from datetime import datetime
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy import insert
+
+from website import db, socketio
+from website.models.notification import Notification
+
+
+class NotificationPipeline:
+    """
+    Process-local queue that coalesces and batches user notifications.
+
+    Notifications are queued instead of being written one by one. Those of
+    the same kind sent to the same user within one coalescing window are
+    merged into a single notification, e.g. "3 new friend requests". A
+    background task flushes the queue once per window: every notification
+    is written with one multi-row INSERT, the unread counts of the
+    recipients with one UPDATE, and each recipient gets a single
+    `new_notification` frame listing their new notifications.
+
+    Attributes:
+        window (float): The coalescing window in seconds,
+            0 to write every notification right away.
+        max_pending (int): The number of queued kinds of notification
+            at which the queue is flushed right away.
+    """
+
+    def __init__(self):
+        # (user_id, type, summary) -> pending notification
+        self._pending = {}
+        self._started = False
+        self.window = 2.0
+        self.max_pending = 1000
+
+    def notify(self, user_id, type, message, summary=None):
+        """
+        Queue a notification for a user.
+
+        Args:
+            user_id (str): The ID of the user to notify.
+            type (str): The type of the notification.
+            message (str): The text of a single notification.
+            summary (str, optional): The text used when several
+                notifications of this kind are merged, with a `{count}`
+                placeholder. Without it, notifications are never merged.
+        """
+        self.start(current_app._get_current_object())
+
+        key = (user_id, type, summary or uuid4().hex)
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = {'message': message, 'summary': summary,
+                                  'count': 1}
+        else:
+            pending['count'] += 1
+
+        # Flush early rather than let a burst grow the queue without limit,
+        # and right away if coalescing is disabled
+        if len(self._pending) >= self.max_pending or self.window <= 0:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the queued notifications and push them to their recipients.
+
+        If the write fails, the notifications are kept for the next flush.
+
+        Returns:
+            int: The number of notifications written.
+        """
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        now = datetime.utcnow()
+        rows = []
+        for (user_id, type, _), entry in pending.items():
+            rows.append({
+                'id': str(uuid4()),
+                'user_id': user_id,
+                'type': type,
+                'message': (entry['summary'].format(count=entry['count'])
+                            if entry['count'] > 1 else entry['message']),
+                'is_read': False,
+                'timestamp': now
+            })
+
+        try:
+            db.session.execute(insert(Notification), rows)
+            Notification.adjust_unread_counts(
+                Counter(row['user_id'] for row in rows))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for key, entry in pending.items():
+                if key in self._pending:
+                    self._pending[key]['count'] += entry['count']
+                else:
+                    self._pending[key] = entry
+            raise
+
+        # Push one frame per recipient
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row['user_id'], []).append({
+                'id': row['id'],
+                'type': row['type'],
+                'message': row['message'],
+                'timestamp': row['timestamp'].isoformat()
+            })
+        for user_id, notifications in by_user.items():
+            socketio.emit('new_notification',
+                          {'notifications': notifications},
+                          to=f'user_{user_id}')
+        return len(rows)
+
+    def start(self, app):
+        """
+        Start the background task that flushes the queue every window.
+
+        The task is started once per process. Queued notifications are
+        also flushed when the process exits.
+
+        Args:
+            app (Flask): The application used for database access.
+        """
+        if self._started:
+            return
+        self._started = True
+
+        self.window = app.config.get('NOTIFICATION_COALESCE_WINDOW',
+                                     self.window)
+        self.max_pending = app.config.get('NOTIFICATION_MAX_PENDING',
+                                          self.max_pending)
+
+        def run():
+            while self.window > 0:
+                socketio.sleep(self.window)
+                if self._pending:
+                    with app.app_context():
+                        self._run_safely(self.flush)
+
+        def flush_on_exit():
+            with app.app_context():
+                self._run_safely(self.flush)
+
+        socketio.start_background_task(run)
+        atexit.register(flush_on_exit)
+
+    @staticmethod
+    def _run_safely(task):
+        """ Run a periodic task, logging instead of raising errors. """
+        try:
+            task()
+        except Exception as e:
+            print(f"Notification {task.__name__} failed: {e}")
+
+
+notifications = NotificationPipeline()
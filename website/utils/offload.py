@@ -0,0 +1,45 @@
+""" Module that contains the run_blocking helper. """
+import os
+
+from flask import current_app
+
+from website import socketio
+
+_pool_configured = False
+
+
+def run_blocking(func, *args, **kwargs):
+    """
+    Run a CPU-bound call without stalling the other sockets of the worker.
+
+    Under eventlet, C code such as PBKDF2 or scrypt password hashing
+    holds the whole hub, so the call is run in eventlet's pool of native
+    threads while the calling greenlet waits. Only pure computations
+    may be offloaded: the database session, its connection pool and the
+    application context belong to the hub and must not be used from
+    another thread. In other async modes, or with OFFLOAD_BLOCKING_CALLS
+    disabled, the call is run directly.
+
+    Args:
+        func (callable): The blocking function to call.
+        *args: The positional arguments of the function.
+        **kwargs: The keyword arguments of the function.
+
+    Returns:
+        The return value of the function.
+    """
+    if (not current_app.config.get('OFFLOAD_BLOCKING_CALLS', True)
+            or socketio.async_mode != 'eventlet'):
+        return func(*args, **kwargs)
+
+    from eventlet import tpool
+
+    # Size the pool once, before its threads are started
+    global _pool_configured
+    if not _pool_configured:
+        # The calls are CPU-bound, so more threads than CPUs do not help
+        tpool.set_num_threads(current_app.config.get(
+            'BLOCKING_POOL_SIZE', os.cpu_count() or 1))
+        _pool_configured = True
+
+    return tpool.execute(func, *args, **kwargs)
@@ -0,0 +1,59 @@
+""" Module that contains the keyset pagination cursor helpers. """
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+
+def encode_cursor(timestamp, record_id):
+    """
+    Encode a (timestamp, id) keyset position into an opaque cursor.
+
+    Args:
+        timestamp (datetime): The timestamp of the record.
+        record_id (str): The ID of the record.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    raw = f"{timestamp.isoformat()}|{record_id}"
+    return urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor created by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor string.
+
+    Returns:
+        tuple: The (timestamp, id) keyset position.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        timestamp, record_id = urlsafe_b64decode(
+            cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(timestamp), record_id
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def parse_page_size(value, default=50, maximum=100):
+    """
+    Parse a requested page size, clamping it to the allowed range.
+
+    Args:
+        value (str): The raw page size, usually from the query string.
+        default (int): The page size used when none is given.
+        maximum (int): The largest page size allowed.
+
+    Returns:
+        int: A page size between 1 and `maximum`.
+
+    Raises:
+        ValueError: If the value is not an integer.
+    """
+    if value is None:
+        return default
+    return max(1, min(int(value), maximum))
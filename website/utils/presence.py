@@ -0,0 +1,333 @@
+""" Module that contains the PresenceRegistry class. """
+import atexit
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+from website import db, socketio
+from website.models.user import User
+from website.utils.cluster import cluster
+from website.utils.presence_audience import emit_presence
+
+
+class PresenceRegistry:
+    """
+    Registry of the sockets connected by each user.
+
+    A user is online while at least one of their sockets is connected,
+    so closing one of several tabs does not mark them offline. Status
+    and last seen changes are kept in memory and written to the database
+    in periodic batches by `flush`.
+
+    With a single worker the sockets are tracked in memory. When several
+    workers share a Redis server (see `Cluster`), the sockets of every
+    user are kept in Redis instead, so a user with tabs on two workers
+    stays online until both are closed. Each worker also records the
+    sockets it holds and refreshes a heartbeat key; when a worker dies,
+    the sweep of another worker removes its sockets and marks the users
+    left without any socket as offline.
+    """
+
+    USER_SOCKETS_KEY = 'chatflow:presence:{}'
+    WORKER_SOCKETS_KEY = 'chatflow:worker:{}:sockets'
+    WORKER_ALIVE_KEY = 'chatflow:worker:{}:alive'
+    WORKERS_KEY = 'chatflow:workers'
+
+    def __init__(self):
+        # user_id -> set of socket IDs held by this worker
+        self._sockets = {}
+        # user_id -> pending status and last seen timestamp
+        self._pending = {}
+        self._flusher_started = False
+        self._heartbeat_ttl = 15
+
+    def connect(self, user_id, sid):
+        """
+        Register a new socket of a user.
+
+        Args:
+            user_id (str): The ID of the user.
+            sid (str): The socket ID.
+
+        Returns:
+            bool: True if this is the user's first socket,
+                i.e. the user just came online.
+        """
+        sids = self._sockets.setdefault(user_id, set())
+        came_online = not sids
+        sids.add(sid)
+
+        if cluster.enabled:
+            pipe = cluster.redis.pipeline()
+            pipe.sadd(self.USER_SOCKETS_KEY.format(user_id), sid)
+            pipe.scard(self.USER_SOCKETS_KEY.format(user_id))
+            pipe.sadd(self.WORKER_SOCKETS_KEY.format(cluster.worker_id),
+                      f'{user_id} {sid}')
+            pipe.sadd(self.WORKERS_KEY, cluster.worker_id)
+            added, count, *_ = pipe.execute()
+            came_online = bool(added) and count == 1
+
+        self._pending[user_id] = {'status': 'online',
+                                  'last_seen': datetime.utcnow()}
+        return came_online
+
+    def disconnect(self, user_id, sid):
+        """
+        Unregister a socket of a user.
+
+        Args:
+            user_id (str): The ID of the user.
+            sid (str): The socket ID.
+
+        Returns:
+            bool: True if this was the user's last socket,
+                i.e. the user just went offline.
+        """
+        sids = self._sockets.get(user_id)
+        if not sids or sid not in sids:
+            return False
+
+        sids.discard(sid)
+        if not sids:
+            del self._sockets[user_id]
+        went_offline = not sids
+
+        if cluster.enabled:
+            pipe = cluster.redis.pipeline()
+            pipe.srem(self.USER_SOCKETS_KEY.format(user_id), sid)
+            pipe.scard(self.USER_SOCKETS_KEY.format(user_id))
+            pipe.srem(self.WORKER_SOCKETS_KEY.format(cluster.worker_id),
+                      f'{user_id} {sid}')
+            removed, count, _ = pipe.execute()
+            went_offline = bool(removed) and count == 0
+
+        if went_offline:
+            self._pending[user_id] = {'status': 'offline',
+                                      'last_seen': datetime.utcnow()}
+        return went_offline
+
+    def is_online(self, user_id):
+        """
+        Check whether a user has a connected socket on any worker.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            bool: True if the user is online.
+        """
+        if cluster.enabled:
+            return bool(cluster.redis.exists(
+                self.USER_SOCKETS_KEY.format(user_id)))
+        return user_id in self._sockets
+
+    def get_sids(self, user_id):
+        """
+        Get the connected sockets of a user, on every worker.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            set: The socket IDs of the user.
+        """
+        if cluster.enabled:
+            return cluster.redis.smembers(
+                self.USER_SOCKETS_KEY.format(user_id))
+        return set(self._sockets.get(user_id, ()))
+
+    def flush(self):
+        """
+        Write the pending status and last seen changes to the database.
+
+        All pending users are updated with a single executemany UPDATE,
+        which skips users deleted in the meantime. With several workers
+        the status written is read back from Redis, so a late flush of one
+        worker cannot overwrite a newer connection made on another. If the
+        write fails, the changes are kept for the next flush unless newer
+        ones were recorded in the meantime.
+
+        Returns:
+            int: The number of users written.
+        """
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            if cluster.enabled:
+                user_ids = list(pending)
+                pipe = cluster.redis.pipeline(transaction=False)
+                for user_id in user_ids:
+                    pipe.exists(self.USER_SOCKETS_KEY.format(user_id))
+                for user_id, online in zip(user_ids, pipe.execute()):
+                    pending[user_id]['status'] = (
+                        'online' if online else 'offline')
+
+            users = User.__table__
+            db.session.execute(
+                users.update().where(users.c.id == bindparam('user_id')), [
+                    {'user_id': user_id, **change}
+                    for user_id, change in pending.items()
+                ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for user_id, change in pending.items():
+                self._pending.setdefault(user_id, change)
+            raise
+        return len(pending)
+
+    def sweep(self):
+        """
+        Mark users as offline who are stored as online but have no socket.
+
+        This fixes users left stuck online when a worker crashed before
+        it could record their disconnect. With several workers, the
+        sockets of the workers whose heartbeat expired are removed first,
+        and the users who lose their last socket that way are announced
+        as offline to their audience.
+
+        Returns:
+            int: The number of users marked as offline.
+        """
+        if not cluster.enabled:
+            # Connected users and users with a pending change are skipped;
+            # the latter are written by the next flush
+            known_ids = set(self._sockets) | set(self._pending)
+
+            stale = User.query.filter(User.status == 'online')
+            if known_ids:
+                stale = stale.filter(User.id.notin_(known_ids))
+
+            swept = stale.update({User.status: 'offline'},
+                                 synchronize_session=False)
+            db.session.commit()
+            return swept
+
+        reaped_ids = self._reap_dead_workers()
+
+        online_ids = [user_id for user_id, in db.session.query(
+            User.id).filter(User.status == 'online')]
+        pipe = cluster.redis.pipeline(transaction=False)
+        for user_id in online_ids:
+            pipe.exists(self.USER_SOCKETS_KEY.format(user_id))
+        stale_ids = [user_id for user_id, online
+                     in zip(online_ids, pipe.execute())
+                     if not online and user_id not in self._pending]
+
+        swept = 0
+        for start in range(0, len(stale_ids), 500):
+            swept += User.query.filter(
+                User.id.in_(stale_ids[start:start + 500])
+            ).update({User.status: 'offline',
+                      User.last_seen: datetime.utcnow()},
+                     synchronize_session=False)
+        db.session.commit()
+
+        for user_id in reaped_ids:
+            emit_presence(user_id, 'offline')
+        return swept
+
+    def _reap_dead_workers(self):
+        """
+        Remove the sockets of the workers whose heartbeat expired.
+
+        Returns:
+            list: The IDs of the users left without any socket.
+        """
+        redis = cluster.redis
+        offline_ids = []
+        for worker_id in redis.smembers(self.WORKERS_KEY):
+            if (worker_id == cluster.worker_id or
+                    redis.exists(self.WORKER_ALIVE_KEY.format(worker_id))):
+                continue
+
+            sockets_key = self.WORKER_SOCKETS_KEY.format(worker_id)
+            entries = [entry.split(' ', 1)
+                       for entry in redis.smembers(sockets_key)]
+            pipe = redis.pipeline()
+            for user_id, sid in entries:
+                pipe.srem(self.USER_SOCKETS_KEY.format(user_id), sid)
+                pipe.scard(self.USER_SOCKETS_KEY.format(user_id))
+            pipe.delete(sockets_key)
+            pipe.srem(self.WORKERS_KEY, worker_id)
+            results = pipe.execute()
+
+            for (user_id, _), removed, count in zip(
+                    entries, results[0::2], results[1::2]):
+                if removed and count == 0:
+                    offline_ids.append(user_id)
+        return offline_ids
+
+    def heartbeat(self):
+        """ Tell the other workers that this worker is alive. """
+        if not cluster.enabled:
+            return
+        pipe = cluster.redis.pipeline()
+        pipe.set(self.WORKER_ALIVE_KEY.format(cluster.worker_id), 1,
+                 ex=self._heartbeat_ttl)
+        pipe.sadd(self.WORKERS_KEY, cluster.worker_id)
+        pipe.execute()
+
+    def start_flusher(self, app):
+        """
+        Start the background task that periodically flushes and sweeps.
+
+        The task is started once per process and also refreshes the
+        heartbeat of the worker. Pending changes are flushed when the
+        process exits.
+
+        Args:
+            app (Flask): The application used for database access.
+        """
+        if self._flusher_started:
+            return
+        self._flusher_started = True
+
+        flush_interval = app.config.get('PRESENCE_FLUSH_INTERVAL', 5)
+        sweep_interval = app.config.get('PRESENCE_SWEEP_INTERVAL', 60)
+        # A worker is considered dead after missing three heartbeats
+        self._heartbeat_ttl = max(3 * flush_interval, 1)
+        self._run_safely(self.heartbeat)
+
+        def run():
+            if sweep_interval:
+                with app.app_context():
+                    # Fix users left online by a previous crash on startup
+                    self._run_safely(self.sweep)
+            elapsed = 0
+            while True:
+                socketio.sleep(flush_interval)
+                elapsed += flush_interval
+                self._run_safely(self.heartbeat)
+                with app.app_context():
+                    self._run_safely(self.flush)
+                    if sweep_interval and elapsed >= sweep_interval:
+                        elapsed = 0
+                        self._run_safely(self.sweep)
+
+        def flush_on_exit():
+            with app.app_context():
+                self._run_safely(self.flush)
+            if cluster.enabled:
+                # Let the other workers reap the sockets of this one now
+                self._run_safely(self._expire_heartbeat)
+
+        socketio.start_background_task(run)
+        atexit.register(flush_on_exit)
+
+    def _expire_heartbeat(self):
+        """ Delete the heartbeat key of this worker. """
+        cluster.redis.delete(self.WORKER_ALIVE_KEY.format(cluster.worker_id))
+
+    @staticmethod
+    def _run_safely(task):
+        """ Run a periodic task, logging instead of raising errors. """
+        try:
+            task()
+        except Exception as e:
+            print(f"Presence task {task.__name__} failed: {e}")
+
+
+presence = PresenceRegistry()
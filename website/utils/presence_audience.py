@@ -0,0 +1,96 @@
+""" Module that contains the PresenceAudienceCache class. """
+from sqlalchemy.orm import aliased
+
+from website import db, socketio
+from website.models.friendship import Friendship
+from website.models.group import GroupMembership
+from website.utils.bounded_cache import BoundedCache
+
+
+class PresenceAudienceCache:
+    """
+    Process-local cache of the users who receive a user's presence changes.
+
+    The audience of a user is made of their accepted friends and the
+    members of the groups they belong to. It is computed once and kept
+    in a bounded LRU cache with a time to live, until a friendship or
+    group membership involving the user changes on any worker.
+    """
+
+    def __init__(self):
+        # user_id -> frozenset of user IDs
+        self._audiences = BoundedCache('audience')
+
+    def get(self, user_id):
+        """
+        Return the audience of a user, computing it on a cache miss.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            frozenset: The IDs of the users to notify, without the user.
+        """
+        audience = self._audiences.get(user_id)
+        if audience is None:
+            audience = self._load(user_id)
+            self._audiences.set(user_id, audience)
+        return audience
+
+    def invalidate(self, *user_ids):
+        """
+        Drop the cached audience of one or more users on every worker.
+
+        Args:
+            *user_ids (str): The IDs of the users whose audience changed.
+        """
+        self._audiences.invalidate(*user_ids)
+
+    def invalidate_group(self, group_id):
+        """
+        Drop the cached audience of every member of a group.
+
+        Args:
+            group_id (str): The ID of the group whose members changed.
+        """
+        members = db.session.query(GroupMembership.user_id).filter_by(
+            id=group_id)
+        self.invalidate(*[user_id for user_id, in members])
+
+    def clear(self):
+        """ Drop all cached audiences. """
+        self._audiences.clear()
+
+    @staticmethod
+    def _load(user_id):
+        """ Load the friends and group co-members of a user. """
+        audience = set(Friendship.get_friends(user_id))
+
+        # Members of every group the user belongs to
+        own_membership = aliased(GroupMembership)
+        co_members = db.session.query(GroupMembership.user_id).join(
+            own_membership, own_membership.id == GroupMembership.id
+        ).filter(own_membership.user_id == user_id).distinct()
+        audience.update(member_id for member_id, in co_members)
+
+        audience.discard(user_id)
+        return frozenset(audience)
+
+
+presence_audience = PresenceAudienceCache()
+
+
+def emit_presence(user_id, status):
+    """
+    Send a user's presence change to the personal rooms of their audience.
+
+    Args:
+        user_id (str): The ID of the user whose status changed.
+        status (str): The new status of the user.
+    """
+    audience = presence_audience.get(user_id)
+    if not audience:
+        return
+
+    socketio.emit('status_update', {'user_id': user_id, 'status': status},
+                  to=[f'user_{member_id}' for member_id in audience])
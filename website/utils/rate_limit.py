@@ -0,0 +1,143 @@
+""" Module that contains the RateLimiter class. """
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import current_app, request
+from flask_login import current_user
+
+
+class RateLimiter:
+    """
+    Process-local token buckets limiting how fast clients fire events.
+
+    Every event type has a bucket per socket and a bucket per user, so
+    opening more tabs does not raise a user's limit. A bucket holds up to
+    `burst` tokens and refills at `rate` tokens per second; each event
+    takes one token from both buckets. A bucket is two numbers updated in
+    place, so checking an event is O(1) and never yields to the eventlet
+    hub, which makes locking unnecessary.
+
+    The limits are read from the RATE_LIMITS setting, which maps an event
+    name to the (rate, burst) of its 'socket' and 'user' buckets.
+    """
+
+    def __init__(self):
+        # sid -> event -> [tokens, last refill time]
+        self._socket_buckets = {}
+        # user_id -> event -> [tokens, last refill time]
+        self._user_buckets = {}
+        # event -> number of rejected events
+        self.dropped = Counter()
+
+    def allow(self, event, sid, user_id):
+        """
+        Take a token for an event, if both of its buckets have one.
+
+        Args:
+            event (str): The name of the event.
+            sid (str): The ID of the socket that sent the event.
+            user_id (str): The ID of the user, or None if anonymous.
+
+        Returns:
+            float: 0 if the event is allowed, otherwise the number of
+                seconds until it would be.
+        """
+        limits = current_app.config.get('RATE_LIMITS', {}).get(event)
+        if not limits or not current_app.config.get('RATE_LIMIT_ENABLED'):
+            return 0
+
+        now = time.monotonic()
+        buckets = [self._refill(self._socket_buckets.setdefault(sid, {}),
+                                event, limits['socket'], now)]
+        if user_id:
+            buckets.append(self._refill(
+                self._user_buckets.setdefault(user_id, {}),
+                event, limits['user'], now))
+
+        # Reject without taking a token if any of the buckets is empty
+        retry_after = max(wait for _, wait in buckets)
+        if retry_after:
+            self.dropped[event] += 1
+            return retry_after
+
+        for bucket, _ in buckets:
+            bucket[0] -= 1
+        return 0
+
+    def discard_socket(self, sid):
+        """
+        Drop the buckets of a closed socket.
+
+        Args:
+            sid (str): The ID of the socket.
+        """
+        self._socket_buckets.pop(sid, None)
+
+    def discard_user(self, user_id):
+        """
+        Drop the buckets of a user whose last socket closed.
+
+        Args:
+            user_id (str): The ID of the user.
+        """
+        self._user_buckets.pop(user_id, None)
+
+    def stats(self):
+        """
+        Get the counters of the limiter.
+
+        Returns:
+            dict: The number of dropped events per event type and the
+                number of sockets and users with buckets.
+        """
+        return {
+            'dropped': dict(self.dropped),
+            'sockets': len(self._socket_buckets),
+            'users': len(self._user_buckets)
+        }
+
+    @staticmethod
+    def _refill(buckets, key, limit, now):
+        """ Refill a bucket, returning it and the wait for its next token. """
+        rate, burst = limit
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        wait = 0 if bucket[0] >= 1 else (1 - bucket[0]) / rate
+        return bucket, wait
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limited(event):
+    """
+    Reject a socket event once its sender exceeds the event's rate limit.
+
+    Rejected events are answered with a structured error instead of
+    reaching the handler.
+
+    Args:
+        event (str): The name of the event, used to look up its limits.
+
+    Returns:
+        callable: The decorator for the event handler.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            user_id = (current_user.id if current_user.is_authenticated
+                       else None)
+            retry_after = rate_limiter.allow(event, request.sid, user_id)
+            if retry_after:
+                return {'error': 'Rate limit exceeded.',
+                        'code': 'rate_limited',
+                        'event': event,
+                        'retry_after': round(retry_after, 3)}
+            return handler(*args, **kwargs)
+        return wrapper
+    return decorator
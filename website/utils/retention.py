@@ -0,0 +1,156 @@
+""" Module that contains the NotificationRetention class. """
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from website import db, socketio
+from website.models.notification import Notification
+
+
+class NotificationRetention:
+    """
+    Retention policy that keeps the notifications table bounded.
+
+    Notifications older than a maximum age are deleted, and users with
+    more than a maximum number of notifications lose their oldest ones,
+    read ones first. Rows are deleted in small chunks selected through an
+    index, each in its own short transaction, so the job never holds
+    locks for long and yields to other work between chunks. The unread
+    notification counts of the users are kept right.
+    """
+
+    def __init__(self):
+        self._started = False
+
+    def prune(self, max_age_days=0, max_per_user=0, chunk_size=500):
+        """
+        Delete the notifications that fall outside the retention policy.
+
+        Args:
+            max_age_days (int): Delete notifications older than this
+                number of days, 0 to keep them regardless of age.
+            max_per_user (int): Keep at most this number of notifications
+                per user, 0 for no limit.
+            chunk_size (int): The number of notifications deleted
+                per transaction.
+
+        Returns:
+            dict: The number of notifications deleted for being too old
+                ('expired') and for exceeding a user's limit ('excess').
+        """
+        deleted = {'expired': 0, 'excess': 0}
+        if max_age_days > 0:
+            cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+            deleted['expired'] = self._prune_expired(cutoff, chunk_size)
+        if max_per_user > 0:
+            deleted['excess'] = self._prune_excess(max_per_user, chunk_size)
+        return deleted
+
+    def start(self, app):
+        """
+        Start the background task that applies the policy periodically.
+
+        The task is started once per process by `create_app`, and only
+        in the process designated by NOTIFICATION_RETENTION_TASK, so
+        several workers do not prune the same rows concurrently. It is not
+        started when NOTIFICATION_RETENTION_INTERVAL is 0.
+
+        Args:
+            app (Flask): The application used for database access.
+        """
+        if self._started:
+            return
+        self._started = True
+
+        interval = app.config.get('NOTIFICATION_RETENTION_INTERVAL', 3600)
+        if not interval or not app.config.get('NOTIFICATION_RETENTION_TASK',
+                                              True):
+            return
+
+        def prune():
+            return self.prune(
+                app.config.get('NOTIFICATION_MAX_AGE_DAYS', 0),
+                app.config.get('NOTIFICATION_MAX_PER_USER', 0),
+                app.config.get('NOTIFICATION_RETENTION_CHUNK_SIZE', 500))
+
+        def run():
+            while True:
+                socketio.sleep(interval)
+                with app.app_context():
+                    self._run_safely(prune)
+
+        socketio.start_background_task(run)
+
+    def _prune_expired(self, cutoff, chunk_size):
+        """ Delete the notifications created before a cutoff, by chunks. """
+        deleted = 0
+        while True:
+            rows = db.session.query(
+                Notification.id, Notification.user_id, Notification.is_read
+            ).filter(Notification.timestamp < cutoff).order_by(
+                Notification.timestamp, Notification.id
+            ).limit(chunk_size).all()
+            if not rows:
+                return deleted
+            deleted += self._delete(rows)
+
+    def _prune_excess(self, max_per_user, chunk_size):
+        """ Delete the oldest notifications of users over the limit. """
+        over_limit = db.session.query(
+            Notification.user_id, func.count(Notification.id)
+        ).group_by(Notification.user_id).having(
+            func.count(Notification.id) > max_per_user
+        ).all()
+
+        deleted = 0
+        for user_id, count in over_limit:
+            excess = count - max_per_user
+            # Prune read notifications before unread ones
+            for is_read in (True, False):
+                while excess > 0:
+                    rows = db.session.query(
+                        Notification.id, Notification.user_id,
+                        Notification.is_read
+                    ).filter_by(user_id=user_id, is_read=is_read).order_by(
+                        Notification.timestamp, Notification.id
+                    ).limit(min(excess, chunk_size)).all()
+                    if not rows:
+                        break
+                    removed = self._delete(rows)
+                    deleted += removed
+                    excess -= removed
+        return deleted
+
+    @staticmethod
+    def _delete(rows):
+        """ Delete one chunk of notifications in its own transaction. """
+        # Mark unread notifications as read first,
+        # which also lowers the unread count of their user
+        unread = defaultdict(list)
+        for notification_id, user_id, is_read in rows:
+            if not is_read:
+                unread[user_id].append(notification_id)
+        for user_id, ids in unread.items():
+            Notification.mark_many_read(user_id, ids=ids)
+
+        deleted = Notification.query.filter(
+            Notification.id.in_([row[0] for row in rows])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        # Let other greenlets run between chunks
+        socketio.sleep(0)
+        return deleted
+
+    @staticmethod
+    def _run_safely(task):
+        """ Run a periodic task, logging instead of raising errors. """
+        try:
+            task()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Notification retention failed: {e}")
+
+
+notification_retention = NotificationRetention()
@@ -0,0 +1,102 @@
+""" Module that contains the UserRoomCache class. """
+from flask_socketio import join_room, leave_room
+
+from website import db
+from website.models.conversation import Conversation
+from website.models.group import GroupMembership
+from website.utils.bounded_cache import BoundedCache
+from website.utils.presence import presence
+
+
+class UserRoomCache:
+    """
+    Process-local cache of the Socket.IO rooms each user belongs to.
+
+    A user's rooms are the rooms of their private chats and of their
+    groups. They are loaded once per user, so new sockets join their
+    rooms without querying the database, and invalidated on every worker
+    by the routes that create chats and groups or change group members.
+
+    Joining or leaving a room also moves the user's connected sockets,
+    on every worker: their IDs come from the presence registry and the
+    Socket.IO manager forwards the change to the worker holding them.
+    """
+
+    def __init__(self):
+        # user_id -> frozenset of room names
+        self._rooms = BoundedCache('rooms')
+
+    def get(self, user_id):
+        """
+        Return the rooms of a user, loading them on a cache miss.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            frozenset: The names of the user's rooms.
+        """
+        rooms = self._rooms.get(user_id)
+        if rooms is None:
+            rooms = self._load(user_id)
+            self._rooms.set(user_id, rooms)
+        return rooms
+
+    def join(self, user_id, room):
+        """
+        Add a room to a user and join their connected sockets to it.
+
+        Call it after the change is committed.
+
+        Args:
+            user_id (str): The ID of the user.
+            room (str): The name of the room.
+        """
+        self._rooms.invalidate(user_id)
+        for sid in presence.get_sids(user_id):
+            join_room(room, sid=sid, namespace='/')
+
+    def leave(self, user_id, room):
+        """
+        Remove a room from a user and take their connected sockets out of it.
+
+        Call it after the change is committed.
+
+        Args:
+            user_id (str): The ID of the user.
+            room (str): The name of the room.
+        """
+        self._rooms.invalidate(user_id)
+        for sid in presence.get_sids(user_id):
+            leave_room(room, sid=sid, namespace='/')
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached rooms of a user on every worker.
+
+        Args:
+            user_id (str): The ID of the user.
+        """
+        self._rooms.invalidate(user_id)
+
+    def clear(self):
+        """ Drop all cached rooms. """
+        self._rooms.clear()
+
+    @staticmethod
+    def _load(user_id):
+        """ Load the rooms of the private chats and groups of a user. """
+        conversations = db.session.query(Conversation.id).filter(
+            ((Conversation.user1_id == user_id) |
+             (Conversation.user2_id == user_id)) &
+            (Conversation.type == 'private_chat'))
+        groups = db.session.query(GroupMembership.id).filter_by(
+            user_id=user_id)
+
+        rooms = {f'conversation_{conversation_id}'
+                 for conversation_id, in conversations}
+        rooms.update(f'group_{group_id}' for group_id, in groups)
+        return frozenset(rooms)
+
+
+user_rooms = UserRoomCache()
@@ -0,0 +1,73 @@
+""" Module that contains the SendDedupWindow class. """
+from collections import OrderedDict
+
+
+class SendDedupWindow:
+    """
+    Process-local window of the latest acknowledgements of each sender.
+
+    Clients attach a generated ID to every message they send and retry
+    with the same ID when no acknowledgement arrives. A retried send
+    found in the window gets the original acknowledgement back without
+    touching the database. Older sends are still protected by the unique
+    (sender_id, client_message_id) constraint on messages.
+
+    Attributes:
+        per_sender (int): The number of acknowledgements kept per sender.
+        max_senders (int): The maximum number of senders kept.
+    """
+
+    def __init__(self, per_sender=256, max_senders=10000):
+        self.per_sender = per_sender
+        self.max_senders = max_senders
+        # sender_id -> OrderedDict of client_message_id -> acknowledgement
+        self._windows = OrderedDict()
+
+    def get(self, sender_id, client_message_id):
+        """
+        Return the acknowledgement of an already handled send.
+
+        Args:
+            sender_id (str): The ID of the sender.
+            client_message_id (str): The client-generated message ID.
+
+        Returns:
+            dict: The original acknowledgement,
+                or None if the send is not in the window.
+        """
+        window = self._windows.get(sender_id)
+        if window is None:
+            return None
+        return window.get(client_message_id)
+
+    def remember(self, sender_id, client_message_id, ack):
+        """
+        Record the acknowledgement of a handled send.
+
+        Args:
+            sender_id (str): The ID of the sender.
+            client_message_id (str): The client-generated message ID.
+            ack (dict): The acknowledgement returned to the client.
+        """
+        window = self._windows.get(sender_id)
+        if window is None:
+            window = self._windows[sender_id] = OrderedDict()
+
+            # Evict the least recently active sender once the cache is full
+            if len(self._windows) > self.max_senders:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(sender_id)
+
+        window[client_message_id] = ack
+
+        # Evict the sender's oldest send once their window is full
+        if len(window) > self.per_sender:
+            window.popitem(last=False)
+
+    def clear(self):
+        """ Drop all windows. """
+        self._windows.clear()
+
+
+send_dedup = SendDedupWindow()
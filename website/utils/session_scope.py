@@ -0,0 +1,32 @@
+""" Module that contains the session_scope decorator. """
+from functools import wraps
+
+from flask import current_app
+
+from website import db
+
+
+def session_scope(handler):
+    """
+    Run a socket event handler in its own database session.
+
+    The handler runs in a fresh application context, so it never shares
+    the session, and its identity map, with an enclosing context or
+    another event. The session is removed when the handler returns or
+    raises, which rolls back anything left uncommitted and releases every
+    object it loaded.
+
+    Args:
+        handler (callable): The socket event handler.
+
+    Returns:
+        callable: The wrapped handler.
+    """
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        with current_app.app_context():
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                db.session.remove()
+    return wrapper
@@ -0,0 +1,61 @@
+""" Module that contains the UserDisplayCache class. """
+from website.models.user import User
+from website.utils.bounded_cache import BoundedCache
+
+
+class UserDisplayCache:
+    """
+    Process-local LRU cache of the data needed to display a user.
+
+    Entries hold the user's name and profile picture URL. They are
+    invalidated on every worker by the routes that change this data,
+    and expire after the cache time to live in any case.
+    """
+
+    def __init__(self):
+        self._entries = BoundedCache('user_display')
+
+    def get(self, user_id):
+        """
+        Return the display data of a user, loading it on a cache miss.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            dict: The user's 'name' and 'profile_picture_url',
+                or None if the user does not exist.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            return entry
+
+        user = User.query.get(user_id)
+        if not user:
+            return None
+
+        entry = {
+            'name': user.name,
+            'profile_picture_url': (
+                f'/static/profile_pics/{user.profile_picture}'
+                if user.profile_picture
+                else '/static/profile_pics/default.png')
+        }
+        self._entries.set(user_id, entry)
+        return entry
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached display data of a user on every worker.
+
+        Args:
+            user_id (str): The ID of the user whose data changed.
+        """
+        self._entries.invalidate(user_id)
+
+    def clear(self):
+        """ Drop all cached entries. """
+        self._entries.clear()
+
+
+user_display_cache = UserDisplayCache()